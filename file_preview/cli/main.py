@@ -5,6 +5,7 @@
 import click
 from ..server.app import create_app
 from ..utils.config import load_config
+from ..core.janitor import CacheJanitor
 
 @click.group()
 def cli():
@@ -21,5 +22,15 @@ def server():
         port=config['server']['port']
     )
 
+@cli.command()
+def cleanup():
+    """清理过期和超出容量的缓存文件"""
+    config = load_config()
+    stats = CacheJanitor(config).run_once()
+    if stats['last_error']:
+        click.echo(f"清理缓存失败: {stats['last_error']}")
+    else:
+        click.echo(f"缓存清理完成，耗时: {stats['last_duration']} 秒")
+
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
@@ -0,0 +1,378 @@
+"""
+异步下载引擎
+在独立的事件循环线程中并发下载URL，网络等待不占用后台任务线程
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable
+from .downloader import FileDownloader, DownloadRejectedError, get_validators
+from .hashing import remember_md5
+from .negative_cache import classify_status
+from .origin_limiter import OriginSlot
+
+# 尝试导入 aiohttp（pip install file-preview[async]），未安装时在线程池中执行同步下载
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 默认配置
+DEFAULT_ASYNC_MAX_CONCURRENCY = 256
+DEFAULT_ASYNC_MAX_PENDING = 10000
+DEFAULT_ASYNC_THREADS = 16
+
+# 下载完成回调使用的线程数，回调中的任务调度和任务状态写入可能访问 Redis，不在事件循环中执行
+CALLBACK_THREADS = 2
+
+# 数据块在内存中累积到该大小后再交给线程池写入磁盘
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+class DownloadQueueFullError(Exception):
+    """等待下载的URL数已达上限"""
+    pass
+
+class _DownloadFile:
+    """下载写入的文件，写入的同时计算MD5，所有方法都在线程池中调用"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.md5 = hashlib.md5()
+    
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.md5.update(data)
+    
+    def close(self) -> str:
+        """关闭文件，返回内容MD5并记录到摘要缓存"""
+        if self.file.closed:
+            return self.md5.hexdigest()
+        self.file.close()
+        digest = self.md5.hexdigest()
+        remember_md5(self.path, digest)
+        return digest
+
+class AsyncDownloadEngine:
+    """
+    异步下载引擎
+    
+    所有下载在同一个事件循环线程中进行，源站连接名额与同步下载共用 FileDownloader 的源站限流器，
+    在事件循环中等待名额，不占用线程；总并发数另由信号量限制。
+    安装了 aiohttp 时用长连接客户端流式下载，磁盘写入和失败记录（可能访问 Redis）交给线程池，
+    事件循环只处理网络读取；否则把 FileDownloader.fetch 放到固定大小的线程池执行，
+    每个下载占用一个线程，但不占用后台任务调度器的线程。
+    分段并行下载、大小和时间上限、格式识别与 FileDownloader 保持一致。
+    """
+    
+    def __init__(self, config: Dict[str, Any], downloader: FileDownloader):
+        """
+        初始化下载引擎，事件循环线程在第一次提交下载时启动
+        
+        Args:
+            config: 配置字典
+            downloader: 文件下载器
+        """
+        download_config = config.get('download', {})
+        self.enabled = download_config.get('async_enabled', True)
+        self.max_concurrency = download_config.get('async_max_concurrency', DEFAULT_ASYNC_MAX_CONCURRENCY)
+        self.max_pending = download_config.get('async_max_pending', DEFAULT_ASYNC_MAX_PENDING)
+        self.threads = download_config.get('async_threads', DEFAULT_ASYNC_THREADS)
+        self.keep_alive = config.get('http', {}).get('keep_alive', True)
+        self.use_aiohttp = AIOHTTP_AVAILABLE and download_config.get('async_client', 'aiohttp') == 'aiohttp'
+        self.downloader = downloader
+        
+        if self.enabled and not self.use_aiohttp and download_config.get('async_client', 'aiohttp') == 'aiohttp':
+            logger.warning("未安装 aiohttp，异步下载引擎改为在线程池中下载，每个下载占用一个线程")
+        
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._callback_executor = None
+        
+        # 以下对象只在事件循环线程中使用
+        self._session = None
+        self._semaphore = None
+        
+        # 统计信息
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+    
+    def start(self) -> None:
+        """启动事件循环线程"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='download')
+            self._callback_executor = ThreadPoolExecutor(max_workers=CALLBACK_THREADS,
+                                                         thread_name_prefix='download-callback')
+            self._thread = threading.Thread(target=self._run_loop, args=(loop,), name='async-download', daemon=True)
+            self._thread.start()
+            self._loop = loop
+        
+        client = 'aiohttp' if self.use_aiohttp else f'线程池({self.threads})'
+        logger.info(f"异步下载引擎已启动，客户端: {client}, 总并发: {self.max_concurrency}")
+    
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        """事件循环线程入口"""
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+    
+    def submit(self, url: str) -> Future:
+        """
+        提交下载
+        
+        Args:
+            url: 文件URL
+        
+        Returns:
+            下载完成后得到 FileDownloader.fetch 格式的结果，下载失败时结果为None
+        
+        Raises:
+            DownloadQueueFullError: 等待下载的URL数已达上限
+        """
+        with self._lock:
+            if self.max_pending and self.pending >= self.max_pending:
+                self.rejected += 1
+                raise DownloadQueueFullError(f"等待下载的URL数已达上限 {self.max_pending}")
+            self.pending += 1
+        
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._download(url), self._loop)
+    
+    def add_done_callback(self, future: Future, callback: Callable[[Future], None]) -> None:
+        """
+        下载完成后在回调线程中执行 callback(future)
+        
+        Future 自身的回调在事件循环线程中执行，回调里的任务调度和任务状态写入可能访问 Redis，
+        交给回调线程执行，不阻塞其他下载。
+        
+        Args:
+            future: submit 返回的 Future
+            callback: 回调函数
+        """
+        executor = self._callback_executor
+        future.add_done_callback(lambda done: executor.submit(callback, done))
+    
+    async def _run(self, func: Callable, *args):
+        """在下载线程池中执行阻塞的磁盘或缓存操作，不阻塞事件循环"""
+        return await self._loop.run_in_executor(self._executor, func, *args)
+    
+    async def _download(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        占用源站连接名额和总并发名额后下载文件
+        
+        Args:
+            url: 文件URL
+        
+        Returns:
+            下载结果，失败时返回None
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        downloader = self.downloader
+        result = None
+        try:
+            # 退避时间内不再下载失败过的URL，不必等待连接名额
+            if await self._run(downloader.get_failure, url):
+                return None
+            
+            # 先按源站轮流等待连接名额，一个源站排队再多也不会占满总并发名额
+            slot = await downloader.limiter.acquire_async(url)
+            try:
+                async with self._semaphore:
+                    with self._lock:
+                        self.active += 1
+                    try:
+                        if self.use_aiohttp:
+                            result = await self._fetch(url, slot)
+                        else:
+                            result = await self._run(downloader.fetch, url, slot)
+                    finally:
+                        with self._lock:
+                            self.active -= 1
+            finally:
+                slot.release()
+            return result
+        finally:
+            with self._lock:
+                self.pending -= 1
+                if result:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+    
+    async def _get_session(self):
+        """获取 aiohttp 会话，首次使用时在事件循环中创建"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency,
+                                             limit_per_host=self.downloader.limiter.per_origin_connections,
+                                             force_close=not self.keep_alive)
+            # 下载请求来自不同用户，不保存服务端设置的 Cookie
+            self._session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+        return self._session
+    
+    async def _fetch(self, url: str, slot: OriginSlot) -> Optional[Dict[str, Any]]:
+        """
+        用 aiohttp 流式下载文件，写入磁盘的同时计算内容MD5
+        
+        事件循环中只做网络读取和大小、时间检查，文件写入、MD5计算和失败记录在线程池中执行。
+        
+        Args:
+            url: 文件URL
+            slot: 已占用的源站连接名额，转为分段下载时提前释放
+        
+        Returns:
+            下载结果，如果下载失败、超出大小或时间上限、格式不支持则返回None
+        """
+        downloader = self.downloader
+        output_path = None
+        output = None
+        result = None
+        try:
+            deadline = downloader.get_deadline()
+            filename = downloader.get_filename(url)
+            logger.info(f"开始异步下载文件: {url}")
+            
+            session = await self._get_session()
+            timeout = aiohttp.ClientTimeout(sock_connect=downloader.timeout, sock_read=downloader.timeout)
+            async with session.get(url, timeout=timeout) as response:
+                if response.status != 200:
+                    logger.error(f"下载失败，响应状态: {response.status}")
+                    await self._run(downloader.record_failure, url, classify_status(response.status),
+                                    f"下载失败，响应状态: {response.status}")
+                    return None
+                
+                downloader.check_declared_size(response.headers)
+                
+                # 先读取开头的数据识别格式
+                head = b''
+                while len(head) < downloader.stream_chunk_size:
+                    chunk = await response.content.read(downloader.stream_chunk_size - len(head))
+                    if not chunk:
+                        break
+                    head += chunk
+                filename = downloader.check_format(head, filename)
+                
+                # 每次下载写入唯一的临时文件，同名文件并发下载时互不覆盖
+                output_path = await self._run(downloader.get_output_path, filename)
+                
+                # 分段并行下载仍由下载器在线程池中完成
+                total_size = downloader.get_parallel_size(response.headers)
+                if total_size:
+                    headers = response.headers
+                    response.close()
+                    slot.release()
+                    result = await self._run(downloader.fetch_ranges, url, output_path, total_size, headers, deadline)
+                    if result:
+                        result['filename'] = filename
+                    return result
+                
+                # 数据块在内存中累积到一定大小后交给线程池写入
+                output = await self._run(_DownloadFile, output_path)
+                buffer = bytearray()
+                size = 0
+                chunk = head
+                while chunk:
+                    size += len(chunk)
+                    downloader.check_progress(size, deadline)
+                    buffer += chunk
+                    if len(buffer) >= WRITE_BUFFER_SIZE:
+                        data, buffer = buffer, bytearray()
+                        await self._run(output.write, data)
+                    delay = downloader.limiter.throttle(url, len(chunk))
+                    if delay:
+                        await asyncio.sleep(delay)
+                    chunk = await response.content.read(downloader.stream_chunk_size)
+                if buffer:
+                    await self._run(output.write, buffer)
+                content_md5 = await self._run(output.close)
+                validators = get_validators(response.headers)
+            
+            if size == 0:
+                logger.error(f"文件下载失败，内容为空: {url}")
+                await self._run(downloader.record_failure, url, 'empty', "下载的文件为空")
+                return None
+            
+            logger.info(f"文件下载成功: {url} -> {output_path}, 大小: {size} 字节")
+            await self._run(downloader.clear_failure, url)
+            result = {
+                'path': output_path,
+                'filename': filename,
+                'md5': content_md5,
+                'size': size,
+                'validators': validators
+            }
+            return result
+        
+        except DownloadRejectedError as e:
+            logger.warning(f"中止下载: {url}, {str(e)}")
+            await self._run(downloader.record_failure, url, 'rejected', str(e))
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"下载请求失败: {url}, {str(e)}")
+            await self._run(downloader.record_failure, url, 'network', f"下载请求失败: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"下载过程中发生错误: {str(e)}", exc_info=True)
+            return None
+        finally:
+            # 下载失败时关闭并删除写了一部分的文件
+            if result is None:
+                if output is not None:
+                    await self._run(output.close)
+                if output_path:
+                    await self._run(downloader.cleanup, output_path)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        
+        Returns:
+            统计信息字典，pending 包含正在下载和等待名额的URL
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "client": "aiohttp" if self.use_aiohttp else "threads",
+                "running": self._loop is not None,
+                "max_concurrency": self.max_concurrency,
+                "pending": self.pending,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected
+            }
+    
+    def close(self) -> None:
+        """关闭会话并停止事件循环线程"""
+        with self._lock:
+            loop, thread, executor = self._loop, self._thread, self._executor
+            callback_executor = self._callback_executor
+            self._loop = self._thread = self._executor = self._callback_executor = None
+        if loop is None:
+            return
+        
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(timeout=10)
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._semaphore = None
+        thread.join(timeout=10)
+        loop.close()
+        executor.shutdown(wait=False)
+        callback_executor.shutdown(wait=False)
\ No newline at end of file
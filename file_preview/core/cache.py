@@ -3,13 +3,14 @@
 """
 
 import os
-import hashlib
 import shutil
 import time
 import json
 import logging
+import threading
 from typing import Optional, Dict, Any, List, Union, Tuple
 from datetime import datetime, timedelta
+from .hashing import file_md5
 
 try:
     import redis
@@ -89,11 +90,8 @@ class FileCacheBackend(BaseCacheBackend):
         self.max_size = config.get('cache', {}).get('max_size', 1024) * 1024 * 1024  # 默认1GB，转换为字节
         self.retention_days = config.get('cache', {}).get('retention_days', 7)
         
-        # 确保缓存目录存在
+        # 确保缓存目录存在，过期清理由 CacheJanitor 在后台定时执行
         os.makedirs(self.cache_dir, exist_ok=True)
-        
-        # 清理过期缓存
-        self.cleanup()
     
     def _get_file_path(self, key: str) -> str:
         """获取缓存文件路径"""
@@ -115,19 +113,29 @@ class FileCacheBackend(BaseCacheBackend):
                 return None
         return None
     
+    @staticmethod
+    def _write_atomic(file_path: str, content: str) -> None:
+        """先写入临时文件再替换，并发读取时不会读到写了一半的内容"""
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(temp_path, file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
     def set(self, key: str, value: str, expire: int = None) -> bool:
         """设置缓存值"""
         file_path = self._get_file_path(key)
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(value)
+            self._write_atomic(file_path, value)
             
             # 如果设置了过期时间，记录到元数据文件
             if expire is not None:
                 meta_file = f"{file_path}.meta"
                 expire_time = time.time() + expire
-                with open(meta_file, 'w', encoding='utf-8') as f:
-                    json.dump({"expire": expire_time}, f)
+                self._write_atomic(meta_file, json.dumps({"expire": expire_time}))
             
             return True
         except Exception as e:
@@ -172,7 +180,7 @@ class FileCacheBackend(BaseCacheBackend):
         result = []
         for root, dirs, files in os.walk(self.cache_dir):
             for file in files:
-                if not file.endswith('.meta'):  # 排除元数据文件
+                if not file.endswith(('.meta', '.tmp')):  # 排除元数据文件和写入中的临时文件
                     # 提取键
                     key = os.path.join(os.path.basename(root), file)
                     if pattern == "*" or pattern in key:
@@ -199,7 +207,7 @@ class FileCacheBackend(BaseCacheBackend):
         total_files = 0
         for root, dirs, files in os.walk(self.cache_dir):
             for file in files:
-                if not file.endswith('.meta'):  # 排除元数据文件
+                if not file.endswith(('.meta', '.tmp')):  # 排除元数据文件和写入中的临时文件
                     file_path = os.path.join(root, file)
                     total_size += os.path.getsize(file_path)
                     total_files += 1
@@ -445,9 +453,7 @@ class CacheManager:
         Returns:
             缓存键
         """
-        with open(file_path, 'rb') as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
-        return f"file:{file_hash}"
+        return f"file:{file_md5(file_path)}"
     
     def get_file_info_key(self, file_id: str) -> str:
         """
@@ -497,6 +503,18 @@ class CacheManager:
         """
         return f"url_mapping:{url_hash}"
     
+    def get_negative_key(self, md5_hash: str) -> str:
+        """
+        生成失败记录缓存键
+        
+        Args:
+            md5_hash: URL或文件内容的MD5值
+        
+        Returns:
+            缓存键
+        """
+        return f"negative:{md5_hash}"
+    
     def get_cache_path(self, cache_key: str) -> str:
         """
         获取缓存文件路径
@@ -3,14 +3,71 @@
 """
 
 import os
+import json
+import shutil
 import logging
+import time
+import tempfile
+import threading
 import subprocess
-from typing import Optional
-from ..utils.file import get_file_info, is_supported_format
+from typing import Optional, Tuple, Dict, Any
+from .office_pool import (get_office_pool, get_profile_slots, profile_url,
+                          OfficeWorkerError, OfficeTimeoutError, OfficeDocumentError)
+from .hashing import file_md5
+from .pdf_tools import PdfLinearizer
 
 # 获取日志记录器
 logger = logging.getLogger('file_preview')
 
+# 转换器支持的输入格式
+CONVERTIBLE_FORMATS = ['.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx']
+
+# 完整转换结果的变体名
+FULL_VARIANT = 'full'
+
+# 单次进程转换指定页码范围时，按输入格式选择PDF导出过滤器
+PDF_EXPORT_FILTERS = {
+    '.doc': 'writer_pdf_Export',
+    '.docx': 'writer_pdf_Export',
+    '.xls': 'calc_pdf_Export',
+    '.xlsx': 'calc_pdf_Export',
+    '.ppt': 'impress_pdf_Export',
+    '.pptx': 'impress_pdf_Export'
+}
+
+# 转换失败类型
+FAILURE_BAD_INPUT = 'bad_input'      # 文档本身无法加载或导出，重试结果相同
+FAILURE_TIMEOUT = 'timeout'          # 超过转换超时时间
+FAILURE_CRASH = 'crash'              # LibreOffice 进程崩溃或被信号结束
+FAILURE_NO_OUTPUT = 'no_output'      # 转换报告成功但没有生成输出文件
+FAILURE_ERROR = 'error'              # 其他错误
+FAILURE_CLASSES = (FAILURE_BAD_INPUT, FAILURE_TIMEOUT, FAILURE_CRASH, FAILURE_NO_OUTPUT, FAILURE_ERROR)
+
+# soffice 命令行输出中表示文档本身有问题的信息（小写）
+BAD_INPUT_PATTERNS = (
+    'source file could not be loaded',
+    'no export filter',
+    'general input/output error'
+)
+
+# 默认超时最多尝试的次数，超时的文档再次转换通常仍会超时
+DEFAULT_TIMEOUT_ATTEMPTS = 1
+
+# 进程崩溃后重试前的等待时间（秒），每次崩溃翻倍
+DEFAULT_RETRY_BACKOFF = 1.0
+
+def first_pages_variant(pages: int) -> str:
+    """
+    获取只包含前几页的转换结果变体名
+    
+    Args:
+        pages: 页数
+    
+    Returns:
+        变体名，如 first-5
+    """
+    return f"first-{pages}"
+
 class FileConverter:
     """
     文件转换器
@@ -28,185 +85,360 @@ class FileConverter:
         self.retry_times = config['conversion']['retry_times']
         self.libreoffice_path = config['conversion']['libreoffice_path']
         
+        # 按失败类型决定是否重试：文档错误不重试，超时单独限制次数，崩溃后等待一段时间再重试
+        self.timeout_attempts = config['conversion'].get('timeout_attempts', DEFAULT_TIMEOUT_ATTEMPTS)
+        self.retry_backoff = config['conversion'].get('retry_backoff', DEFAULT_RETRY_BACKOFF)
+        
+        # 各类失败次数和重试次数
+        self._stats_lock = threading.Lock()
+        self.failure_counts = {failure_class: 0 for failure_class in FAILURE_CLASSES}
+        self.retries = 0
+        
+        # 当前线程最近一次转换的失败原因
+        self._local = threading.local()
+        
+        # 常驻 LibreOffice 进程池，未安装 uno 模块时为 None，回退到单次进程转换
+        self.pool = get_office_pool(config)
+        
+        # 单次进程转换时每个并发槽位使用独立的用户配置目录
+        self.profile_slots = get_profile_slots(config)
+        
+        # 转换后的PDF线性化处理（可选）
+        self.linearizer = PdfLinearizer(config)
+        
         # 确保转换目录存在
         os.makedirs(self.convert_dir, exist_ok=True)
         
         logger.info(f"文件转换器初始化完成，转换目录: {self.convert_dir}")
     
-    def convert(self, input_path: str) -> Optional[str]:
+    def convert(self, input_path: str, pages: Optional[int] = None) -> Optional[str]:
         """
         转换文件为PDF
         
         Args:
             input_path: 输入文件路径
-            
+            pages: 只转换前几页或前几张幻灯片（可选），用于大文件的快速预览
+        
         Returns:
             转换后的PDF文件路径，如果转换失败则返回None
         """
+        self._local.failure = None
         try:
             # 检查文件是否存在
             if not os.path.exists(input_path):
                 logger.error(f"输入文件不存在: {input_path}")
                 return None
             
-            # 获取文件信息
-            file_info = get_file_info(input_path)
-            logger.info(f"开始转换文件: {file_info}")
+            filename = os.path.basename(input_path)
+            extension = os.path.splitext(filename)[1].lower()
+            logger.info(f"开始转换文件: {input_path}")
             
             # 检查文件格式
-            if not is_supported_format(input_path, {'conversion': {'supported_formats': ['.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx']}}):
-                logger.error(f"不支持的文件格式: {file_info['extension']}")
+            if extension not in CONVERTIBLE_FORMATS:
+                logger.error(f"不支持的文件格式: {extension}")
                 return None
             
-            # 获取项目根目录
-            root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-            
-            # 获取转换目录的绝对路径
-            convert_dir_abs = os.path.join(root_dir, self.convert_dir.lstrip("./"))
-            
-            # 确保转换目录存在
-            os.makedirs(convert_dir_abs, exist_ok=True)
-            
-            # 生成输出路径
-            output_path = os.path.join(
-                convert_dir_abs,
-                f"{os.path.splitext(file_info['filename'])[0]}.pdf"
-            )
+            # 按文件内容生成输出路径，内容相同的文件才会命中已有结果
+            variant = first_pages_variant(pages) if pages else FULL_VARIANT
+            output_path = self.get_output_path(input_path, 'pdf', variant)
             
             # 如果输出文件已存在，直接返回
             if os.path.exists(output_path):
                 logger.info(f"输出文件已存在: {output_path}")
                 return output_path
             
-            # 构建转换命令
-            cmd = [
-                self.libreoffice_path,
-                '--headless',
-                '--convert-to', 'pdf',
-                '--outdir', convert_dir_abs,
-                input_path
-            ]
-            
-            logger.info(f"执行转换命令: {' '.join(cmd)}")
+            page_range = f"1-{pages}" if pages else None
+            if self._run_conversion(input_path, output_path, 'pdf', page_range):
+                logger.info(f"文件转换成功: {output_path}")
+                return output_path
             
-            # 尝试转换
-            for attempt in range(self.retry_times):
-                try:
-                    process = subprocess.Popen(
-                        cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE
-                    )
-                    
-                    # 等待进程完成
-                    stdout, stderr = process.communicate(timeout=self.timeout)
-                    
-                    # 检查返回码
-                    if process.returncode == 0:
-                        logger.info(f"文件转换成功: {output_path}")
-                        return output_path
-                    else:
-                        logger.warning(f"转换失败 (尝试 {attempt + 1}/{self.retry_times}): {stderr.decode()}")
-                        
-                except subprocess.TimeoutExpired:
-                    logger.warning(f"转换超时 (尝试 {attempt + 1}/{self.retry_times})")
-                    process.kill()
-                    process.communicate()
-                except Exception as e:
-                    logger.error(f"转换过程中发生错误 (尝试 {attempt + 1}/{self.retry_times}): {str(e)}", exc_info=True)
-            
-            logger.error(f"转换失败，已达到最大重试次数: {self.retry_times}")
+            logger.error(f"转换失败: {input_path}, 原因: {self.last_failure}")
             return None
-            
+        
         except Exception as e:
             logger.error(f"转换文件时发生未知错误: {str(e)}", exc_info=True)
-            return None 
-            
+            return None
+    
     def convert_xls_to_xlsx(self, input_path: str) -> Optional[str]:
         """
         将XLS文件转换为XLSX格式
         
         Args:
             input_path: 输入文件路径
-            
+        
         Returns:
             转换后的XLSX文件路径，如果转换失败则返回None
         """
+        self._local.failure = None
         try:
             # 检查文件是否存在
             if not os.path.exists(input_path):
                 logger.error(f"输入文件不存在: {input_path}")
                 return None
             
-            # 获取文件信息
-            file_info = get_file_info(input_path)
-            logger.info(f"开始将XLS转换为XLSX: {file_info}")
+            filename = os.path.basename(input_path)
+            extension = os.path.splitext(filename)[1].lower()
+            logger.info(f"开始将XLS转换为XLSX: {input_path}")
             
             # 检查文件格式是否为xls
-            if file_info['extension'].lower() != '.xls':
-                logger.error(f"不是XLS文件格式: {file_info['extension']}")
+            if extension != '.xls':
+                logger.error(f"不是XLS文件格式: {extension}")
                 return None
             
-            # 获取项目根目录
-            root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-            
-            # 获取转换目录的绝对路径
-            convert_dir_abs = os.path.join(root_dir, self.convert_dir.lstrip("./"))
-            
-            # 确保转换目录存在
-            os.makedirs(convert_dir_abs, exist_ok=True)
-            
-            # 生成输出路径
-            output_path = os.path.join(
-                convert_dir_abs,
-                f"{os.path.splitext(file_info['filename'])[0]}.xlsx"
-            )
+            # 按文件内容生成输出路径
+            output_path = self.get_output_path(input_path, 'xlsx')
             
             # 如果输出文件已存在，直接返回
             if os.path.exists(output_path):
                 logger.info(f"输出文件已存在: {output_path}")
                 return output_path
             
+            if self._run_conversion(input_path, output_path, 'xlsx'):
+                logger.info(f"XLS转XLSX成功: {output_path}")
+                return output_path
+            
+            logger.error(f"XLS转XLSX失败: {input_path}, 原因: {self.last_failure}")
+            return None
+        
+        except Exception as e:
+            logger.error(f"转换XLS到XLSX时发生未知错误: {str(e)}", exc_info=True)
+            return None
+    
+    def _get_convert_dir(self) -> str:
+        """
+        获取并创建转换目录的绝对路径
+        
+        Returns:
+            转换目录绝对路径
+        """
+        # 获取项目根目录
+        root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+        
+        # 获取转换目录的绝对路径
+        convert_dir_abs = self.convert_dir
+        if not os.path.isabs(convert_dir_abs):
+            convert_dir_abs = os.path.join(root_dir, convert_dir_abs.lstrip("./"))
+        
+        # 确保转换目录存在
+        os.makedirs(convert_dir_abs, exist_ok=True)
+        
+        return convert_dir_abs
+    
+    def get_output_path(self, input_path: str, target: str, variant: str = FULL_VARIANT) -> str:
+        """
+        获取转换结果的存储路径
+        
+        路径按输入文件内容的MD5分目录：<转换目录>/<md5前两位>/<md5>/<变体>.<目标格式>，
+        不同来源的同名文件不会互相覆盖，内容相同的文件共享同一个结果。
+        
+        Args:
+            input_path: 输入文件路径
+            target: 目标格式（pdf、xlsx）
+            variant: 结果变体名，默认为完整转换
+        
+        Returns:
+            输出文件路径
+        """
+        digest = file_md5(input_path)
+        return os.path.join(self._get_convert_dir(), digest[:2], digest, f"{variant}.{target}")
+    
+    @property
+    def last_failure(self) -> Optional[Tuple[str, str]]:
+        """当前线程最近一次转换失败的 (失败类型, 错误信息)，转换成功或没有执行转换时为None"""
+        return getattr(self._local, 'failure', None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        
+        Returns:
+            统计信息字典，failures 为各类失败的次数，retries 为重试次数
+        """
+        with self._stats_lock:
+            return {
+                "retry_times": self.retry_times,
+                "timeout_attempts": self.timeout_attempts,
+                "failures": dict(self.failure_counts),
+                "retries": self.retries
+            }
+    
+    def _run_conversion(self, input_path: str, output_path: str, target: str,
+                        page_range: Optional[str] = None) -> bool:
+        """
+        执行转换，失败时按失败类型决定是否重试
+        
+        文档本身的错误重试结果相同，不再重试；超时最多尝试 timeout_attempts 次；
+        进程崩溃后等待 retry_backoff 秒（每次崩溃翻倍）再重试，进程池会换用新启动的工作进程。
+        总尝试次数不超过 retry_times，最后一次失败的原因可通过 last_failure 获取。
+        
+        转换结果先写入输出目录下的临时目录，成功后原子替换到输出路径，
+        并发转换同一文件时不会读到写了一半的结果。
+        
+        Args:
+            input_path: 输入文件路径
+            output_path: 输出文件路径
+            target: 目标格式（pdf、xlsx）
+            page_range: 导出的页码范围（可选），如 1-5，仅对PDF有效
+        
+        Returns:
+            是否转换成功
+        """
+        output_dir = os.path.dirname(output_path)
+        os.makedirs(output_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix='.converting-', dir=output_dir)
+        try:
+            # soffice 命令行按输入文件名命名输出文件
+            temp_path = os.path.join(temp_dir, f"{os.path.splitext(os.path.basename(input_path))[0]}.{target}")
+            timeouts = 0
+            crashes = 0
+            
+            for attempt in range(self.retry_times):
+                failure = self._attempt_conversion(input_path, temp_dir, temp_path, target, attempt, page_range)
+                if failure is None:
+                    self._local.failure = None
+                    
+                    # 线性化在替换前完成，已发布的结果始终是最终版本
+                    if target == 'pdf' and self.linearizer.linearize(temp_path):
+                        logger.info(f"PDF线性化完成: {output_path}")
+                    
+                    os.replace(temp_path, output_path)
+                    return True
+                
+                failure_class = failure[0]
+                self._local.failure = failure
+                with self._stats_lock:
+                    self.failure_counts[failure_class] += 1
+                
+                if failure_class == FAILURE_BAD_INPUT:
+                    logger.warning(f"文档无法转换，不再重试: {input_path}")
+                    break
+                if failure_class == FAILURE_TIMEOUT:
+                    timeouts += 1
+                    if timeouts >= self.timeout_attempts:
+                        logger.warning(f"转换超时 {timeouts} 次，不再重试: {input_path}")
+                        break
+                if attempt + 1 >= self.retry_times:
+                    break
+                
+                with self._stats_lock:
+                    self.retries += 1
+                if failure_class == FAILURE_CRASH and self.retry_backoff:
+                    crashes += 1
+                    time.sleep(self.retry_backoff * 2 ** (crashes - 1))
+            return False
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def _attempt_conversion(self, input_path: str, temp_dir: str, temp_path: str, target: str, attempt: int,
+                            page_range: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """
+        执行一次转换
+        
+        Args:
+            input_path: 输入文件路径
+            temp_dir: 临时输出目录
+            temp_path: 临时输出文件路径
+            target: 目标格式（pdf、xlsx）
+            attempt: 当前尝试序号（从0开始）
+            page_range: 导出的页码范围（可选）
+        
+        Returns:
+            成功时返回None，失败时返回 (失败类型, 错误信息)
+        """
+        if self.pool is not None:
+            filter_data = {'PageRange': page_range} if page_range else None
+            try:
+                self.pool.convert(input_path, temp_path, target, self.timeout, filter_data)
+            except OfficeDocumentError as e:
+                logger.warning(f"转换失败 (尝试 {attempt + 1}/{self.retry_times}): {str(e)}")
+                return FAILURE_BAD_INPUT, str(e)
+            except OfficeTimeoutError as e:
+                logger.warning(f"转换超时 (尝试 {attempt + 1}/{self.retry_times}): {str(e)}")
+                return FAILURE_TIMEOUT, str(e)
+            except OfficeWorkerError as e:
+                # 进程池已结束出错的工作进程，重试时会启动新的进程
+                logger.warning(f"转换进程异常 (尝试 {attempt + 1}/{self.retry_times}): {str(e)}")
+                return FAILURE_CRASH, str(e)
+            except Exception as e:
+                logger.error(f"转换过程中发生错误 (尝试 {attempt + 1}/{self.retry_times}): {str(e)}", exc_info=True)
+                return FAILURE_ERROR, str(e)
+        else:
+            failure = self._convert_with_subprocess(input_path, temp_dir, target, attempt, page_range)
+            if failure is not None:
+                return failure
+        
+        if not os.path.exists(temp_path):
+            logger.warning(f"转换未生成输出文件 (尝试 {attempt + 1}/{self.retry_times}): {temp_path}")
+            return FAILURE_NO_OUTPUT, "转换未生成输出文件"
+        return None
+    
+    def _convert_with_subprocess(self, input_path: str, output_dir: str, target: str, attempt: int,
+                                 page_range: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """
+        启动独立的 soffice 进程执行一次转换
+        
+        soffice 无法加载文档时也可能正常退出，因此返回码为0时也检查输出中的错误信息。
+        
+        Args:
+            input_path: 输入文件路径
+            output_dir: 输出目录
+            target: 目标格式（pdf、xlsx）
+            attempt: 当前尝试序号（从0开始）
+            page_range: 导出的页码范围（可选）
+        
+        Returns:
+            成功时返回None，失败时返回 (失败类型, 错误信息)
+        """
+        convert_to = target
+        if page_range:
+            # 命令行通过 JSON 格式的过滤器选项指定页码范围（LibreOffice 7.4 及以上）
+            filter_name = PDF_EXPORT_FILTERS.get(os.path.splitext(input_path)[1].lower(), 'writer_pdf_Export')
+            filter_options = json.dumps({'PageRange': {'type': 'string', 'value': page_range}})
+            convert_to = f"{target}:{filter_name}:{filter_options}"
+        
+        with self.profile_slots.acquire() as profile_path:
             # 构建转换命令
             cmd = [
                 self.libreoffice_path,
+                f'-env:UserInstallation={profile_url(profile_path)}',
                 '--headless',
-                '--convert-to', 'xlsx',
-                '--outdir', convert_dir_abs,
+                '--convert-to', convert_to,
+                '--outdir', output_dir,
                 input_path
             ]
             
             logger.info(f"执行转换命令: {' '.join(cmd)}")
             
-            # 尝试转换
-            for attempt in range(self.retry_times):
-                try:
-                    process = subprocess.Popen(
-                        cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE
-                    )
-                    
-                    # 等待进程完成
-                    stdout, stderr = process.communicate(timeout=self.timeout)
-                    
-                    # 检查返回码
-                    if process.returncode == 0:
-                        logger.info(f"XLS转XLSX成功: {output_path}")
-                        return output_path
-                    else:
-                        logger.warning(f"转换失败 (尝试 {attempt + 1}/{self.retry_times}): {stderr.decode()}")
-                        
-                except subprocess.TimeoutExpired:
-                    logger.warning(f"转换超时 (尝试 {attempt + 1}/{self.retry_times})")
-                    process.kill()
-                    process.communicate()
-                except Exception as e:
-                    logger.error(f"转换过程中发生错误 (尝试 {attempt + 1}/{self.retry_times}): {str(e)}", exc_info=True)
-            
-            logger.error(f"XLS转XLSX失败，已达到最大重试次数: {self.retry_times}")
-            return None
+            try:
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+                
+                # 等待进程完成
+                stdout, stderr = process.communicate(timeout=self.timeout)
+                output = (stdout + stderr).decode(errors='replace').strip()
+                
+                if any(pattern in output.lower() for pattern in BAD_INPUT_PATTERNS):
+                    logger.warning(f"文档无法转换 (尝试 {attempt + 1}/{self.retry_times}): {output}")
+                    return FAILURE_BAD_INPUT, output
+                
+                # 检查返回码
+                if process.returncode == 0:
+                    return None
+                logger.warning(f"转换失败 (尝试 {attempt + 1}/{self.retry_times}): {stderr.decode(errors='replace')}")
+                
+                # 返回码为负数表示进程被信号结束
+                if process.returncode < 0:
+                    return FAILURE_CRASH, f"soffice 被信号 {-process.returncode} 结束"
+                return FAILURE_ERROR, f"soffice 返回码: {process.returncode}"
             
-        except Exception as e:
-            logger.error(f"转换XLS到XLSX时发生未知错误: {str(e)}", exc_info=True)
-            return None 
\ No newline at end of file
+            except subprocess.TimeoutExpired:
+                logger.warning(f"转换超时 (尝试 {attempt + 1}/{self.retry_times})")
+                process.kill()
+                process.communicate()
+                return FAILURE_TIMEOUT, f"转换超时: {self.timeout}秒"
+            except Exception as e:
+                logger.error(f"转换过程中发生错误 (尝试 {attempt + 1}/{self.retry_times}): {str(e)}", exc_info=True)
+                return FAILURE_ERROR, str(e)
\ No newline at end of file
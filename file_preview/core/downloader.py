@@ -3,30 +3,149 @@
 """
 
 import os
+import json
 import logging
-import requests
-from typing import Optional
+import tempfile
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Set
 from urllib.parse import urlparse
-from ..utils.file import get_file_info
 import time
+import requests
+from .hashing import save_chunks, remember_md5, RangeHasher
+from .http_pool import HttpSessionPool
+from .origin_limiter import OriginLimiter, OriginSlot
+from .sniffing import sniff_formats
+from .negative_cache import NegativeCache, get_url_key, classify_status
 
 # 获取日志记录器
 logger = logging.getLogger('file_preview')
 
+# 默认配置
+DEFAULT_STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_RANGE_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_PARALLEL_MIN_SIZE = 32 * 1024 * 1024
+DEFAULT_PARALLEL_CONNECTIONS = 4
+DEFAULT_RANGE_RETRIES = 2
+DEFAULT_MAX_SIZE = 200 * 1024 * 1024
+DEFAULT_MAX_TIME = 600
+DEFAULT_RESUME_MAX_AGE = 24 * 3600
+
+# 分段下载的 .part 文件、分段清单及其写入时的临时文件
+PART_SUFFIXES = ('.part', '.part.json', '.part.json.tmp')
+
+class DownloadRejectedError(Exception):
+    """下载超出大小或时间上限，或文件格式不支持"""
+    pass
+
+def get_validators(headers) -> Dict[str, Any]:
+    """
+    从响应头提取用于重新验证的校验信息
+    
+    Args:
+        headers: 响应头
+    
+    Returns:
+        {'etag': ..., 'last_modified': ..., 'content_length': ...}，缺少的项为None
+    """
+    validators = {}
+    for key, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified'), ('content_length', 'Content-Length')):
+        value = headers.get(header)
+        validators[key] = value if isinstance(value, str) else None
+    return validators
+
+def get_download_dir(download_dir: str) -> str:
+    """
+    获取下载目录的绝对路径，相对路径相对于项目根目录
+    
+    Args:
+        download_dir: 配置的下载目录
+    
+    Returns:
+        下载目录绝对路径
+    """
+    if os.path.isabs(download_dir):
+        return download_dir
+    root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+    return os.path.join(root_dir, download_dir.lstrip("./"))
+
+def remove_stale_parts(config: Dict[str, Any]) -> int:
+    """
+    删除下载目录中超过 download.resume_max_age 秒未更新的 .part 文件和分段清单
+    
+    中断的分段下载如果之后没有再次下载同一URL，断点续传文件会一直留在下载目录中。
+    正在下载的文件在每个分段完成时都会更新，不会被删除。
+    
+    Args:
+        config: 配置字典
+    
+    Returns:
+        删除的文件数
+    """
+    max_age = config.get('download', {}).get('resume_max_age', DEFAULT_RESUME_MAX_AGE)
+    download_dir = get_download_dir(config['directories']['download'])
+    if not os.path.isdir(download_dir):
+        return 0
+    
+    removed = 0
+    now = time.time()
+    for entry in os.scandir(download_dir):
+        if not entry.is_file() or not entry.name.endswith(PART_SUFFIXES):
+            continue
+        try:
+            if now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass
+    if removed:
+        logger.info(f"删除过期的断点续传文件: {removed} 个")
+    return removed
+
 class FileDownloader:
     """
     文件下载器，用于下载网络文件
     """
     
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, negative_cache: Optional[NegativeCache] = None):
         """
         初始化下载器
         
         Args:
             config: 配置字典
+            negative_cache: 失败结果缓存（可选），提供时退避时间内不再下载失败过的URL
         """
         self.download_dir = config['directories']['download']
-        self.timeout = config['conversion']['timeout']
+        self.timeout = config.get('performance', {}).get('download_timeout', 30)
+        
+        # 下载器在进程内共享，所有下载复用同一个HTTP连接池
+        self.http = HttpSessionPool(config)
+        
+        # 按源站限制并发连接数和带宽，所有下载共用
+        self.limiter = OriginLimiter(config)
+        
+        # 大文件分段并行下载配置
+        download_config = config.get('download', {})
+        self.stream_chunk_size = download_config.get('stream_chunk_size', DEFAULT_STREAM_CHUNK_SIZE)
+        self.range_chunk_size = download_config.get('chunk_size', DEFAULT_RANGE_CHUNK_SIZE)
+        self.parallel_min_size = download_config.get('parallel_min_size', DEFAULT_PARALLEL_MIN_SIZE)
+        self.parallel_connections = download_config.get('parallel_connections', DEFAULT_PARALLEL_CONNECTIONS)
+        self.range_retries = download_config.get('range_retries', DEFAULT_RANGE_RETRIES)
+        
+        # 单个文件的大小和总时间上限，0 表示不限制
+        self.max_size = download_config.get('max_size', DEFAULT_MAX_SIZE)
+        self.max_time = download_config.get('max_time', DEFAULT_MAX_TIME)
+        
+        # 根据文件开头识别格式，不支持的格式不再继续下载
+        self.sniff = download_config.get('sniff', True)
+        self.supported_formats = set(config.get('conversion', {}).get('supported_formats') or [])
+        
+        self.negative_cache = negative_cache
+        
+        # 正在分段下载的URL，同一URL同时只有一个下载使用断点续传文件
+        self._resume_lock = threading.Lock()
+        self._resuming = set()
         
         # 确保下载目录存在
         os.makedirs(self.download_dir, exist_ok=True)
@@ -43,55 +162,601 @@ class FileDownloader:
         Returns:
             下载后的文件路径，如果下载失败则返回None
         """
+        result = self.fetch(url)
+        return result['path'] if result else None
+    
+    def fetch(self, url: str, slot: Optional[OriginSlot] = None) -> Optional[Dict[str, Any]]:
+        """
+        下载文件，写入磁盘的同时计算内容MD5
+        
+        Args:
+            url: 文件URL
+            slot: 调用方已占用的源站连接名额（可选），下载结束时释放；未提供时在这里等待名额
+        
+        Returns:
+            下载结果 {'path': 文件路径, 'filename': 原始文件名, 'md5': 内容MD5, 'size': 字节数,
+            'validators': 响应的校验信息}，如果下载失败、超出大小或时间上限、格式不支持则返回None
+        """
+        # 退避时间内不再下载失败过的URL
+        if self.get_failure(url):
+            if slot is not None:
+                slot.release()
+            return None
+        
+        response = None
+        output_path = None
+        result = None
         try:
-            # 获取文件名
-            filename = url.split('/')[-1]
-            if '?' in filename:
-                filename = filename.split('?')[0]
-            
-            # 处理文件名（确保文件名合法）
-            if not filename:
-                filename = f"downloaded_file_{int(time.time())}"
-            
-            # 获取项目根目录
-            root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-            
-            # 获取下载目录的绝对路径
-            download_dir_abs = os.path.join(root_dir, self.download_dir.lstrip("./"))
+            # 总时间上限从发出请求开始计算
+            deadline = self.get_deadline()
+            filename = self.get_filename(url)
             
-            # 确保下载目录存在
-            os.makedirs(download_dir_abs, exist_ok=True)
+            # 等待源站的连接名额
+            if slot is None:
+                slot = self.limiter.acquire(url)
             
-            # 生成输出路径
-            output_path = os.path.join(download_dir_abs, filename)
-            
-            logger.info(f"开始下载文件: {url} -> {output_path}")
+            logger.info(f"开始下载文件: {url}")
             
             # 下载文件
-            response = requests.get(url, stream=True, timeout=30)
+            response = self.http.get(url, stream=True, timeout=self.timeout)
             
             # 检查响应状态
             if response.status_code != 200:
                 logger.error(f"下载失败，响应状态: {response.status_code}")
+                response.close()
+                self.record_failure(url, classify_status(response.status_code),
+                                    f"下载失败，响应状态: {response.status_code}")
                 return None
             
-            # 写入文件
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # 声明的大小超过上限时不下载
+            self.check_declared_size(response.headers)
+            
+            # 先读取开头的数据识别格式
+            chunks = iter(response.iter_content(chunk_size=self.stream_chunk_size))
+            head = next(chunks, b'')
+            filename = self.check_format(head, filename)
+            
+            # 每次下载写入唯一的临时文件，同名文件并发下载时互不覆盖
+            output_path = self.get_output_path(filename)
+            
+            # 大文件且服务端支持分段请求时，改为多个连接并行下载
+            total_size = self.get_parallel_size(response.headers)
+            if total_size:
+                # 各分段请求分别占用连接名额
+                response.close()
+                slot.release()
+                result = self.fetch_ranges(url, output_path, total_size, response.headers, deadline)
+                if result:
+                    result['filename'] = filename
+                return result
+            
+            # 写入文件，超出大小或时间上限时中止
+            content_md5, size = save_chunks(self._limit_chunks(url, itertools.chain([head], chunks), deadline),
+                                            output_path)
             
             # 检查文件是否下载成功
-            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                logger.info(f"文件下载成功: {output_path}, 大小: {os.path.getsize(output_path)} 字节")
-                return output_path
-            else:
-                logger.error(f"文件下载失败: {output_path}")
+            if size == 0:
+                logger.error(f"文件下载失败，内容为空: {url}")
+                self.record_failure(url, 'empty', "下载的文件为空")
                 return None
             
+            logger.info(f"文件下载成功: {url} -> {output_path}, 大小: {size} 字节")
+            self.clear_failure(url)
+            result = {
+                'path': output_path,
+                'filename': filename,
+                'md5': content_md5,
+                'size': size,
+                'validators': get_validators(response.headers)
+            }
+            return result
+        
+        except DownloadRejectedError as e:
+            logger.warning(f"中止下载: {url}, {str(e)}")
+            self.record_failure(url, 'rejected', str(e))
+            return None
+        except requests.RequestException as e:
+            logger.error(f"下载请求失败: {url}, {str(e)}")
+            self.record_failure(url, 'network', f"下载请求失败: {str(e)}")
+            return None
         except Exception as e:
             logger.error(f"下载过程中发生错误: {str(e)}", exc_info=True)
             return None
+        finally:
+            if response is not None:
+                response.close()
+            if slot is not None:
+                slot.release()
+            # 下载失败时删除写了一部分的文件
+            if result is None and output_path:
+                self.cleanup(output_path)
+    
+    def get_failure(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        获取URL仍在退避时间内的失败记录
+        
+        Args:
+            url: 文件URL
+        
+        Returns:
+            失败记录，没有时返回None
+        """
+        if self.negative_cache is None:
+            return None
+        entry = self.negative_cache.get(get_url_key(url))
+        if entry:
+            logger.info(f"URL最近下载失败，{entry['retry_after']} 秒后才会重试: {url}, {entry['error']}")
+        return entry
+    
+    def record_failure(self, url: str, failure_class: str, error: str) -> None:
+        """
+        记录URL下载失败
+        
+        Args:
+            url: 文件URL
+            failure_class: 失败类型
+            error: 错误信息
+        """
+        if self.negative_cache is not None:
+            self.negative_cache.record(get_url_key(url), failure_class, error)
+    
+    def clear_failure(self, url: str) -> None:
+        """
+        下载成功后清除URL的失败记录
+        
+        Args:
+            url: 文件URL
+        """
+        if self.negative_cache is not None:
+            self.negative_cache.clear(get_url_key(url))
+    
+    @staticmethod
+    def get_filename(url: str) -> str:
+        """
+        根据URL获取原始文件名
+        
+        Args:
+            url: 文件URL
+        
+        Returns:
+            文件名
+        """
+        # 获取文件名
+        filename = url.split('/')[-1]
+        if '?' in filename:
+            filename = filename.split('?')[0]
+        
+        # 处理文件名（确保文件名合法）
+        if not filename:
+            filename = f"downloaded_file_{int(time.time())}"
+        return filename
+    
+    def _get_download_dir(self) -> str:
+        """
+        获取并创建下载目录的绝对路径
+        
+        Returns:
+            下载目录绝对路径
+        """
+        download_dir_abs = get_download_dir(self.download_dir)
+        
+        # 确保下载目录存在
+        os.makedirs(download_dir_abs, exist_ok=True)
+        
+        return download_dir_abs
+    
+    def get_output_path(self, filename: str) -> str:
+        """
+        在下载目录中创建本次下载的临时文件
+        
+        文件名随机生成，只保留原始文件名的扩展名，不同URL的同名文件并发下载时互不覆盖。
+        原始文件名由调用方作为元数据保存。
+        
+        Args:
+            filename: 原始文件名
+        
+        Returns:
+            临时文件路径
+        """
+        fd, output_path = tempfile.mkstemp(dir=self._get_download_dir(), suffix=os.path.splitext(filename)[1])
+        os.close(fd)
+        return output_path
+    
+    def get_resume_path(self, url: str) -> str:
+        """
+        获取URL分段下载的断点续传文件路径（不含 .part 后缀），按URL的MD5命名
+        
+        Args:
+            url: 文件URL
+        
+        Returns:
+            下载目录下的文件路径
+        """
+        return os.path.join(self._get_download_dir(), get_url_key(url))
+    
+    def get_deadline(self) -> Optional[float]:
+        """
+        计算本次下载的截止时间
+        
+        Returns:
+            截止时间（time.monotonic），不限制时间时返回None
+        """
+        return time.monotonic() + self.max_time if self.max_time else None
+    
+    def check_declared_size(self, headers) -> None:
+        """
+        检查响应头声明的文件大小
+        
+        Args:
+            headers: 响应头
+        
+        Raises:
+            DownloadRejectedError: 声明的大小超过上限
+        """
+        content_length = get_validators(headers)['content_length']
+        if self.max_size and content_length and content_length.isdigit() and int(content_length) > self.max_size:
+            raise DownloadRejectedError(f"文件大小 {content_length} 字节超过上限 {self.max_size} 字节")
+    
+    def check_progress(self, size: int, deadline: Optional[float]) -> None:
+        """
+        检查已下载的字节数和时间
+        
+        Args:
+            size: 已下载的字节数
+            deadline: 截止时间（time.monotonic），None 表示不限制
+        
+        Raises:
+            DownloadRejectedError: 超出大小或时间上限
+        """
+        if self.max_size and size > self.max_size:
+            raise DownloadRejectedError(f"文件超过大小上限 {self.max_size} 字节")
+        if deadline is not None and time.monotonic() > deadline:
+            raise DownloadRejectedError(f"下载超过时间上限 {self.max_time} 秒")
+    
+    def check_format(self, head: bytes, filename: str) -> str:
+        """
+        根据文件开头的字节检查格式是否支持
+        
+        Args:
+            head: 文件开头的字节
+            filename: 原始文件名
+        
+        Returns:
+            文件名，没有扩展名且格式唯一确定时补上扩展名
+        
+        Raises:
+            DownloadRejectedError: 识别出的格式不在支持列表中
+        """
+        if not self.sniff:
+            return filename
+        
+        formats = sniff_formats(head)
+        if formats is None:
+            return filename
+        
+        if self.supported_formats and not formats & self.supported_formats:
+            raise DownloadRejectedError(f"不支持的文件格式: {', '.join(sorted(formats))}")
+        
+        if not os.path.splitext(filename)[1] and len(formats) == 1:
+            filename += next(iter(formats))
+        return filename
+    
+    def _limit_chunks(self, url: str, chunks, deadline: Optional[float]):
+        """
+        逐块检查已下载的字节数和时间，并按带宽限制控制速度
+        
+        Args:
+            url: 文件URL
+            chunks: 数据块迭代器
+            deadline: 截止时间（time.monotonic），None 表示不限制
+        
+        Yields:
+            数据块
+        
+        Raises:
+            DownloadRejectedError: 超出大小或时间上限
+        """
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            self.check_progress(size, deadline)
+            self.throttle(url, len(chunk))
+            yield chunk
+    
+    def throttle(self, url: str, amount: int) -> None:
+        """
+        记录下载的字节数，超出带宽限制时等待
+        
+        Args:
+            url: 文件URL
+            amount: 本次下载的字节数
+        """
+        delay = self.limiter.throttle(url, amount)
+        if delay:
+            time.sleep(delay)
+    
+    def revalidate(self, url: str, validators: Dict[str, Any]) -> Optional[bool]:
+        """
+        用条件请求检查远程文件是否变化，不下载文件内容
+        
+        Args:
+            url: 文件URL
+            validators: 上次下载时记录的校验信息（etag、last_modified、content_length）
+        
+        Returns:
+            未变化返回True，已变化返回False，无法判断（请求失败）时返回None
+        """
+        request_headers = {}
+        if validators.get('etag'):
+            request_headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            request_headers['If-Modified-Since'] = validators['last_modified']
+        if not request_headers:
+            return None
+        
+        try:
+            response = self.http.get(url, headers=request_headers, stream=True, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"重新验证失败: {url}, {str(e)}")
+            return None
+        
+        try:
+            if response.status_code == 304:
+                return True
+            if response.status_code != 200:
+                logger.warning(f"重新验证失败: {url}, 响应状态: {response.status_code}")
+                return None
+            
+            # 服务端不支持条件请求时直接比较校验信息
+            current = get_validators(response.headers)
+            return all(current.get(key) == validators.get(key) for key in ('etag', 'last_modified', 'content_length'))
+        finally:
+            response.close()
+    
+    def get_parallel_size(self, headers) -> Optional[int]:
+        """
+        根据响应头判断是否使用分段并行下载，同步和异步下载共用
+        
+        Args:
+            headers: 下载请求的响应头
+        
+        Returns:
+            文件大小，不满足条件时返回None
+        """
+        if self.parallel_connections <= 1:
+            return None
+        if str(headers.get('Accept-Ranges', '')).lower() != 'bytes':
+            return None
+        # 压缩传输时 Content-Length 不是文件本身的大小
+        if headers.get('Content-Encoding'):
+            return None
+        try:
+            total_size = int(headers.get('Content-Length'))
+        except (TypeError, ValueError):
+            return None
+        return total_size if total_size >= self.parallel_min_size else None
+    
+    def fetch_ranges(self, url: str, output_path: str, total_size: int, headers: Dict[str, str],
+                     deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        分段并行下载到预分配的 .part 文件，已完成的分段记录在清单文件中
+        
+        同步下载和异步下载引擎在 get_parallel_size 返回文件大小后调用，调用前应释放首次请求占用的连接名额。
+        
+        断点续传文件按URL的MD5命名，中断后再次下载同一URL时，如果文件大小和 ETag/Last-Modified 未变化，
+        只下载未完成的分段。响应没有强 ETag 或 Last-Modified 时无法确认远程文件未变化，不续传。同一URL已有下载在使用断点续传文件时，本次下载改用自己的 .part 文件，结束后不保留。
+        
+        Args:
+            url: 文件URL
+            output_path: 输出文件路径
+            total_size: 文件大小
+            headers: 首次请求的响应头
+            deadline: 截止时间（time.monotonic），超时未完成的分段保留到下次继续
+        
+        Returns:
+            下载结果，有分段失败时返回None，已下载的部分保留到下次继续
+        
+        Raises:
+            DownloadRejectedError: 超过时间上限，此时不保留已下载的部分
+        """
+        resume_key = get_url_key(url)
+        with self._resume_lock:
+            resumable = resume_key not in self._resuming
+            self._resuming.add(resume_key)
+        
+        part_path = f"{self.get_resume_path(url) if resumable else output_path}.part"
+        manifest_path = f"{part_path}.json"
+        try:
+            result = self._fetch_parts(url, output_path, part_path, manifest_path, total_size, headers, deadline)
+        finally:
+            if resumable:
+                with self._resume_lock:
+                    self._resuming.discard(resume_key)
+        
+        if result is None and not resumable:
+            self.cleanup(part_path)
+            self.cleanup(manifest_path)
+        return result
+    
+    def _fetch_parts(self, url: str, output_path: str, part_path: str, manifest_path: str, total_size: int,
+                     headers: Dict[str, str], deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        分段并行下载到 .part 文件，完成后替换到输出路径
+        
+        Args:
+            url: 文件URL
+            output_path: 输出文件路径
+            part_path: .part 文件路径
+            manifest_path: 分段清单文件路径
+            total_size: 文件大小
+            headers: 首次请求的响应头
+            deadline: 截止时间（time.monotonic）
+        
+        Returns:
+            下载结果，有分段失败时返回None
+        
+        Raises:
+            DownloadRejectedError: 超过时间上限
+        """
+        # 弱 ETag 不能用于 If-Range
+        etag = headers.get('ETag')
+        if etag and etag.startswith('W/'):
+            etag = None
+        
+        manifest = {
+            'url': url,
+            'size': total_size,
+            'chunk_size': self.range_chunk_size,
+            'etag': etag,
+            'last_modified': headers.get('Last-Modified'),
+            'done': []
+        }
+        
+        # 没有校验信息时无法确认远程文件未变化，已下载的部分不能续传
+        validator = etag or manifest['last_modified']
+        
+        previous = self._load_manifest(manifest_path) if validator else None
+        if (previous and os.path.exists(part_path) and os.path.getsize(part_path) == total_size
+                and all(previous.get(key) == manifest[key] for key in ('url', 'size', 'chunk_size', 'etag', 'last_modified'))):
+            done = set(previous.get('done', []))
+            logger.info(f"继续未完成的下载: {url}, 已完成 {len(done)} 个分段")
+        else:
+            done = set()
+            with open(part_path, 'wb') as f:
+                f.truncate(total_size)
+            self._save_manifest(manifest_path, manifest)
+        
+        ranges = [(index, start, min(start + self.range_chunk_size, total_size) - 1)
+                  for index, start in enumerate(range(0, total_size, self.range_chunk_size))]
+        pending = [item for item in ranges if item[0] not in done]
+        logger.info(f"分段下载: {url}, 大小: {total_size} 字节, 待下载分段: {len(pending)}/{len(ranges)}")
+        
+        # 分段完成时按顺序计算MD5，上次已完成的分段先计入
+        hasher = RangeHasher(part_path, [(start, end) for _, start, end in ranges])
+        for index in sorted(done):
+            hasher.complete(index)
+        
+        lock = threading.Lock()
+        rejected = threading.Event()
+        
+        def fetch_range(item) -> bool:
+            index, start, end = item
+            for attempt in range(self.range_retries + 1):
+                if rejected.is_set():
+                    return False
+                try:
+                    self._download_range(url, part_path, start, end, validator, deadline)
+                except DownloadRejectedError:
+                    # 其他分段不再开始新的尝试
+                    rejected.set()
+                    raise
+                except Exception as e:
+                    logger.warning(f"分段下载失败 (bytes={start}-{end}, 尝试 {attempt + 1}/{self.range_retries + 1}): {str(e)}")
+                    continue
+                self._mark_done(manifest_path, manifest, done, index, lock)
+                hasher.complete(index)
+                return True
+            return False
+        
+        if pending:
+            try:
+                with ThreadPoolExecutor(max_workers=min(self.parallel_connections, len(pending))) as executor:
+                    results = list(executor.map(fetch_range, pending))
+            except DownloadRejectedError:
+                # 超出上限的下载下次同样会被中止，不保留已下载的部分
+                self.cleanup(part_path)
+                self.cleanup(manifest_path)
+                raise
+            if not all(results):
+                if not validator:
+                    logger.error(f"分段下载未完成，响应没有 ETag/Last-Modified，不保留已下载部分: {part_path}")
+                    self.cleanup(part_path)
+                    self.cleanup(manifest_path)
+                    return None
+                logger.error(f"分段下载未完成，已下载部分保留到下次继续: {part_path}")
+                return None
+        
+        os.replace(part_path, output_path)
+        os.remove(manifest_path)
+        
+        content_md5 = hasher.hexdigest()
+        remember_md5(output_path, content_md5)
+        logger.info(f"文件下载成功: {output_path}, 大小: {total_size} 字节")
+        self.clear_failure(url)
+        return {
+            'path': output_path,
+            'md5': content_md5,
+            'size': total_size,
+            'validators': get_validators(headers)
+        }
+    
+    def _download_range(self, url: str, part_path: str, start: int, end: int, if_range: Optional[str],
+                        deadline: Optional[float] = None) -> None:
+        """
+        下载一个分段并写入 .part 文件的对应位置
+        
+        Args:
+            url: 文件URL
+            part_path: .part 文件路径
+            start: 起始字节
+            end: 结束字节（包含）
+            if_range: If-Range 校验值，文件已变化时服务端返回完整内容而不是分段
+            deadline: 截止时间（time.monotonic）
+        
+        Raises:
+            IOError: 服务端未返回分段内容或长度不符
+            DownloadRejectedError: 超过时间上限
+        """
+        request_headers = {'Range': f"bytes={start}-{end}"}
+        if if_range:
+            request_headers['If-Range'] = if_range
+        
+        # 每个分段请求占用一个源站连接名额
+        with self.limiter.acquire(url):
+            response = self.http.get(url, headers=request_headers, stream=True, timeout=self.timeout)
+            try:
+                if response.status_code != 206:
+                    raise IOError(f"服务端未返回分段内容，响应状态: {response.status_code}")
+                
+                written = 0
+                with open(part_path, 'r+b') as f:
+                    f.seek(start)
+                    for chunk in response.iter_content(chunk_size=self.stream_chunk_size):
+                        if deadline is not None and time.monotonic() > deadline:
+                            raise DownloadRejectedError(f"下载超过时间上限 {self.max_time} 秒")
+                        f.write(chunk)
+                        written += len(chunk)
+                        self.throttle(url, len(chunk))
+                
+                if written != end - start + 1:
+                    raise IOError(f"分段长度不符: 应为 {end - start + 1} 字节，实际 {written} 字节")
+            finally:
+                response.close()
+    
+    @staticmethod
+    def _load_manifest(manifest_path: str) -> Optional[Dict[str, Any]]:
+        """读取分段下载清单，不存在或损坏时返回None"""
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    @staticmethod
+    def _save_manifest(manifest_path: str, manifest: Dict[str, Any]) -> None:
+        """写入分段下载清单，先写临时文件再替换"""
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
+    
+    def _mark_done(self, manifest_path: str, manifest: Dict[str, Any], done: Set[int], index: int,
+                   lock: threading.Lock) -> None:
+        """记录已完成的分段"""
+        with lock:
+            done.add(index)
+            manifest['done'] = sorted(done)
+            self._save_manifest(manifest_path, manifest)
     
     def cleanup(self, file_path: str) -> None:
         """
@@ -0,0 +1,237 @@
+"""
+文件内容摘要
+分块流式计算MD5，并按文件状态缓存计算结果
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, List, Iterable, Iterator, BinaryIO
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 每次读取的块大小（字节）
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 最多缓存的文件摘要数
+MAX_CACHED_DIGESTS = 4096
+
+class FileDigestCache:
+    """
+    文件摘要缓存
+    
+    以 (路径, 大小, 修改时间, inode) 为键，文件被修改或替换后键随之变化，旧结果不会被误用。
+    """
+    
+    def __init__(self, max_entries: int = MAX_CACHED_DIGESTS):
+        """
+        初始化缓存
+        
+        Args:
+            max_entries: 最多缓存的条目数
+        """
+        self.max_entries = max_entries
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def fingerprint(file_path: str) -> Tuple[str, int, int, int]:
+        """
+        生成文件状态指纹
+        
+        Args:
+            file_path: 文件路径
+        
+        Returns:
+            (绝对路径, 大小, 修改时间纳秒, inode)
+        
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    
+    def get(self, fingerprint: Tuple[str, int, int, int]) -> Optional[str]:
+        """获取缓存的摘要"""
+        with self._lock:
+            digest = self._digests.get(fingerprint)
+            if digest is None:
+                self.misses += 1
+                return None
+            self._digests.move_to_end(fingerprint)
+            self.hits += 1
+            return digest
+    
+    def put(self, fingerprint: Tuple[str, int, int, int], digest: str) -> None:
+        """缓存摘要，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._digests[fingerprint] = digest
+            self._digests.move_to_end(fingerprint)
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._digests),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+# 进程级共享的摘要缓存
+digest_cache = FileDigestCache()
+
+def compute_file_md5(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    分块读取文件计算MD5，不缓存结果
+    
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的块大小
+    
+    Returns:
+        MD5值
+    """
+    hash_md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+def file_md5(file_path: str) -> str:
+    """
+    计算文件MD5，文件未变化时直接返回缓存的结果
+    
+    Args:
+        file_path: 文件路径
+    
+    Returns:
+        MD5值
+    
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    fingerprint = digest_cache.fingerprint(file_path)
+    digest = digest_cache.get(fingerprint)
+    if digest is None:
+        digest = compute_file_md5(file_path)
+        # 计算期间文件被修改时不缓存
+        if digest_cache.fingerprint(file_path) == fingerprint:
+            digest_cache.put(fingerprint, digest)
+    return digest
+
+def remember_md5(file_path: str, digest: str) -> None:
+    """
+    记录已知的文件摘要，之后计算同一文件的MD5时不再读取文件
+    
+    Args:
+        file_path: 文件路径
+        digest: 文件内容的MD5值
+    """
+    digest_cache.put(digest_cache.fingerprint(file_path), digest)
+
+def iter_chunks(stream: BinaryIO, chunk_size: int = HASH_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    分块读取文件对象
+    
+    Args:
+        stream: 文件对象
+        chunk_size: 每次读取的块大小
+    
+    Returns:
+        数据块迭代器
+    """
+    return iter(lambda: stream.read(chunk_size), b"")
+
+def save_chunks(chunks: Iterable[bytes], target_path: str) -> Tuple[str, int]:
+    """
+    将数据块写入文件，写入的同时计算MD5和字节数，并记录到摘要缓存
+    
+    Args:
+        chunks: 数据块迭代器
+        target_path: 目标文件路径
+    
+    Returns:
+        (MD5值, 字节数)
+    """
+    hash_md5 = hashlib.md5()
+    size = 0
+    with open(target_path, 'wb') as f:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            f.write(chunk)
+            hash_md5.update(chunk)
+            size += len(chunk)
+    
+    digest = hash_md5.hexdigest()
+    remember_md5(target_path, digest)
+    return digest, size
+
+class RangeHasher:
+    """
+    按顺序计算分段下载文件的MD5
+    
+    分段可以乱序完成，每完成一个分段就把从头开始已连续完成的部分计入MD5。
+    计算与其他分段的下载同时进行，读取的是刚写入、仍在页缓存中的数据，下载完成后不必再读取整个文件。
+    """
+    
+    def __init__(self, file_path: str, ranges: List[Tuple[int, int]]):
+        """
+        初始化
+        
+        Args:
+            file_path: 分段写入的文件路径
+            ranges: 按顺序排列的分段 (起始字节, 结束字节)，结束字节包含在内
+        """
+        self.file_path = file_path
+        self.ranges = ranges
+        self._md5 = hashlib.md5()
+        self._next = 0
+        self._done = set()
+        self._lock = threading.Lock()
+    
+    def complete(self, index: int) -> None:
+        """
+        标记分段已写入，并计入所有已可按顺序计算的分段
+        
+        Args:
+            index: 分段序号
+        """
+        with self._lock:
+            self._done.add(index)
+            if self._next not in self._done:
+                return
+            with open(self.file_path, 'rb') as f:
+                while self._next in self._done:
+                    start, end = self.ranges[self._next]
+                    f.seek(start)
+                    remaining = end - start + 1
+                    while remaining > 0:
+                        chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+                        if not chunk:
+                            raise IOError(f"分段数据不完整: {self.file_path}")
+                        self._md5.update(chunk)
+                        remaining -= len(chunk)
+                    self._next += 1
+    
+    def hexdigest(self) -> str:
+        """
+        获取整个文件的MD5
+        
+        Returns:
+            MD5值
+        
+        Raises:
+            ValueError: 还有分段未完成
+        """
+        with self._lock:
+            if self._next < len(self.ranges):
+                raise ValueError(f"还有 {len(self.ranges) - self._next} 个分段未完成")
+            return self._md5.hexdigest()
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+HTTP连接池
+同一主机的请求复用已建立的连接，省去重复的DNS解析、TCP和TLS握手
+"""
+
+import logging
+import threading
+import requests
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 默认配置
+DEFAULT_POOL_CONNECTIONS = 16
+DEFAULT_POOL_MAXSIZE = 8
+
+class HttpSessionPool:
+    """
+    共享的HTTP会话池
+    
+    每个线程使用独立的 requests.Session，所有会话挂载同一个连接适配器，
+    会话状态不在线程间共享，底层连接按主机在所有线程间复用。
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        初始化会话池
+        
+        Args:
+            config: 配置字典
+        """
+        http_config = config.get('http', {})
+        self.pool_connections = http_config.get('pool_connections', DEFAULT_POOL_CONNECTIONS)
+        self.pool_maxsize = http_config.get('pool_maxsize', DEFAULT_POOL_MAXSIZE)
+        self.keep_alive = http_config.get('keep_alive', True)
+        
+        # pool_connections 为缓存的主机连接池数，pool_maxsize 为每个主机保留的连接数；
+        # pool_block 为True时单个主机的并发连接数不超过 pool_maxsize
+        self.adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=http_config.get('pool_block', False)
+        )
+        
+        # 主机连接池被淘汰时保留其计数
+        self._lock = threading.Lock()
+        self._retired_requests = 0
+        self._retired_connections = 0
+        self.adapter.poolmanager.pools.dispose_func = self._retire_pool
+        
+        self._local = threading.local()
+        
+        logger.info(f"HTTP连接池初始化完成，主机数: {self.pool_connections}, 每主机连接数: {self.pool_maxsize}")
+    
+    @property
+    def session(self) -> requests.Session:
+        """当前线程的会话，首次使用时创建"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            # 下载请求来自不同用户，不保存服务端设置的 Cookie
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            self._local.session = session
+        return session
+    
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """发送GET请求"""
+        return self.session.get(url, **kwargs)
+    
+    def head(self, url: str, **kwargs) -> requests.Response:
+        """发送HEAD请求"""
+        return self.session.head(url, **kwargs)
+    
+    def _retire_pool(self, pool) -> None:
+        """记录被淘汰的主机连接池的计数并关闭连接"""
+        with self._lock:
+            self._retired_requests += pool.num_requests
+            self._retired_connections += pool.num_connections
+        pool.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        
+        请求数减去新建连接数即为复用已有连接的请求数（命中），新建连接数为未命中。
+        
+        Returns:
+            统计信息字典
+        """
+        pools = self.adapter.poolmanager.pools
+        hosts = {}
+        with self._lock:
+            total_requests = self._retired_requests
+            total_connections = self._retired_connections
+        
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            hosts[host] = {
+                "requests": pool.num_requests,
+                "connections": pool.num_connections
+            }
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+        
+        return {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "keep_alive": self.keep_alive,
+            "requests": total_requests,
+            "hits": max(total_requests - total_connections, 0),
+            "misses": total_connections,
+            "hosts": hosts
+        }
+    
+    def close(self) -> None:
+        """关闭所有连接"""
+        self.adapter.close()
\ No newline at end of file
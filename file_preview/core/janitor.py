@@ -0,0 +1,151 @@
+"""
+缓存清理任务
+在后台线程中按固定间隔清理缓存目录，每个进程只运行一个
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+from .cache import CacheManager
+from .downloader import remove_stale_parts
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 默认清理间隔（秒）
+DEFAULT_CLEANUP_INTERVAL = 3600
+
+class CacheJanitor:
+    """
+    缓存清理任务
+    
+    清理过期文件并在缓存超出容量时删除最旧的文件，删除下载目录中长时间未续传的 .part 文件，
+    记录最近一次清理的时间和耗时。
+    """
+    
+    def __init__(self, config: Dict[str, Any], interval: Optional[float] = None):
+        """
+        初始化清理任务
+        
+        Args:
+            config: 配置字典
+            interval: 清理间隔（秒），默认读取 cache.cleanup_interval
+        """
+        self.config = config
+        if interval is None:
+            interval = config.get('cache', {}).get('cleanup_interval', DEFAULT_CLEANUP_INTERVAL)
+        self.interval = interval
+        
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        
+        # 统计信息
+        self.runs = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+        self.removed_parts = 0
+    
+    def run_once(self) -> Dict[str, Any]:
+        """
+        执行一次清理
+        
+        Returns:
+            清理统计信息
+        """
+        with self._lock:
+            started = time.time()
+            try:
+                CacheManager(self.config).cleanup()
+                self.removed_parts += remove_stale_parts(self.config)
+                self.last_error = None
+            except Exception as e:
+                logger.error(f"清理缓存失败: {str(e)}", exc_info=True)
+                self.last_error = str(e)
+            self.runs += 1
+            self.last_run = started
+            self.last_duration = time.time() - started
+            logger.info(f"缓存清理完成，耗时: {self.last_duration:.3f} 秒")
+        return self.get_stats()
+    
+    def _run(self) -> None:
+        """后台线程主循环，启动后立即清理一次"""
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.interval)
+    
+    def start(self) -> None:
+        """启动后台清理线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="file-preview-cache-janitor")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"缓存清理任务已启动，间隔: {self.interval} 秒")
+    
+    def stop(self) -> None:
+        """停止后台清理线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def is_running(self) -> bool:
+        """后台清理线程是否在运行"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取清理统计信息
+        
+        Returns:
+            统计信息字典
+        """
+        return {
+            "running": self.is_running(),
+            "interval": self.interval,
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_duration": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+            "removed_parts": self.removed_parts
+        }
+
+# 进程级共享的清理任务
+_janitor = None
+_janitor_lock = threading.Lock()
+
+def start_cache_janitor(config: Dict[str, Any]) -> CacheJanitor:
+    """
+    启动进程共享的缓存清理任务，已启动时直接返回
+    
+    清理间隔为0或负数时不启动后台线程，由外部定时执行 cleanup 命令清理。
+    
+    Args:
+        config: 配置字典
+    
+    Returns:
+        清理任务实例
+    """
+    global _janitor
+    
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = CacheJanitor(config)
+            if _janitor.interval > 0:
+                _janitor.start()
+            else:
+                logger.info("缓存清理间隔为0，不启动后台清理任务")
+        return _janitor
+
+def get_cache_janitor() -> Optional[CacheJanitor]:
+    """
+    获取进程共享的缓存清理任务
+    
+    Returns:
+        清理任务实例，尚未启动时返回None
+    """
+    return _janitor
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+失败结果缓存
+记录下载或转换失败的URL和文件内容，在退避时间内再次请求时直接返回缓存的错误，不再重复下载和转换
+"""
+
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional
+from .cache import CacheManager
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 各类失败首次缓存的时间（秒），之后每次连续失败翻倍
+DEFAULT_FAILURE_TTLS = {
+    'not_found': 300,
+    'client_error': 300,
+    'server_error': 15,
+    'network': 15,
+    'empty': 60,
+    'rejected': 3600,
+    'conversion': 600,
+    'bad_input': 3600,
+    'timeout': 1800,
+    'crash': 60,
+    'no_output': 600
+}
+
+# 未知失败类型首次缓存的时间（秒）
+DEFAULT_TTL = 60
+
+# 单次缓存时间上限（秒）
+DEFAULT_MAX_TTL = 86400
+
+# 退避结束后保留失败次数的时间（秒），期间再次失败时继续翻倍
+DEFAULT_FORGET_AFTER = 86400
+
+def get_url_key(url: str) -> str:
+    """
+    获取URL在失败缓存中的键，与 url_md5 相同
+    
+    Args:
+        url: URL
+    
+    Returns:
+        URL的MD5值
+    """
+    return hashlib.md5(url.encode('utf-8')).hexdigest()
+
+def classify_status(status: int) -> str:
+    """
+    根据HTTP响应状态判断失败类型
+    
+    Args:
+        status: 响应状态码
+    
+    Returns:
+        失败类型
+    """
+    if status in (404, 410):
+        return 'not_found'
+    if 400 <= status < 500:
+        return 'client_error'
+    return 'server_error'
+
+class NegativeCache:
+    """
+    失败结果缓存
+    
+    以 url_md5 或文件内容MD5为键，记录失败类型、失败时间和退避时间，存储在缓存后端中，多个进程共享。
+    连续失败时退避时间按失败类型的初始值翻倍，成功后清除记录。
+    """
+    
+    def __init__(self, config: Dict[str, Any], cache_manager: CacheManager):
+        """
+        初始化失败结果缓存
+        
+        Args:
+            config: 配置字典
+            cache_manager: 缓存管理器
+        """
+        negative_config = config.get('negative_cache', {})
+        self.enabled = negative_config.get('enabled', True)
+        self.ttls = dict(DEFAULT_FAILURE_TTLS, **(negative_config.get('ttl') or {}))
+        self.max_ttl = negative_config.get('max_ttl', DEFAULT_MAX_TTL)
+        self.forget_after = negative_config.get('forget_after', DEFAULT_FORGET_AFTER)
+        self.cache_manager = cache_manager
+        
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.records = 0
+    
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取失败记录，包括已过退避时间的记录"""
+        data = self.cache_manager.backend.get(self.cache_manager.get_negative_key(key))
+        if not data:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        获取仍在退避时间内的失败记录
+        
+        Args:
+            key: url_md5 或文件内容MD5
+        
+        Returns:
+            失败记录，包含 failure_class、error、failures、failed_at、retry_at 和 retry_after（剩余秒数）；
+            没有记录或已过退避时间时返回None
+        """
+        if not self.enabled or not key:
+            return None
+        
+        entry = self._load(key)
+        if not entry:
+            return None
+        
+        remaining = entry.get('retry_at', 0) - time.time()
+        if remaining <= 0:
+            return None
+        
+        entry['retry_after'] = math.ceil(remaining)
+        with self._lock:
+            self.hits += 1
+        return entry
+    
+    def record(self, key: str, failure_class: str, error: str) -> Optional[Dict[str, Any]]:
+        """
+        记录一次失败
+        
+        Args:
+            key: url_md5 或文件内容MD5
+            failure_class: 失败类型
+            error: 错误信息
+        
+        Returns:
+            失败记录，未启用时返回None
+        """
+        if not self.enabled or not key:
+            return None
+        
+        previous = self._load(key) or {}
+        failures = previous.get('failures', 0) + 1
+        base_ttl = self.ttls.get(failure_class, DEFAULT_TTL)
+        ttl = min(base_ttl * 2 ** (failures - 1), self.max_ttl)
+        
+        now = time.time()
+        entry = {
+            'failure_class': failure_class,
+            'error': error,
+            'failures': failures,
+            'failed_at': now,
+            'retry_at': now + ttl
+        }
+        self.cache_manager.backend.set(self.cache_manager.get_negative_key(key), json.dumps(entry),
+                                       int(ttl + self.forget_after))
+        with self._lock:
+            self.records += 1
+        
+        logger.warning(f"记录失败结果: {key}, 类型: {failure_class}, 连续失败 {failures} 次, {int(ttl)} 秒内不再重试")
+        return entry
+    
+    def clear(self, key: str) -> None:
+        """
+        清除失败记录
+        
+        Args:
+            key: url_md5 或文件内容MD5
+        """
+        if self.enabled and key:
+            self.cache_manager.backend.delete(self.cache_manager.get_negative_key(key))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "records": self.records
+            }
\ No newline at end of file
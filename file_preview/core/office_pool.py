@@ -0,0 +1,641 @@
+"""
+LibreOffice 常驻进程池
+"""
+
+import os
+import time
+import queue
+import atexit
+import shutil
+import socket
+import logging
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple, List, Iterator
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    UNO_AVAILABLE = True
+except ImportError:
+    UNO_AVAILABLE = False
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 目标格式到导出过滤器的映射（按文档组件类型区分）
+EXPORT_FILTERS = {
+    'pdf': {
+        'writer': 'writer_pdf_Export',
+        'calc': 'calc_pdf_Export',
+        'impress': 'impress_pdf_Export',
+        'draw': 'draw_pdf_Export'
+    },
+    'xlsx': {
+        'calc': 'Calc MS Excel 2007 XML'
+    }
+}
+
+# 文档服务名到组件类型的映射
+DOCUMENT_SERVICES = [
+    ('com.sun.star.text.TextDocument', 'writer'),
+    ('com.sun.star.sheet.SpreadsheetDocument', 'calc'),
+    ('com.sun.star.presentation.PresentationDocument', 'impress'),
+    ('com.sun.star.drawing.DrawingDocument', 'draw')
+]
+
+# 当前进程占用的实例目录：根目录 -> (进程号, 实例目录, 锁文件描述符)
+_instance_dirs: Dict[str, Tuple[int, str, int]] = {}
+_instance_lock = threading.Lock()
+
+class OfficeWorkerError(Exception):
+    """LibreOffice 工作进程异常（进程崩溃、连接断开、超时等）"""
+    pass
+
+class OfficeTimeoutError(OfficeWorkerError):
+    """转换超时，工作进程已被结束"""
+    pass
+
+class OfficeDocumentError(Exception):
+    """文档本身无法加载或导出"""
+    pass
+
+def get_profile_dir(config: Dict[str, Any]) -> str:
+    """
+    获取 LibreOffice 用户配置目录的根路径
+    
+    Args:
+        config: 配置字典
+    
+    Returns:
+        配置目录根路径
+    """
+    profile_dir = config.get('directories', {}).get('profile')
+    if not profile_dir:
+        convert_dir = os.path.abspath(config['directories']['convert'])
+        profile_dir = os.path.join(os.path.dirname(convert_dir), 'profile')
+    return os.path.abspath(profile_dir)
+
+def get_instance_dir(root_dir: str) -> str:
+    """
+    获取当前进程独占的实例目录
+    
+    多进程部署（gunicorn、uwsgi 的多个 worker）时各进程使用各自的配置目录，
+    LibreOffice 不会因配置目录被其他进程锁定而退出。进程对 <根目录>/instance_<序号> 下的
+    锁文件加排他锁，占用序号最小的空闲实例目录，锁在进程退出时由系统释放；
+    重启后的进程会占用同一个实例目录，复用其中已初始化的配置，不再承担冷启动开销。
+    fork 出的子进程调用时会另外占用一个实例目录。不支持文件锁的平台按进程号区分目录。
+    
+    Args:
+        root_dir: 根目录
+    
+    Returns:
+        实例目录路径
+    """
+    pid = os.getpid()
+    with _instance_lock:
+        claimed = _instance_dirs.get(root_dir)
+        if claimed is not None:
+            owner, path, fd = claimed
+            if owner == pid:
+                return path
+            # fork 继承的锁属于父进程，只关闭描述符，不解锁
+            if fd is not None:
+                os.close(fd)
+            del _instance_dirs[root_dir]
+        
+        if not FCNTL_AVAILABLE:
+            path = os.path.join(root_dir, f'pid_{pid}')
+            _instance_dirs[root_dir] = (pid, path, None)
+            return path
+        
+        index = 0
+        while True:
+            path = os.path.join(root_dir, f'instance_{index}')
+            os.makedirs(path, exist_ok=True)
+            fd = os.open(os.path.join(path, '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                index += 1
+                continue
+            _instance_dirs[root_dir] = (pid, path, fd)
+            return path
+
+def release_instance_dirs() -> None:
+    """
+    释放当前进程占用的实例目录，目录内容保留给之后的进程复用
+    
+    按进程号区分的目录不会被其他进程复用，直接删除。
+    """
+    pid = os.getpid()
+    with _instance_lock:
+        for root_dir, (owner, path, fd) in list(_instance_dirs.items()):
+            if fd is None:
+                if owner == pid:
+                    shutil.rmtree(path, ignore_errors=True)
+            else:
+                if owner == pid:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+            del _instance_dirs[root_dir]
+
+def _find_free_port() -> int:
+    """向系统申请一个空闲的本地端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def profile_url(profile_path: str) -> str:
+    """
+    生成 -env:UserInstallation 需要的 file:// URL
+    
+    Args:
+        profile_path: 配置目录路径
+    
+    Returns:
+        file:// URL
+    """
+    return 'file://' + os.path.abspath(profile_path).replace('\\', '/')
+
+def _make_properties(**kwargs) -> Tuple:
+    """构建 UNO PropertyValue 元组"""
+    properties = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        properties.append(prop)
+    return tuple(properties)
+
+class OfficeWorker:
+    """
+    单个常驻的 headless LibreOffice 进程，拥有独立的用户配置目录
+    """
+    
+    def __init__(self, index: int, libreoffice_path: str, profile_root: str, connection: str = 'pipe',
+                 startup_timeout: int = 30):
+        """
+        初始化工作进程
+        
+        Args:
+            index: 工作进程序号
+            libreoffice_path: soffice 可执行文件路径
+            profile_root: 用户配置目录的根路径，实际目录位于当前进程占用的实例目录下
+            connection: UNO 连接方式，pipe 使用按进程号命名的管道，socket 使用系统分配的空闲本地端口
+            startup_timeout: 启动超时时间（秒）
+        """
+        self.index = index
+        self.libreoffice_path = libreoffice_path
+        self.profile_root = profile_root
+        self.connection = connection
+        self.port = None
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.desktop = None
+        self.jobs = 0
+        self.restarts = 0
+    
+    @property
+    def profile_path(self) -> str:
+        """当前进程中该工作进程的用户配置目录"""
+        return os.path.join(get_instance_dir(self.profile_root), f'worker_{self.index}')
+    
+    @property
+    def connection_string(self) -> str:
+        """UNO 连接字符串，同一主机上的多个服务进程互不冲突"""
+        if self.connection == 'socket':
+            return f"socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+        return f"pipe,name=file_preview_{os.getpid()}_{self.index};urp;StarOffice.ComponentContext"
+    
+    def is_alive(self) -> bool:
+        """检查进程是否仍在运行"""
+        return self.process is not None and self.process.poll() is None
+    
+    def start(self) -> None:
+        """
+        启动 LibreOffice 进程并建立 UNO 连接
+        
+        Raises:
+            OfficeWorkerError: 启动或连接失败
+        """
+        os.makedirs(self.profile_path, exist_ok=True)
+        if self.connection == 'socket':
+            self.port = _find_free_port()
+        
+        cmd = [
+            self.libreoffice_path,
+            '--headless',
+            '--invisible',
+            '--nologo',
+            '--nodefault',
+            '--norestore',
+            '--nolockcheck',
+            f'-env:UserInstallation={profile_url(self.profile_path)}',
+            f'--accept={self.connection_string}'
+        ]
+        
+        logger.info(f"启动LibreOffice工作进程 #{self.index}: 连接 {self.connection_string}, 配置目录 {self.profile_path}")
+        self.process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self.jobs = 0
+        
+        # 等待进程开始监听
+        deadline = time.time() + self.startup_timeout
+        last_error = None
+        while time.time() < deadline:
+            if not self.is_alive():
+                raise OfficeWorkerError(f"LibreOffice工作进程 #{self.index} 启动后立即退出")
+            try:
+                self.desktop = self._connect()
+                logger.info(f"LibreOffice工作进程 #{self.index} 已就绪")
+                return
+            except Exception as e:
+                last_error = e
+                time.sleep(0.5)
+        
+        self.stop()
+        raise OfficeWorkerError(f"连接LibreOffice工作进程 #{self.index} 超时: {last_error}")
+    
+    def _connect(self):
+        """
+        连接到 LibreOffice 并返回 Desktop 对象
+        
+        Returns:
+            com.sun.star.frame.Desktop 实例
+        """
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context
+        )
+        context = resolver.resolve(f"uno:{self.connection_string}")
+        return context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+    
+    def convert(self, input_path: str, output_path: str, target: str, timeout: int,
+                filter_data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        在该工作进程中转换文件
+        
+        Args:
+            input_path: 输入文件路径
+            output_path: 输出文件路径
+            target: 目标格式（pdf、xlsx）
+            timeout: 超时时间（秒），超时会强制结束工作进程
+            filter_data: 导出过滤器选项（可选），如 {'PageRange': '1-5'}
+        
+        Raises:
+            OfficeWorkerError: 工作进程崩溃或超时
+            OfficeDocumentError: 文档无法加载或不支持目标格式
+        """
+        if not self.is_alive() or self.desktop is None:
+            raise OfficeWorkerError(f"LibreOffice工作进程 #{self.index} 未运行")
+        
+        # UNO 调用是阻塞的，超时后结束进程使调用立即返回
+        timed_out = threading.Event()
+        
+        def on_timeout():
+            timed_out.set()
+            logger.warning(f"LibreOffice工作进程 #{self.index} 转换超时，结束进程")
+            self.kill()
+        
+        watchdog = threading.Timer(timeout, on_timeout)
+        watchdog.daemon = True
+        watchdog.start()
+        
+        document = None
+        try:
+            document = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(input_path)),
+                '_blank',
+                0,
+                _make_properties(Hidden=True, ReadOnly=True)
+            )
+            if document is None:
+                raise OfficeDocumentError(f"无法加载文档: {input_path}")
+            
+            filter_name = self._get_filter(document, target)
+            store_properties = {'FilterName': filter_name, 'Overwrite': True}
+            if filter_data:
+                store_properties['FilterData'] = uno.Any('[]com.sun.star.beans.PropertyValue',
+                                                         _make_properties(**filter_data))
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(output_path)),
+                _make_properties(**store_properties)
+            )
+            self.jobs += 1
+        except OfficeDocumentError:
+            # 进程被结束时加载也会返回空文档，不能算作文档本身的问题
+            if timed_out.is_set():
+                raise OfficeTimeoutError(f"转换超时: {timeout}秒")
+            if not self.is_alive():
+                raise OfficeWorkerError(f"LibreOffice工作进程 #{self.index} 已崩溃")
+            raise
+        except Exception as e:
+            if timed_out.is_set():
+                raise OfficeTimeoutError(f"转换超时: {timeout}秒")
+            if not self.is_alive():
+                raise OfficeWorkerError(f"LibreOffice工作进程 #{self.index} 已崩溃: {str(e)}")
+            # 进程仍然存活，说明是文档本身的问题（格式损坏、无法导出等）
+            raise OfficeDocumentError(f"文档处理失败: {str(e)}")
+        finally:
+            watchdog.cancel()
+            if document is not None and self.is_alive():
+                try:
+                    document.close(True)
+                except Exception:
+                    pass
+    
+    def _get_filter(self, document, target: str) -> str:
+        """
+        根据文档类型选择导出过滤器
+        
+        Args:
+            document: 已加载的文档
+            target: 目标格式
+        
+        Returns:
+            过滤器名称
+        """
+        filters = EXPORT_FILTERS.get(target, {})
+        for service, component in DOCUMENT_SERVICES:
+            if document.supportsService(service) and component in filters:
+                return filters[component]
+        raise OfficeDocumentError(f"不支持转换为 {target} 的文档类型")
+    
+    def kill(self) -> None:
+        """强制结束进程"""
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=10)
+            except Exception as e:
+                logger.error(f"结束LibreOffice工作进程 #{self.index} 失败: {str(e)}")
+        self.desktop = None
+    
+    def stop(self) -> None:
+        """正常关闭进程"""
+        if self.desktop is not None and self.is_alive():
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.kill()
+        self.desktop = None
+
+class OfficePool:
+    """
+    LibreOffice 工作进程池
+    
+    每个工作进程常驻并拥有独立的用户配置目录，转换任务被分派到空闲的进程上，
+    避免每次转换都承担 LibreOffice 的冷启动开销。进程在处理指定数量的任务后
+    或崩溃后会被回收重启。
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        初始化进程池（进程在首次使用时才启动）
+        
+        Args:
+            config: 配置字典
+        """
+        conversion_config = config.get('conversion', {})
+        self.size = max(1, int(config.get('performance', {}).get('worker_processes', 2)))
+        self.max_jobs = int(conversion_config.get('worker_max_jobs', 200))
+        self.connection = conversion_config.get('worker_connection', 'pipe')
+        self.startup_timeout = int(conversion_config.get('worker_startup_timeout', 30))
+        self.libreoffice_path = conversion_config['libreoffice_path']
+        self.profile_dir = os.path.join(get_profile_dir(config), 'pool')
+        
+        self.workers = [
+            OfficeWorker(
+                index=i,
+                libreoffice_path=self.libreoffice_path,
+                profile_root=self.profile_dir,
+                connection=self.connection,
+                startup_timeout=self.startup_timeout
+            )
+            for i in range(self.size)
+        ]
+        
+        self._idle = queue.Queue()
+        for worker in self.workers:
+            self._idle.put(worker)
+        
+        self._lock = threading.Lock()
+        self._closed = False
+        self.total_jobs = 0
+        self.failed_jobs = 0
+        
+        logger.info(f"LibreOffice进程池初始化完成，大小: {self.size}, 单进程最大任务数: {self.max_jobs}")
+    
+    def convert(self, input_path: str, output_path: str, target: str, timeout: int,
+                filter_data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        将转换任务分派到空闲的工作进程
+        
+        Args:
+            input_path: 输入文件路径
+            output_path: 输出文件路径
+            target: 目标格式（pdf、xlsx）
+            timeout: 超时时间（秒）
+            filter_data: 导出过滤器选项（可选）
+        
+        Raises:
+            OfficeWorkerError: 工作进程崩溃、超时或无法启动
+            OfficeDocumentError: 文档无法加载或不支持目标格式
+        """
+        if self._closed:
+            raise OfficeWorkerError("LibreOffice进程池已关闭")
+        
+        worker = self._idle.get()
+        try:
+            if not worker.is_alive():
+                if worker.process is not None:
+                    logger.warning(f"LibreOffice工作进程 #{worker.index} 已退出，重新启动")
+                    worker.restarts += 1
+                worker.start()
+            
+            try:
+                worker.convert(input_path, output_path, target, timeout, filter_data)
+            except OfficeWorkerError:
+                # 崩溃或超时的进程直接结束，下次使用时重新启动
+                worker.kill()
+                with self._lock:
+                    self.failed_jobs += 1
+                raise
+            except OfficeDocumentError:
+                with self._lock:
+                    self.failed_jobs += 1
+                raise
+            
+            with self._lock:
+                self.total_jobs += 1
+            
+            # 达到最大任务数后回收进程
+            if worker.jobs >= self.max_jobs:
+                logger.info(f"LibreOffice工作进程 #{worker.index} 已处理 {worker.jobs} 个任务，回收重启")
+                worker.stop()
+                worker.restarts += 1
+        finally:
+            self._idle.put(worker)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取进程池统计信息
+        
+        Returns:
+            统计信息字典
+        """
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "running": sum(1 for worker in self.workers if worker.is_alive()),
+            "max_jobs": self.max_jobs,
+            "total_jobs": self.total_jobs,
+            "failed_jobs": self.failed_jobs,
+            "restarts": sum(worker.restarts for worker in self.workers)
+        }
+    
+    def shutdown(self) -> None:
+        """关闭所有工作进程"""
+        self._closed = True
+        for worker in self.workers:
+            worker.stop()
+        logger.info("LibreOffice进程池已关闭")
+
+class ProfileSlots:
+    """
+    单次进程转换使用的用户配置目录槽位
+    
+    LibreOffice 同一个用户配置目录同时只能被一个进程使用，共用默认配置目录的
+    并发转换会被串行化或因配置锁失败。每个并发槽位拥有独立的配置目录，
+    目录位于当前服务进程占用的实例目录下，首次使用时创建，之后一直复用，
+    进程退出后保留给重启的服务进程。
+    """
+    
+    def __init__(self, root_dir: str, count: int):
+        """
+        初始化槽位
+        
+        Args:
+            root_dir: 配置目录根路径
+            count: 槽位数量（即最大并发转换数）
+        """
+        self.root_dir = root_dir
+        self.count = max(1, count)
+        
+        self._free = queue.Queue()
+        for index in range(self.count):
+            self._free.put(index)
+    
+    @property
+    def paths(self) -> List[str]:
+        """当前进程各槽位的配置目录"""
+        instance_dir = get_instance_dir(self.root_dir)
+        return [os.path.join(instance_dir, f'slot_{index}') for index in range(self.count)]
+    
+    @contextmanager
+    def acquire(self) -> Iterator[str]:
+        """
+        占用一个空闲槽位，没有空闲槽位时等待
+        
+        Yields:
+            槽位的配置目录路径
+        """
+        index = self._free.get()
+        try:
+            path = self.paths[index]
+            os.makedirs(path, exist_ok=True)
+            yield path
+        finally:
+            self._free.put(index)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取槽位统计信息
+        
+        Returns:
+            统计信息字典
+        """
+        return {
+            "slots": self.count,
+            "idle": self._free.qsize()
+        }
+
+# 进程级共享的进程池和配置目录槽位，按关键配置区分
+_pools: Dict[Tuple, OfficePool] = {}
+_slots: Dict[Tuple, ProfileSlots] = {}
+_pools_lock = threading.Lock()
+
+def get_office_pool(config: Dict[str, Any]) -> Optional[OfficePool]:
+    """
+    获取进程共享的 LibreOffice 进程池
+    
+    Args:
+        config: 配置字典
+    
+    Returns:
+        进程池实例；未安装 uno 模块或未启用进程池时返回 None
+    """
+    if not UNO_AVAILABLE:
+        return None
+    if not config.get('conversion', {}).get('use_worker_pool', True):
+        return None
+    
+    key = (
+        config['conversion']['libreoffice_path'],
+        get_profile_dir(config),
+        config.get('performance', {}).get('worker_processes', 2)
+    )
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = OfficePool(config)
+            _pools[key] = pool
+        return pool
+
+def get_profile_slots(config: Dict[str, Any]) -> ProfileSlots:
+    """
+    获取进程共享的配置目录槽位，槽位数量来自 performance.max_workers
+    
+    Args:
+        config: 配置字典
+    
+    Returns:
+        配置目录槽位
+    """
+    root_dir = os.path.join(get_profile_dir(config), 'slots')
+    count = int(config.get('performance', {}).get('max_workers', 4))
+    
+    key = (root_dir, count)
+    with _pools_lock:
+        slots = _slots.get(key)
+        if slots is None:
+            slots = ProfileSlots(root_dir, count)
+            _slots[key] = slots
+        return slots
+
+def shutdown_pools() -> None:
+    """关闭所有进程池，释放当前进程占用的配置目录"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+    release_instance_dirs()
+
+atexit.register(shutdown_pools)
\ No newline at end of file
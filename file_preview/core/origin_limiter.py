@@ -0,0 +1,351 @@
+"""
+按源站限制下载
+限制每个源站的并发连接数和带宽，等待连接的下载按源站轮流放行，单个源站的突发下载不会挤占其他源站
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 默认配置，0 表示不限制
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_PER_ORIGIN_CONNECTIONS = 8
+DEFAULT_BANDWIDTH = 0
+DEFAULT_PER_ORIGIN_BANDWIDTH = 0
+
+# 最多保留状态的源站数，超出时移除空闲的源站
+MAX_TRACKED_ORIGINS = 256
+
+# 吞吐量统计的时间窗口（秒）
+THROUGHPUT_WINDOW = 1.0
+
+def get_origin(url: str) -> str:
+    """
+    获取URL的源站
+    
+    Args:
+        url: URL
+    
+    Returns:
+        scheme://host:port
+    """
+    parsed = urlparse(url)
+    scheme = (parsed.scheme or 'http').lower()
+    port = parsed.port or (443 if scheme == 'https' else 80)
+    return f"{scheme}://{(parsed.hostname or '').lower()}:{port}"
+
+class TokenBucket:
+    """
+    令牌桶
+    
+    取令牌时允许透支，透支的部分按速率换算成需要等待的时间，长期平均速率不超过设定值。
+    """
+    
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        初始化令牌桶
+        
+        Args:
+            rate: 每秒补充的令牌数（字节）
+            burst: 桶容量，默认为一秒的令牌数
+        """
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+    
+    def reserve(self, amount: int) -> float:
+        """
+        取出令牌，调用方需在锁内调用
+        
+        Args:
+            amount: 令牌数
+        
+        Returns:
+            需要等待的秒数
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+class _Waiter:
+    """等待连接名额的下载，线程中用事件等待，事件循环中用 Future 等待"""
+    
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+    
+    def wake(self) -> None:
+        """放行"""
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+    
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+class _OriginState:
+    """单个源站的连接、等待和流量统计"""
+    
+    def __init__(self, bandwidth: int):
+        self.active = 0
+        self.waiters = deque()
+        self.bucket = TokenBucket(bandwidth) if bandwidth else None
+        self.bytes = 0
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.throughput = 0.0
+    
+    def record(self, amount: int) -> None:
+        """记录下载的字节数，每个时间窗口结束时更新吞吐量"""
+        self.bytes += amount
+        self.window_bytes += amount
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        if elapsed >= THROUGHPUT_WINDOW:
+            self.throughput = self.window_bytes / elapsed
+            self.window_start = now
+            self.window_bytes = 0
+    
+    def get_throughput(self) -> float:
+        """当前吞吐量（字节/秒），超过两个时间窗口没有数据时为0"""
+        if time.monotonic() - self.window_start > 2 * THROUGHPUT_WINDOW:
+            return 0.0
+        return self.throughput
+
+class OriginSlot:
+    """已占用的连接名额，可以作为上下文管理器使用，重复释放无影响"""
+    
+    def __init__(self, limiter: 'OriginLimiter', origin: str):
+        self.limiter = limiter
+        self.origin = origin
+        self._released = False
+    
+    def release(self) -> None:
+        """释放名额"""
+        if not self._released:
+            self._released = True
+            self.limiter._release(self.origin)
+    
+    def __enter__(self) -> 'OriginSlot':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+class OriginLimiter:
+    """
+    源站限流器
+    
+    同一源站的并发连接数和全部下载的总连接数分别受限。总连接数已满时，等待的下载按源站轮流放行，
+    而不是按到达顺序，一个源站排队再多也只占一份。带宽用令牌桶限制，总带宽和单个源站带宽可分别设置。
+    线程和事件循环中的下载共用同一组名额。
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        初始化限流器
+        
+        Args:
+            config: 配置字典
+        """
+        download_config = config.get('download', {})
+        self.max_connections = download_config.get('max_connections', DEFAULT_MAX_CONNECTIONS)
+        self.per_origin_connections = download_config.get('per_origin_connections', DEFAULT_PER_ORIGIN_CONNECTIONS)
+        self.bandwidth = download_config.get('bandwidth', DEFAULT_BANDWIDTH)
+        self.per_origin_bandwidth = download_config.get('per_origin_bandwidth', DEFAULT_PER_ORIGIN_BANDWIDTH)
+        
+        self._lock = threading.Lock()
+        self._origins = OrderedDict()
+        # 有下载在等待的源站，按轮流放行的顺序排列
+        self._ready = deque()
+        self._active = 0
+        self._bucket = TokenBucket(self.bandwidth) if self.bandwidth else None
+        self.waited = 0
+    
+    def _get_state(self, origin: str) -> _OriginState:
+        """获取源站状态，超出数量时移除最久未使用的空闲源站"""
+        state = self._origins.get(origin)
+        if state is None:
+            state = self._origins[origin] = _OriginState(self.per_origin_bandwidth)
+            for key in list(self._origins.keys()):
+                if len(self._origins) <= MAX_TRACKED_ORIGINS:
+                    break
+                idle = self._origins[key]
+                if key != origin and not idle.active and not idle.waiters:
+                    del self._origins[key]
+        self._origins.move_to_end(origin)
+        return state
+    
+    def _can_start(self, state: _OriginState) -> bool:
+        if self.max_connections and self._active >= self.max_connections:
+            return False
+        return not (self.per_origin_connections and state.active >= self.per_origin_connections)
+    
+    def _start(self, state: _OriginState) -> None:
+        state.active += 1
+        self._active += 1
+    
+    def _try_start(self, origin: str, waiter_factory) -> Optional[_Waiter]:
+        """
+        有名额时直接占用，否则排队，调用方需在锁内调用
+        
+        Returns:
+            排队时返回等待对象，已占用名额时返回None
+        """
+        state = self._get_state(origin)
+        if not state.waiters and self._can_start(state):
+            self._start(state)
+            return None
+        
+        waiter = waiter_factory()
+        state.waiters.append(waiter)
+        if origin not in self._ready:
+            self._ready.append(origin)
+        self.waited += 1
+        return waiter
+    
+    def acquire(self, url: str) -> OriginSlot:
+        """
+        占用URL所在源站的一个连接名额，没有名额时阻塞等待
+        
+        Args:
+            url: URL
+        
+        Returns:
+            连接名额
+        """
+        origin = get_origin(url)
+        with self._lock:
+            waiter = self._try_start(origin, _Waiter)
+        if waiter is not None:
+            waiter.event.wait()
+        return OriginSlot(self, origin)
+    
+    async def acquire_async(self, url: str) -> OriginSlot:
+        """
+        在事件循环中占用连接名额，等待时不阻塞事件循环
+        
+        Args:
+            url: URL
+        
+        Returns:
+            连接名额
+        """
+        origin = get_origin(url)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waiter = self._try_start(origin, lambda: _Waiter(loop))
+        if waiter is None:
+            return OriginSlot(self, origin)
+        
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            # 取消时还在排队则移出队列，已被放行则归还名额
+            with self._lock:
+                state = self._origins.get(origin)
+                granted = state is None or waiter not in state.waiters
+                if not granted:
+                    state.waiters.remove(waiter)
+            if granted:
+                self._release(origin)
+            raise
+        return OriginSlot(self, origin)
+    
+    def _release(self, origin: str) -> None:
+        """归还名额并按源站轮流放行等待的下载"""
+        with self._lock:
+            state = self._origins.get(origin)
+            if state is not None:
+                state.active -= 1
+            self._active -= 1
+            self._dispatch()
+    
+    def _dispatch(self) -> None:
+        """按源站轮流放行等待的下载，调用方需在锁内调用"""
+        skipped = 0
+        while self._ready and skipped < len(self._ready):
+            if self.max_connections and self._active >= self.max_connections:
+                return
+            
+            origin = self._ready.popleft()
+            state = self._origins.get(origin)
+            if state is None or not state.waiters:
+                continue
+            if not self._can_start(state):
+                # 该源站已达到单源站上限，让给下一个源站
+                self._ready.append(origin)
+                skipped += 1
+                continue
+            
+            waiter = state.waiters.popleft()
+            self._start(state)
+            waiter.wake()
+            skipped = 0
+            if state.waiters:
+                self._ready.append(origin)
+    
+    def throttle(self, url: str, amount: int) -> float:
+        """
+        记录下载的字节数并计算限速需要等待的时间
+        
+        Args:
+            url: URL
+            amount: 本次下载的字节数
+        
+        Returns:
+            需要等待的秒数，调用方自行等待（线程中 time.sleep，事件循环中 asyncio.sleep）
+        """
+        origin = get_origin(url)
+        with self._lock:
+            state = self._get_state(origin)
+            state.record(amount)
+            delay = 0.0
+            if self._bucket is not None:
+                delay = self._bucket.reserve(amount)
+            if state.bucket is not None:
+                delay = max(delay, state.bucket.reserve(amount))
+            return delay
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        
+        Returns:
+            统计信息字典，origins 为各源站的在途连接数、等待数、下载字节数和吞吐量（字节/秒）
+        """
+        with self._lock:
+            origins = {
+                origin: {
+                    "in_flight": state.active,
+                    "waiting": len(state.waiters),
+                    "bytes": state.bytes,
+                    "throughput": round(state.get_throughput(), 1)
+                }
+                for origin, state in self._origins.items()
+            }
+            return {
+                "max_connections": self.max_connections,
+                "per_origin_connections": self.per_origin_connections,
+                "bandwidth": self.bandwidth,
+                "per_origin_bandwidth": self.per_origin_bandwidth,
+                "in_flight": self._active,
+                "waiting": sum(item["waiting"] for item in origins.values()),
+                "waited": self.waited,
+                "origins": origins
+            }
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+PDF后处理工具
+转换完成后对PDF做线性化（Fast Web View），浏览器通过分段请求即可先显示首页；生成页面缩略图
+"""
+
+import os
+import shutil
+import logging
+import threading
+import subprocess
+from typing import Dict, Any, Optional
+
+try:
+    import pikepdf
+    PIKEPDF_AVAILABLE = True
+except ImportError:
+    PIKEPDF_AVAILABLE = False
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 默认配置
+DEFAULT_QPDF_PATH = 'qpdf'
+DEFAULT_LINEARIZE_TIMEOUT = 60
+DEFAULT_PDFTOPPM_PATH = 'pdftoppm'
+DEFAULT_THUMBNAIL_WIDTH = 200
+DEFAULT_THUMBNAIL_TIMEOUT = 30
+
+class PdfLinearizer:
+    """
+    PDF线性化处理
+    
+    优先使用 pikepdf，未安装时调用 qpdf 命令行，两者都不可用时跳过。
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        初始化
+        
+        Args:
+            config: 配置字典
+        """
+        conversion = config.get('conversion', {})
+        self.enabled = conversion.get('pdf_linearize', False)
+        self.timeout = conversion.get('pdf_linearize_timeout', DEFAULT_LINEARIZE_TIMEOUT)
+        self.qpdf_path = self._find_qpdf(conversion.get('qpdf_path', DEFAULT_QPDF_PATH))
+        
+        if self.enabled and not self.available:
+            logger.warning("已启用PDF线性化，但未安装 pikepdf 也未找到 qpdf，转换结果将不做线性化")
+    
+    @staticmethod
+    def _find_qpdf(qpdf_path: str) -> Optional[str]:
+        """查找 qpdf 可执行文件"""
+        if os.path.isfile(qpdf_path) and os.access(qpdf_path, os.X_OK):
+            return qpdf_path
+        return shutil.which(qpdf_path)
+    
+    @property
+    def available(self) -> bool:
+        """是否有可用的线性化工具"""
+        return PIKEPDF_AVAILABLE or self.qpdf_path is not None
+    
+    def linearize(self, pdf_path: str) -> bool:
+        """
+        原地线性化PDF，失败时保留原文件
+        
+        Args:
+            pdf_path: PDF文件路径
+        
+        Returns:
+            是否完成线性化
+        """
+        if not self.enabled or not self.available:
+            return False
+        
+        output_path = f"{pdf_path}.linearized"
+        try:
+            if PIKEPDF_AVAILABLE:
+                with pikepdf.open(pdf_path) as pdf:
+                    pdf.save(output_path, linearize=True)
+            else:
+                result = subprocess.run(
+                    [self.qpdf_path, '--linearize', pdf_path, output_path],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    timeout=self.timeout
+                )
+                # qpdf 返回码 3 表示有警告但已生成输出
+                if result.returncode not in (0, 3):
+                    logger.warning(f"PDF线性化失败: {result.stderr.decode(errors='replace')}")
+                    return False
+            
+            os.replace(output_path, pdf_path)
+            return True
+        
+        except subprocess.TimeoutExpired:
+            logger.warning(f"PDF线性化超时: {pdf_path}")
+            return False
+        except Exception as e:
+            logger.warning(f"PDF线性化失败: {str(e)}")
+            return False
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+class PdfThumbnailer:
+    """
+    PDF页面缩略图
+    
+    调用 poppler 的 pdftoppm 渲染单页，未安装时不生成缩略图。
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        初始化
+        
+        Args:
+            config: 配置字典
+        """
+        thumbnails = config.get('thumbnails', {})
+        self.enabled = thumbnails.get('enabled', True)
+        self.width = thumbnails.get('width', DEFAULT_THUMBNAIL_WIDTH)
+        self.timeout = thumbnails.get('timeout', DEFAULT_THUMBNAIL_TIMEOUT)
+        self.pdftoppm_path = shutil.which(thumbnails.get('pdftoppm_path', DEFAULT_PDFTOPPM_PATH))
+    
+    @property
+    def available(self) -> bool:
+        """是否可以生成缩略图"""
+        return self.enabled and self.pdftoppm_path is not None
+    
+    def render_page(self, pdf_path: str, page: int, output_path: str) -> bool:
+        """
+        渲染一页为PNG缩略图，先写入临时文件再替换
+        
+        Args:
+            pdf_path: PDF文件路径
+            page: 页码（从1开始）
+            output_path: 输出文件路径
+        
+        Returns:
+            是否生成成功，页码超出范围时返回False
+        """
+        if not self.available:
+            return False
+        
+        # pdftoppm 在输出前缀后自动加上 .png；按宽度缩放，高度按页面比例计算（横向页面也保持配置的宽度）
+        temp_prefix = f"{output_path}.{os.getpid()}.{threading.get_ident()}"
+        temp_path = f"{temp_prefix}.png"
+        try:
+            result = subprocess.run(
+                [self.pdftoppm_path, '-png', '-f', str(page), '-l', str(page),
+                 '-scale-to-x', str(self.width), '-scale-to-y', '-1', '-singlefile', pdf_path, temp_prefix],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=self.timeout
+            )
+            if result.returncode != 0 or not os.path.exists(temp_path):
+                logger.warning(f"生成缩略图失败: {pdf_path} 第 {page} 页, {result.stderr.decode(errors='replace')}")
+                return False
+            
+            os.replace(temp_path, output_path)
+            return True
+        
+        except subprocess.TimeoutExpired:
+            logger.warning(f"生成缩略图超时: {pdf_path} 第 {page} 页")
+            return False
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
\ No newline at end of file
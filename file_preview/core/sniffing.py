@@ -0,0 +1,53 @@
+"""
+文件格式识别
+根据文件开头的字节判断格式，下载时不必等到下载完成才发现格式不支持
+"""
+
+from typing import Optional, FrozenSet
+
+# 文件头签名到可能扩展名的映射
+SIGNATURES = [
+    (b'%PDF-', frozenset({'.pdf'})),
+    # OLE2 复合文档，旧版 Office 格式共用
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', frozenset({'.doc', '.xls', '.ppt'})),
+    (b'{\\rtf', frozenset({'.rtf'})),
+    (b'\x89PNG\r\n\x1a\n', frozenset({'.png'})),
+    (b'\xff\xd8\xff', frozenset({'.jpg', '.jpeg'})),
+    (b'GIF87a', frozenset({'.gif'})),
+    (b'GIF89a', frozenset({'.gif'}))
+]
+
+# ZIP 容器中用于区分具体格式的标记，OpenDocument 的 mimetype 总是第一个未压缩条目
+ZIP_MARKERS = [
+    (b'opendocument.text', '.odt'),
+    (b'opendocument.spreadsheet', '.ods'),
+    (b'opendocument.presentation', '.odp'),
+    (b'word/', '.docx'),
+    (b'ppt/', '.pptx'),
+    (b'xl/', '.xlsx')
+]
+
+# 无法从开头确定具体格式的 ZIP 容器
+ZIP_FORMATS = frozenset({'.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.zip'})
+
+def sniff_formats(head: bytes) -> Optional[FrozenSet[str]]:
+    """
+    根据文件开头的字节识别可能的格式
+    
+    Args:
+        head: 文件开头的字节
+    
+    Returns:
+        可能的扩展名集合，无法识别（如纯文本）时返回None
+    """
+    for signature, formats in SIGNATURES:
+        if head.startswith(signature):
+            return formats
+    
+    if head.startswith(b'PK\x03\x04'):
+        for marker, extension in ZIP_MARKERS:
+            if marker in head:
+                return frozenset({extension})
+        return ZIP_FORMATS
+    
+    return None
\ No newline at end of file
@@ -3,15 +3,19 @@
 """
 
 from flask import request, jsonify, current_app
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from file_preview.utils.tasks import (
     process_file_conversion, download_and_process_url, 
-    check_mapped_file, create_task_id, start_background_task,
-    process_task, conversion_tasks, create_conversion_task
+    check_mapped_file, create_task_id, schedule_task, schedule_download,
+    process_task, conversion_tasks, create_conversion_task, set_task
 )
+from file_preview.utils.scheduler import TaskQueueFullError
+from file_preview.utils.inflight import inflight, get_inflight_key
+from file_preview.utils.freshness import is_url_result_fresh
 from file_preview.utils.file_utils import is_supported_format, get_file_md5, get_url_md5
 from file_preview.core.cache import CacheManager
-from file_preview.utils.mapping import FileMapping
+from file_preview.core.hashing import save_chunks, iter_chunks
+from file_preview.utils.services import get_services
 from file_preview.utils.file_processor import FileProcessor
 import os
 from werkzeug.utils import secure_filename
@@ -19,7 +23,7 @@ import logging
 import traceback
 import time
 import json
-from file_preview.utils.response import generate_error_response
+from file_preview.utils.response import generate_error_response, generate_busy_response
 from file_preview.utils.utils import get_string_md5
 
 logger = logging.getLogger("file_preview")
@@ -48,7 +52,7 @@ def convert_file(request):
     # 初始化任务ID，响应和文件ID
     task_id = None
     response = None
-    file_mapping = FileMapping(config)
+    file_mapping = get_services(config).file_mapping
     
     # 处理不同类型的请求
     try:
@@ -58,65 +62,53 @@ def convert_file(request):
             
             # 检查是否已存在相同URL的处理结果
             existing_file_id = file_mapping.get_id_by_url(url) or file_mapping.get_id_by_md5(url_md5)
+            file_info = file_mapping.get_file_info(existing_file_id) if existing_file_id else None
             
-            if existing_file_id:
-                # 检查文件是否存在
-                file_info = file_mapping.get_file_info(existing_file_id)
-                if file_info and os.path.exists(file_info.get('path', '')):
-                    # 已存在处理结果，直接使用
-                    logger.info(f"URL已有处理结果: {url} -> {existing_file_id}")
-                    
-                    # 创建任务ID
-                    task_id = create_task_id()
-                    
-                    # 更新任务状态为已完成
-                    conversion_tasks[task_id] = {
-                        'status': 'completed',
-                        'message': '文件处理完成',
-                        'file_id': existing_file_id,
-                        'download_url': f"/api/download?file_id={existing_file_id}",
-                        'preview_url': f"/preview?file_id={existing_file_id}"
-                    }
-
-            else:
+            # 检查文件是否存在，超过有效期时确认远程文件未变化
+            if (file_info and os.path.exists(file_info.get('path', ''))
+                    and is_url_result_fresh(existing_file_id, file_info, config)):
+                # 已存在处理结果，直接使用
+                logger.info(f"URL已有处理结果: {url} -> {existing_file_id}")
+                
                 # 创建任务ID
                 task_id = create_task_id()
-                logger.info(f"创建URL处理任务: {task_id} 处理URL: {url}")
                 
-                # 开始后台任务处理URL
-                start_background_task(_process_url, task_id, url, config)
+                # 更新任务状态为已完成
+                set_task(task_id, {
+                    'status': 'completed',
+                    'message': '文件处理完成',
+                    'file_id': existing_file_id,
+                    'download_url': f"/api/download?file_id={existing_file_id}",
+                    'preview_url': f"/preview?file_id={existing_file_id}"
+                })
             
-                # 添加任务状态
-                conversion_tasks[task_id] = {
-                    'status': 'processing',
-                    'message': '正在处理URL',
-                    'url': url,
-                    'url_md5': url_md5,
-                    'file_id': existing_file_id
-                }
+            else:
+                # 同一URL已有进行中的任务时直接复用
+                task_id = _start_url_task(url, url_md5, existing_file_id, config)
             
         elif file_path and os.path.exists(file_path):
             # 处理本地文件
             file_md5 = get_file_md5(file_path)
             
-            # 直接处理文件
-            response = file_processor.process_file(file_path, file_md5)
+            # 直接处理文件，相同内容的并发请求共享同一次处理结果
+            response = inflight.call(get_inflight_key(file_md5=file_md5),
+                                     file_processor.process_file, file_path, file_md5)
             task_id = response.get('task_id')
             
             # 更新任务状态
             if response["status"] == "success":
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'completed',
                     'message': '文件处理完成',
                     'file_id': response.get('file_id'),
                     'preview_url': response.get('preview_url'),
                     'download_url': response.get('download_url')
-                }
+                })
             else:
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'failed',
                     'error': response.get('error', '处理失败')
-                }
+                })
                 
         elif file_id:
             # 处理文件ID请求
@@ -126,13 +118,13 @@ def convert_file(request):
             if file_info and os.path.exists(file_info.get('path')):
                 # 文件已存在，直接返回信息
                 task_id = create_task_id()
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'completed',
                     'message': '文件已存在',
                     'file_id': file_id,
                     'preview_url': f"/preview?file_id={file_id}",
                     'download_url': f"/api/download?file_id={file_id}"
-                }
+                })
             else:
                 # 文件ID无效
                 return jsonify({
@@ -150,28 +142,32 @@ def convert_file(request):
             upload_dir = config['directories']['upload']
             os.makedirs(upload_dir, exist_ok=True)
             
-            # 保存上传的文件
+            # 保存上传的文件，写入的同时计算内容MD5
             file_path = os.path.join(upload_dir, filename)
-            uploaded_file.save(file_path)
+            content_md5, _ = save_chunks(iter_chunks(uploaded_file.stream), file_path)
             
-            # 处理文件
-            response = file_processor.process_file(file_path, None, filename)
+            # 处理文件，相同内容的并发上传共享同一次处理结果
+            response = inflight.call(get_inflight_key(file_md5=content_md5),
+                                     file_processor.process_file, file_path, None, filename,
+                                     content_md5=content_md5)
             task_id = response.get('task_id')
             
             # 更新任务状态
             if response["status"] == "success":
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'completed',
                     'message': '文件处理完成',
                     'file_id': response.get('file_id'),
                     'preview_url': response.get('preview_url'),
                     'download_url': response.get('download_url')
-                }
+                })
             else:
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'failed',
                     'error': response.get('error', '处理失败')
-                }
+                })
+    except TaskQueueFullError as e:
+        return generate_busy_response(str(e), e.retry_after)
     except Exception as e:
         logger.error(f"处理文件请求失败: {str(e)}", exc_info=True)
         return jsonify({
@@ -209,19 +205,59 @@ def convert_file(request):
     
     return jsonify(response_data)
 
-def _process_url(task_id: str, url: str, config: Dict[str, Any]) -> None:
-    """处理URL的后台任务"""
+def _start_url_task(url: str, url_md5: str, existing_file_id: Optional[str], config: Dict[str, Any]) -> str:
+    """
+    创建URL处理任务，同一URL已有进行中的任务时返回该任务ID
+    
+    Args:
+        url: 文件URL
+        url_md5: URL的MD5值
+        existing_file_id: 已知的文件ID
+        config: 配置信息
+    
+    Returns:
+        任务ID
+    """
+    task_id = create_task_id()
+    inflight_key = get_inflight_key(url_md5=url_md5)
+    leader_task_id = inflight.claim(inflight_key, task_id)
+    if leader_task_id:
+        return leader_task_id
+    
+    logger.info(f"创建URL处理任务: {task_id} 处理URL: {url}")
+    
+    # 添加任务状态
+    set_task(task_id, {
+        'status': 'processing',
+        'message': '正在处理URL',
+        'url': url,
+        'url_md5': url_md5,
+        'file_id': existing_file_id
+    })
+    
+    # 异步下载URL，下载完成后提交后台任务处理
+    try:
+        schedule_download(task_id, inflight_key, url, config, _process_url, task_id, url, config)
+    except TaskQueueFullError:
+        inflight.release(inflight_key, task_id)
+        raise
+    
+    return task_id
+
+def _process_url(task_id: str, url: str, config: Dict[str, Any],
+                 download_result: Optional[Dict[str, Any]] = None) -> None:
+    """处理已下载URL文件的后台任务"""
     try:
         # 创建文件处理器
         file_processor = FileProcessor(config)
         
-        # 处理URL
-        response = file_processor.process_url(url)
+        # 处理下载的文件
+        response = file_processor.process_download(url, download_result)
         
         # 更新任务状态
         if response["status"] == "success":
             # 获取更详细的文件信息
-            file_mapping = FileMapping(config)
+            file_mapping = get_services(config).file_mapping
             file_id = response.get('file_id')
             file_info = None
             
@@ -256,20 +292,20 @@ def _process_url(task_id: str, url: str, config: Dict[str, Any]) -> None:
                 task_info['original_name'] = response['original_name']
                 
             # 更新任务状态
-            conversion_tasks[task_id] = task_info
+            set_task(task_id, task_info)
         else:
-            conversion_tasks[task_id] = {
+            set_task(task_id, {
                 'status': 'failed',
                 'error': response.get('error', '处理失败')
-            }
+            })
     
     except Exception as e:
         logger.error(f"处理URL失败: {str(e)}", exc_info=True)
-        conversion_tasks[task_id] = {
+        set_task(task_id, {
             'status': 'failed',
             'message': '处理URL失败',
             'error': str(e)
-        }
+        })
 
 def process_url(request):
     """
@@ -300,24 +336,25 @@ def process_url(request):
         logger.info(f"创建URL处理任务: {task_id} 处理URL: {url}")
         
         # 检查是否已存在相同URL的处理结果
-        file_mapping = FileMapping(config)
+        file_mapping = get_services(config).file_mapping
         existing_file_id = file_mapping.get_id_by_url(url)
         
         if existing_file_id:
-            # 检查文件是否存在
+            # 检查文件是否存在，超过有效期时确认远程文件未变化
             file_info = file_mapping.get_file_info(existing_file_id)
-            if file_info and os.path.exists(file_info.get('path', '')):
+            if (file_info and os.path.exists(file_info.get('path', ''))
+                    and is_url_result_fresh(existing_file_id, file_info, config)):
                 # 已存在处理结果，直接返回
                 logger.info(f"URL已有处理结果: {url} -> {existing_file_id}")
                 
                 # 更新任务状态为已完成
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'completed',
                     'message': '文件处理完成',
                     'file_id': existing_file_id,
                     'download_url': f"/api/files/download?file_id={existing_file_id}",
                     'preview_url': f"/preview?file_id={existing_file_id}"
-                }
+                })
                 
                 # 返回处理中状态，让前端轮询查询
                 return jsonify({
@@ -330,23 +367,10 @@ def process_url(request):
         file_processor = FileProcessor(config)
         
         # 处理URL，获取转换后的文件信息
-        task_id = create_task_id()
-        
-        # 开始后台任务处理URL
-        start_background_task(_process_url, task_id, url, config)
-        
-        # 添加初始任务状态
         url_md5 = get_url_md5(url)
-        file_mapping = FileMapping(config)
+        file_mapping = get_services(config).file_mapping
         existing_file_id = file_mapping.get_id_by_url(url) or file_mapping.get_id_by_md5(url_md5)
-        
-        conversion_tasks[task_id] = {
-            'status': 'processing',
-            'message': '正在处理URL',
-            'url': url,
-            'url_md5': url_md5,
-            'file_id': existing_file_id
-        }
+        task_id = _start_url_task(url, url_md5, existing_file_id, config)
         
         # 构建响应
         response_data = {
@@ -363,6 +387,8 @@ def process_url(request):
         
         return jsonify(response_data)
         
+    except TaskQueueFullError as e:
+        return generate_busy_response(str(e), e.retry_after)
     except Exception as e:
         logger.error(f"处理URL失败: {str(e)}", exc_info=True)
         return jsonify({
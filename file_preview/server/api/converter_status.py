@@ -2,21 +2,109 @@
 转换状态API
 """
 
-from flask import jsonify, current_app, request
-from file_preview.utils.tasks import get_task_status, conversion_tasks
+from flask import jsonify, current_app, request, Response, stream_with_context
+from file_preview.utils.tasks import get_task_status, conversion_tasks, is_task_queued, get_queue_info
+from typing import Dict, Any
 import os
+import json
+import time
 import logging
 
 # 获取日志记录器
 logger = logging.getLogger('file_preview')
 
-def get_conversion_status(task_id):
+# 任务结束状态
+FINAL_STATUSES = ('completed', 'failed')
+
+# 默认配置
+DEFAULT_LONG_POLL_MAX = 30
+DEFAULT_EVENT_STREAM_TIMEOUT = 300
+DEFAULT_EVENT_HEARTBEAT = 15
+DEFAULT_QUEUE_POLL_INTERVAL = 2
+
+def build_status_payload(task_id: str, task_status: Dict[str, Any]) -> Dict[str, Any]:
     """
-    获取转换状态
+    根据任务状态构建返回给客户端的状态信息
     
     Args:
         task_id: 任务ID
+        task_status: 任务状态
+    
+    Returns:
+        状态信息
+    """
+    # 任务排队或正在处理中
+    if task_status.get('status') in ('pending', 'processing'):
+        payload = {
+            "status": "processing",
+            "message": "任务正在处理中",
+            "progress": task_status.get('progress', 0)
+        }
+        
+        # 附加排队信息，排队位置在读取时计算
+        if 'started_at' in task_status:
+            payload['wait_time'] = task_status['wait_time']
+        elif is_task_queued(task_status):
+            payload['message'] = "任务排队中"
+            payload.update(get_queue_info(task_id, task_status))
+        
+        return payload
+    
+    # 任务失败
+    elif task_status.get('status') == 'failed':
+        return {
+            "status": "failed",
+            "message": "处理失败",
+            "error": task_status.get('error', '未知错误')
+        }
+    
+    # 任务完成
+    elif task_status.get('status') == 'completed':
+        # 获取任务中可能已经包含的信息
+        filename = task_status.get('filename', '')
+        file_id = task_status.get('file_id', '')
+        download_url = task_status.get('download_url', '')
+        preview_url = task_status.get('preview_url', '')
+        
+        # 如果没有下载URL，则根据文件ID或文件名生成
+        if not download_url:
+            if file_id:
+                download_url = f"/api/files/download?file_id={file_id}"
+            elif filename:
+                download_url = f"/api/download?file_path={filename}"
         
+        # 如果没有预览URL，则根据文件ID或文件名生成
+        if not preview_url:
+            if file_id:
+                preview_url = f"/preview?file_id={file_id}"
+            elif filename:
+                preview_url = f"/preview?file={filename}"
+        
+        return {
+            "status": "success",
+            "message": task_status.get('message', "处理完成"),
+            "filename": filename,
+            "file_id": file_id,
+            "download_url": download_url,
+            "preview_url": preview_url
+        }
+    
+    # 未知状态
+    else:
+        return {
+            "status": "unknown",
+            "message": "未知状态",
+            "task_status": task_status
+        }
+
+def get_conversion_status(task_id, wait: float = 0):
+    """
+    获取转换状态
+    
+    Args:
+        task_id: 任务ID
+        wait: 长轮询等待时间（秒），大于0时任务未结束则等待状态变化后再返回
+    
     Returns:
         状态响应
     """
@@ -27,8 +115,17 @@ def get_conversion_status(task_id):
         # 获取任务状态
         task_status = get_task_status(task_id)
         
+        # 长轮询：任务未结束时等待下一次状态变化
+        if wait > 0 and task_status is not None and task_status.get('status') not in FINAL_STATUSES:
+            task_config = config.get('tasks', {})
+            wait = min(wait, task_config.get('long_poll_max', DEFAULT_LONG_POLL_MAX))
+            # 排队位置变化不会写入任务状态，排队中的任务按刷新间隔返回最新位置
+            if is_task_queued(task_status):
+                wait = min(wait, task_config.get('queue_poll_interval', DEFAULT_QUEUE_POLL_INTERVAL))
+            task_status = conversion_tasks.wait(task_id, task_status, wait)
+        
         # 输出调试信息
-        logger.debug(f"任务状态: {task_status}, 所有任务: {conversion_tasks}")
+        logger.debug(f"任务状态: {task_id}, {task_status}")
         
         # 任务不存在
         if task_status is None:
@@ -37,66 +134,97 @@ def get_conversion_status(task_id):
                 "message": "任务不存在",
                 "error": "找不到指定的任务ID"
             }), 404
-            
-        # 任务正在处理中
-        if task_status.get('status') == 'processing':
-            return jsonify({
-                "status": "processing",
-                "message": "任务正在处理中",
-                "progress": task_status.get('progress', 0)
-            })
-            
-        # 任务失败
-        elif task_status.get('status') == 'failed':
-            return jsonify({
-                "status": "failed",
-                "message": "处理失败",
-                "error": task_status.get('error', '未知错误')
-            })
-            
-        # 任务完成
-        elif task_status.get('status') == 'completed':
-            # 获取任务中可能已经包含的信息
-            filename = task_status.get('filename', '')
-            file_id = task_status.get('file_id', '')
-            download_url = task_status.get('download_url', '')
-            preview_url = task_status.get('preview_url', '')
-            
-            # 如果没有下载URL，则根据文件ID或文件名生成
-            if not download_url:
-                if file_id:
-                    download_url = f"/api/files/download?file_id={file_id}"
-                elif filename:
-                    download_url = f"/api/download?file_path={filename}"
-            
-            # 如果没有预览URL，则根据文件ID或文件名生成
-            if not preview_url:
-                if file_id:
-                    preview_url = f"/preview?file_id={file_id}"
-                elif filename:
-                    preview_url = f"/preview?file={filename}"
-                
-            return jsonify({
-                "status": "success",
-                "message": task_status.get('message', "处理完成"),
-                "filename": filename,
-                "file_id": file_id,
-                "download_url": download_url,
-                "preview_url": preview_url
-            })
-            
-        # 未知状态
-        else:
-            return jsonify({
-                "status": "unknown",
-                "message": "未知状态",
-                "task_status": task_status
-            })
-            
+        
+        return jsonify(build_status_payload(task_id, task_status))
+    
     except Exception as e:
         logger.error(f"获取转换状态失败: {str(e)}", exc_info=True)
         return jsonify({
             "status": "failed",
             "message": "获取状态失败",
             "error": str(e)
-        }), 500 
\ No newline at end of file
+        }), 500
+
+def _format_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    格式化SSE事件
+    
+    Args:
+        event: 事件名
+        data: 事件数据
+    
+    Returns:
+        SSE事件文本
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_conversion_events(task_id):
+    """
+    以SSE推送任务状态变化，任务结束或超过最长推送时间后关闭连接
+    
+    Args:
+        task_id: 任务ID
+    
+    Returns:
+        事件流响应
+    """
+    config = current_app.config['CONFIG']
+    task_config = config.get('tasks', {})
+    stream_timeout = task_config.get('event_stream_timeout', DEFAULT_EVENT_STREAM_TIMEOUT)
+    heartbeat = task_config.get('event_heartbeat', DEFAULT_EVENT_HEARTBEAT)
+    queue_poll_interval = task_config.get('queue_poll_interval', DEFAULT_QUEUE_POLL_INTERVAL)
+    
+    if task_id not in conversion_tasks:
+        return jsonify({
+            "status": "failed",
+            "message": "任务不存在",
+            "error": "找不到指定的任务ID"
+        }), 404
+    
+    def generate():
+        deadline = time.time() + stream_timeout
+        previous = None
+        previous_payload = None
+        last_sent = time.time()
+        
+        # 告诉浏览器断线后的重连间隔
+        yield "retry: 3000\n\n"
+        
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                yield _format_event('timeout', {"status": "processing", "message": "推送超时，请重新连接"})
+                return
+            
+            # 排队位置变化不会写入任务状态，排队中的任务按刷新间隔重新计算位置
+            interval = queue_poll_interval if is_task_queued(previous) else heartbeat
+            until_heartbeat = max(last_sent + heartbeat - time.time(), 0)
+            task_status = conversion_tasks.wait(task_id, previous, min(interval, remaining, until_heartbeat))
+            if task_status is None:
+                yield _format_event('status', {
+                    "status": "failed",
+                    "message": "任务不存在",
+                    "error": "找不到指定的任务ID"
+                })
+                return
+            
+            payload = build_status_payload(task_id, task_status)
+            previous = task_status
+            if payload == previous_payload:
+                # 没有变化，超过心跳间隔时发送心跳保持连接
+                if time.time() - last_sent >= heartbeat:
+                    yield ": keepalive\n\n"
+                    last_sent = time.time()
+                continue
+            
+            previous_payload = payload
+            last_sent = time.time()
+            yield _format_event('status', payload)
+            
+            if task_status.get('status') in FINAL_STATUSES:
+                return
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
\ No newline at end of file
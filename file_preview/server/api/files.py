@@ -2,9 +2,12 @@
 文件下载和预览API
 """
 
-from flask import request, jsonify, send_file, abort, current_app
+from flask import request, jsonify, abort, current_app
 from file_preview.utils.tasks import get_file_info
 from file_preview.core.cache import CacheManager
+from file_preview.utils.services import get_services
+from file_preview.utils.response import generate_file_response
+from file_preview.utils.utils_core import FileUtils
 import os
 import mimetypes
 import logging
@@ -29,12 +32,12 @@ def download_file(file_path, is_file_id=False):
         original_name = None
         file_info = None
         converted_info = None
+        etag = None
         
         # 根据是否是文件ID处理
         if is_file_id:
             # 获取文件映射
-            from file_preview.utils.mapping import FileMapping
-            file_mapping = FileMapping(config)
+            file_mapping = get_services(config).file_mapping
             
             # 获取文件详细信息
             file_info = file_mapping.get_file_info(file_path)
@@ -47,6 +50,8 @@ def download_file(file_path, is_file_id=False):
                     logger.info(f"使用转换文件信息: {converted_info}")
                     file_path = converted_info['path']
                     original_name = file_info.get('original_name')
+                    # 转换时已记录结果文件的MD5，直接作为 ETag
+                    etag = converted_info.get('md5')
                 elif 'path' in file_info and os.path.exists(file_info['path']):
                     # 使用文件信息中的路径
                     file_path = file_info['path']
@@ -88,7 +93,7 @@ def download_file(file_path, is_file_id=False):
                 
             file_id = task_status.get('file_id')
             if file_id:
-                file_mapping = FileMapping(config)
+                file_mapping = get_services(config).file_mapping
                 
                 # 获取文件详细信息
                 file_info = file_mapping.get_file_info(file_id)
@@ -120,8 +125,8 @@ def download_file(file_path, is_file_id=False):
             possible_paths = [
                 file_path,  # 原始路径
                 os.path.join(root_dir, file_path.lstrip("/")),  # 相对于根目录的路径
-                os.path.join(root_dir, config['directories']['download'].lstrip("./"), os.path.basename(file_path)),  # 下载目录
-                os.path.join(root_dir, config['directories']['convert'].lstrip("./"), os.path.basename(file_path))   # 转换目录
+                os.path.join(FileUtils.normalize_path(config['directories']['download'], root_dir), os.path.basename(file_path)),  # 下载目录
+                os.path.join(FileUtils.normalize_path(config['directories']['convert'], root_dir), os.path.basename(file_path))   # 转换目录
             ]
             
             # 尝试所有可能的路径
@@ -220,9 +225,11 @@ def download_file(file_path, is_file_id=False):
                 }
             })
         
-        # 返回文件
-        return send_file(
+        # 返回文件，URL带有内容版本参数时允许浏览器长期缓存；快速预览的部分结果除外
+        return generate_file_response(
             file_path,
+            etag=etag,
+            cacheable=is_file_id and not (converted_info or {}).get('partial'),
             mimetype=mime_type,
             as_attachment=True,
             download_name=filename
@@ -246,7 +253,7 @@ def get_file_info_api(file_path):
         root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
         
         # 检查文件是否存在
-        download_dir = os.path.join(root_dir, config['directories']['download'].lstrip("./"))
+        download_dir = FileUtils.normalize_path(config['directories']['download'], root_dir)
         file_path = os.path.join(download_dir, file_path)
         
         if not os.path.exists(file_path):
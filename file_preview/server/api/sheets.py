@@ -0,0 +1,149 @@
+"""
+工作表数据API
+"""
+
+from flask import request, jsonify, current_app
+from file_preview.utils.services import get_services
+from file_preview.utils.sheets import (workbook_cache, parse_range, SheetNotFoundError, OPENPYXL_AVAILABLE,
+                                       SHEET_EXTENSIONS, DEFAULT_MAX_WINDOW_ROWS, DEFAULT_MAX_WINDOW_COLS)
+import os
+import logging
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+def _get_workbook(file_id, config):
+    """
+    获取文件ID对应的工作簿，优先使用转换时生成的工作表存储，xls文件先转换为xlsx
+    
+    Args:
+        file_id: 文件ID
+        config: 配置字典
+    
+    Returns:
+        (工作簿, 错误响应)，成功时错误响应为None
+    """
+    services = get_services(config)
+    file_info = services.file_mapping.get_file_info(file_id) or {}
+    file_path, _ = services.file_mapping.get_by_id(file_id)
+    if not file_path:
+        return None, (jsonify({
+            "status": "failed",
+            "message": "找不到文件",
+            "error": f"文件ID: {file_id} 不存在映射关系"
+        }), 404)
+    
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.xls':
+        file_path = services.converter.convert_xls_to_xlsx(file_path)
+        extension = '.xlsx'
+    
+    if not file_path or extension not in SHEET_EXTENSIONS:
+        return None, (jsonify({
+            "status": "failed",
+            "message": "不支持的文件类型",
+            "error": f"文件ID: {file_id} 不是Excel工作簿"
+        }), 400)
+    
+    store_path = (file_info.get('converted_info') or {}).get('sheet_store')
+    return workbook_cache.get(file_path, config, store_path), None
+
+def _unavailable_response():
+    """未安装 openpyxl 时的响应"""
+    return jsonify({
+        "status": "failed",
+        "message": "服务端工作表解析不可用",
+        "error": "未安装 openpyxl"
+    }), 501
+
+def list_sheets(file_id):
+    """
+    获取工作簿中的工作表列表
+    
+    Args:
+        file_id: 文件ID
+    
+    Returns:
+        工作表列表响应
+    """
+    if not OPENPYXL_AVAILABLE:
+        return _unavailable_response()
+    
+    try:
+        config = current_app.config['CONFIG']
+        workbook, error_response = _get_workbook(file_id, config)
+        if error_response:
+            return error_response
+        return jsonify({
+            "status": "success",
+            "message": "获取工作表列表成功",
+            "data": {
+                "file_id": file_id,
+                "sheets": [sheet.info() for sheet in workbook.sheets.values()]
+            }
+        })
+    
+    except Exception as e:
+        logger.error(f"获取工作表列表失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "failed",
+            "message": "获取工作表列表失败",
+            "error": str(e)
+        }), 500
+
+def get_sheet_window(file_id, sheet):
+    """
+    获取工作表中指定行列窗口的单元格值和样式
+    
+    Args:
+        file_id: 文件ID
+        sheet: 工作表名称或从0开始的序号
+    
+    Returns:
+        窗口数据响应
+    """
+    if not OPENPYXL_AVAILABLE:
+        return _unavailable_response()
+    
+    try:
+        config = current_app.config['CONFIG']
+        sheets_config = config.get('sheets', {})
+        max_rows = sheets_config.get('max_window_rows', DEFAULT_MAX_WINDOW_ROWS)
+        max_cols = sheets_config.get('max_window_cols', DEFAULT_MAX_WINDOW_COLS)
+        
+        # 解析行列范围，默认返回前200行、50列
+        try:
+            rows = parse_range(request.args.get('rows'), (0, 199), max_rows)
+            cols = parse_range(request.args.get('cols'), (0, 49), max_cols)
+        except ValueError as e:
+            return jsonify({
+                "status": "failed",
+                "message": "参数错误",
+                "error": f"rows 和 cols 参数格式应为 起始-结束: {str(e)}"
+            }), 400
+        
+        workbook, error_response = _get_workbook(file_id, config)
+        if error_response:
+            return error_response
+        try:
+            sheet_data = workbook.get_sheet(sheet)
+        except SheetNotFoundError:
+            return jsonify({
+                "status": "failed",
+                "message": "工作表不存在",
+                "error": f"工作表不存在: {sheet}"
+            }), 404
+        
+        return jsonify({
+            "status": "success",
+            "message": "获取工作表数据成功",
+            "data": sheet_data.window(rows[0], rows[1], cols[0], cols[1])
+        })
+    
+    except Exception as e:
+        logger.error(f"获取工作表数据失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "failed",
+            "message": "获取工作表数据失败",
+            "error": str(e)
+        }), 500
\ No newline at end of file
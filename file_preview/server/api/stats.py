@@ -3,7 +3,13 @@
 """
 
 from flask import request, jsonify, current_app
-from file_preview.core.cache import CacheManager
+from file_preview.utils.services import get_services
+from file_preview.core.hashing import digest_cache
+from file_preview.core.janitor import get_cache_janitor
+from file_preview.utils.sheets import workbook_cache
+from file_preview.utils.scheduler import get_scheduler
+from file_preview.utils.inflight import inflight
+from file_preview.utils.tasks import conversion_tasks
 
 def get_stats():
     """获取统计信息"""
@@ -12,11 +18,54 @@ def get_stats():
         config = current_app.config['CONFIG']
         
         # 获取缓存管理器
-        cache_manager = CacheManager(config)
+        services = get_services(config)
+        cache_manager = services.cache_manager
         
         # 获取缓存统计信息
         stats = cache_manager.get_statistics()
         
+        # 下载连接池统计
+        stats['http'] = services.downloader.http.get_stats()
+        
+        # 异步下载引擎统计
+        stats['downloads'] = services.download_engine.get_stats()
+        
+        # 各源站的下载连接和吞吐量
+        stats['origins'] = services.downloader.limiter.get_stats()
+        
+        # 转换失败类型和重试统计
+        stats['conversion'] = services.converter.get_stats()
+        
+        # LibreOffice进程池和单次转换配置目录槽位统计，未启用进程池时 pool 为 None
+        converter = services.converter
+        stats['conversion_pool'] = {
+            'pool': converter.pool.get_stats() if converter.pool is not None else None,
+            'profile_slots': converter.profile_slots.get_stats()
+        }
+        
+        # 失败结果缓存统计
+        stats['negative_cache'] = services.negative_cache.get_stats()
+        
+        # 后台任务调度统计
+        stats['scheduler'] = get_scheduler().get_stats()
+        
+        # 进行中任务合并统计
+        stats['inflight'] = inflight.get_stats()
+        
+        # 任务状态存储统计
+        stats['tasks'] = conversion_tasks.get_stats()
+        
+        # 文件摘要缓存统计
+        stats['digests'] = digest_cache.get_stats()
+        
+        # 工作表解析缓存统计
+        stats['sheets'] = workbook_cache.get_stats()
+        
+        # 缓存清理任务统计
+        janitor = get_cache_janitor()
+        if janitor is not None:
+            stats['janitor'] = janitor.get_stats()
+        
         return jsonify({
             'status': 'success',
             'message': '获取统计信息成功',
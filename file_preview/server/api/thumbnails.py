@@ -0,0 +1,79 @@
+"""
+页面缩略图API
+"""
+
+from flask import jsonify, current_app
+from file_preview.utils.services import get_services
+from file_preview.utils.response import generate_file_response
+from file_preview.utils.thumbnails import render_thumbnail, DEFAULT_THUMBNAIL_MAX_PAGE
+import os
+import logging
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+def _get_pdf_path(file_id, config):
+    """
+    获取文件ID对应的PDF转换结果路径
+    
+    Args:
+        file_id: 文件ID
+        config: 配置字典
+    
+    Returns:
+        PDF文件路径，不存在时返回None
+    """
+    file_info = get_services(config).file_mapping.get_file_info(file_id) or {}
+    converted_info = file_info.get('converted_info') or {}
+    pdf_path = converted_info.get('path') or file_info.get('path')
+    if pdf_path and pdf_path.lower().endswith('.pdf') and os.path.exists(pdf_path):
+        return pdf_path
+    return None
+
+def get_thumbnail(file_id, page):
+    """
+    获取PDF指定页的缩略图，未预生成时按需生成
+    
+    Args:
+        file_id: 文件ID
+        page: 页码（从1开始）
+    
+    Returns:
+        PNG图片响应
+    """
+    try:
+        config = current_app.config['CONFIG']
+        max_page = config.get('thumbnails', {}).get('max_page', DEFAULT_THUMBNAIL_MAX_PAGE)
+        if page < 1 or page > max_page:
+            return jsonify({
+                "status": "failed",
+                "message": "参数错误",
+                "error": f"页码应在 1 到 {max_page} 之间"
+            }), 400
+        
+        pdf_path = _get_pdf_path(file_id, config)
+        if not pdf_path:
+            return jsonify({
+                "status": "failed",
+                "message": "找不到文件",
+                "error": f"文件ID: {file_id} 没有PDF转换结果"
+            }), 404
+        
+        thumbnail_path = render_thumbnail(pdf_path, page, config)
+        if not thumbnail_path:
+            return jsonify({
+                "status": "failed",
+                "message": "缩略图不可用",
+                "error": f"无法生成第 {page} 页缩略图"
+            }), 404
+        
+        # 缩略图随PDF按内容存储，URL带有内容版本参数时可长期缓存
+        return generate_file_response(thumbnail_path, cacheable=True, mimetype='image/png')
+    
+    except Exception as e:
+        logger.error(f"获取缩略图失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "failed",
+            "message": "获取缩略图失败",
+            "error": str(e)
+        }), 500
\ No newline at end of file
@@ -7,6 +7,12 @@ import logging
 from flask import Flask, jsonify
 from .routes import api_bp, views_bp
 from ..utils.config import load_config
+from ..utils.scheduler import configure_scheduler, TaskQueueFullError
+from ..utils.tasks import conversion_tasks
+from ..utils.services import get_services
+from ..utils.sheets import workbook_cache
+from ..core.janitor import start_cache_janitor
+from ..utils.response import generate_busy_response
 
 def create_app(config_path=None):
     """
@@ -61,6 +67,17 @@ def create_app(config_path=None):
             }
         }
     
+    # 初始化后台任务调度器和任务状态存储
+    configure_scheduler(app.config['CONFIG'])
+    conversion_tasks.configure(app.config['CONFIG'])
+    workbook_cache.configure(app.config['CONFIG'])
+    
+    # 创建进程共享的缓存、映射、转换和下载服务，各请求直接复用
+    app.extensions['file_preview'] = get_services(app.config['CONFIG'])
+    
+    # 启动后台缓存清理任务
+    start_cache_janitor(app.config['CONFIG'])
+    
     # 注册蓝图
     app.register_blueprint(api_bp)
     app.register_blueprint(views_bp)
@@ -74,6 +91,10 @@ def create_app(config_path=None):
             'error': str(error)
         }), 404
     
+    @app.errorhandler(TaskQueueFullError)
+    def queue_full(error):
+        return generate_busy_response(str(error), error.retry_after)
+    
     @app.errorhandler(500)
     def server_error(error):
         return jsonify({
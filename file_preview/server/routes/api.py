@@ -6,9 +6,10 @@ from flask import Blueprint, request, jsonify, current_app, redirect, url_for
 from ..api.converter import convert_file
 from ..api.files import get_file_info_api, download_file
 from ..api.stats import get_stats
-from ..api.converter_status import get_conversion_status
+from ..api.converter_status import get_conversion_status, stream_conversion_events
+from ..api.sheets import list_sheets, get_sheet_window
+from ..api.thumbnails import get_thumbnail
 import logging
-from file_preview.utils.tasks import conversion_tasks
 
 # 创建蓝图
 api_bp = Blueprint('api', __name__, url_prefix='/api')
@@ -30,11 +31,19 @@ def conversion_status():
             "error": "缺少task_id参数"
         }), 400
         
+    # 长轮询等待时间（秒），为0时立即返回
+    wait = request.args.get('wait', 0, type=float)
+    
     # 添加日志记录
     logger = logging.getLogger('file_preview')
-    logger.info(f"获取任务状态: {task_id}, 任务列表: {list(conversion_tasks.keys())}")
+    logger.debug(f"获取任务状态: {task_id}, 等待: {wait}")
     
-    return get_conversion_status(task_id)
+    return get_conversion_status(task_id, wait)
+
+@api_bp.route('/convert/events/<task_id>', methods=['GET'])
+def conversion_events(task_id):
+    """任务状态事件流API（SSE）"""
+    return stream_conversion_events(task_id)
 
 @api_bp.route('/download', methods=['GET', 'POST'])
 def download():
@@ -56,6 +65,21 @@ def download():
         }), 400
     return download_file(file_path)
 
+@api_bp.route('/sheets/<file_id>', methods=['GET'])
+def sheets(file_id):
+    """工作表列表API"""
+    return list_sheets(file_id)
+
+@api_bp.route('/sheets/<file_id>/<sheet>', methods=['GET'])
+def sheet_window(file_id, sheet):
+    """工作表数据API，通过 rows、cols 参数指定行列窗口，如 rows=0-199&cols=0-49"""
+    return get_sheet_window(file_id, sheet)
+
+@api_bp.route('/thumbnail/<file_id>/<int:page>', methods=['GET'])
+def thumbnail(file_id, page):
+    """页面缩略图API，页码从1开始"""
+    return get_thumbnail(file_id, page)
+
 @api_bp.route('/files', methods=['GET', 'POST'])
 def file_info():
     """文件信息API"""
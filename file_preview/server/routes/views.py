@@ -5,6 +5,9 @@
 from flask import Blueprint, request, redirect, current_app, jsonify, render_template_string, send_file, url_for
 from ..views.preview import render_preview, preview_file, direct_view_file
 from ..views.templates import LOADING_TEMPLATE
+from ...core.converter import CONVERTIBLE_FORMATS
+from ...utils.response import generate_file_response
+from ...utils.utils_core import FileUtils
 import os
 import logging
 
@@ -75,8 +78,8 @@ def direct_view_file(file_id):
         root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
         
         # 获取文件映射
-        from file_preview.utils.mapping import FileMapping
-        file_mapping = FileMapping(config)
+        from file_preview.utils.services import get_services
+        file_mapping = get_services(config).file_mapping
         file_path, original_name = file_mapping.get_by_id(file_id)
         
         if not file_path:
@@ -94,8 +97,8 @@ def direct_view_file(file_id):
             possible_paths = [
                 file_path,  # 原始路径
                 os.path.join(root_dir, file_path.lstrip("/")),  # 相对于根目录的路径
-                os.path.join(root_dir, config['directories']['convert'].lstrip("./"), os.path.basename(file_path)),  # 转换目录
-                os.path.join(root_dir, config['directories']['download'].lstrip("./"), os.path.basename(file_path))   # 下载目录
+                os.path.join(FileUtils.normalize_path(config['directories']['convert'], root_dir), os.path.basename(file_path)),  # 转换目录
+                os.path.join(FileUtils.normalize_path(config['directories']['download'], root_dir), os.path.basename(file_path))   # 下载目录
             ]
             
             file_found = False
@@ -118,15 +121,17 @@ def direct_view_file(file_id):
         file_info = get_file_info(file_path)
         file_ext = file_info.get('extension', '').lower()
         
-        # 检查是否存在转换后的PDF文件
-        pdf_file_path = f"{os.path.splitext(file_path)[0]}.pdf"
-        if file_ext != '.pdf' and os.path.exists(pdf_file_path):
-            # 如果存在PDF版本，优先使用PDF
-            logger.info(f"使用转换后的PDF文件: {pdf_file_path}")
-            return send_file(pdf_file_path, as_attachment=False)
+        # 检查是否存在转换后的PDF文件，转换结果按文件内容存储
+        if file_ext != '.pdf' and file_ext in CONVERTIBLE_FORMATS:
+            pdf_file_path = get_services(config).converter.get_output_path(file_path, 'pdf')
+            if os.path.exists(pdf_file_path):
+                # 如果存在PDF版本，优先使用PDF
+                logger.info(f"使用转换后的PDF文件: {pdf_file_path}")
+                return generate_file_response(pdf_file_path, cacheable=True, as_attachment=False)
         
         # 直接发送文件，设置 as_attachment=False 确保在浏览器中预览而不是下载
-        return send_file(file_path, as_attachment=False)
+        # 快速预览的部分结果会被完整结果替换，不能长期缓存
+        return generate_file_response(file_path, cacheable=not file_mapping.is_partial(file_id), as_attachment=False)
     
     except Exception as e:
         import traceback
@@ -2,12 +2,16 @@
 文件预览视图
 """
 
-from flask import render_template_string, jsonify, redirect, current_app, send_file
+from flask import render_template_string, jsonify, redirect, current_app
 import os
 import logging
-from file_preview.utils.mapping import FileMapping
+from file_preview.utils.services import get_services
 from file_preview.server.views.templates import EXCEL_PREVIEW_TEMPLATE, PREVIEW_TEMPLATE, LOADING_TEMPLATE
 from file_preview.utils.file_utils import get_file_info, get_file_md5
+from file_preview.utils.utils_core import FileUtils
+from file_preview.utils.response import generate_file_response, VERSION_PARAM
+from file_preview.utils.sheets import OPENPYXL_AVAILABLE
+from file_preview.utils.freshness import is_url_result_fresh
 
 logger = logging.getLogger('file_preview')
 
@@ -30,7 +34,7 @@ def render_preview(file_id=None, filename=None, url=None, config=None, convert_t
         预览页面或错误响应
     """
     # 创建文件映射实例
-    file_mapping = FileMapping(config)
+    file_mapping = get_services(config).file_mapping
     
     # 根据文件ID预览
     if file_id:
@@ -86,14 +90,16 @@ def _preview_by_file_id(file_id, file_mapping, config, convert_to_pdf=False):
             title=original_name or os.path.basename(file_path),
             filePath=f"/api/download?file_id={file_id}",
             fileType="excel",
-            fileName=original_name or os.path.basename(file_path)
+            fileName=original_name or os.path.basename(file_path),
+            fileId=file_id,
+            sheetsApi=f"/api/sheets/{file_id}" if OPENPYXL_AVAILABLE else ""
         )
     elif file_ext == '.pdf':
         # PDF直接预览
         return render_template_string(
             PREVIEW_TEMPLATE,
             title=original_name or os.path.basename(file_path),
-            pdf_url=f'/view/{file_id}'
+            pdf_url=_view_url(file_id, file_path)
         )
     elif file_ext in DOCUMENT_EXTENSIONS or convert_to_pdf:
         # 检查是否已有对应的PDF文件
@@ -104,7 +110,7 @@ def _preview_by_file_id(file_id, file_mapping, config, convert_to_pdf=False):
             return render_template_string(
                 PREVIEW_TEMPLATE,
                 title=original_name or os.path.basename(file_path),
-                pdf_url=f'/view/{pdf_file_id}'
+                pdf_url=_view_url(pdf_file_id, pdf_path)
             )
         else:
             # 否则创建转换任务
@@ -129,7 +135,8 @@ def _preview_by_url(url, file_mapping, config, convert_to_pdf=False):
     if file_id:
         # URL已处理过，获取文件信息
         file_path, original_name = file_mapping.get_by_id(file_id)
-        if file_path and os.path.exists(file_path):
+        if (file_path and os.path.exists(file_path)
+                and is_url_result_fresh(file_id, file_mapping.get_file_info(file_id), config)):
             # 更新访问时间
             file_mapping.update_access_time(file_id)
             # 根据已有文件ID进行预览
@@ -143,12 +150,25 @@ def _preview_by_url(url, file_mapping, config, convert_to_pdf=False):
         task_id=task_id
     )
 
+def _view_url(file_id, pdf_path):
+    """
+    生成PDF查看地址，带上内容版本参数，内容不变时浏览器可长期缓存
+    
+    Args:
+        file_id: 文件ID
+        pdf_path: 文件ID对应的PDF文件路径
+    
+    Returns:
+        查看地址
+    """
+    return f'/view/{file_id}?{VERSION_PARAM}={get_file_md5(pdf_path)}'
+
 def _preview_by_filename(filename, file_mapping, config, convert_to_pdf=False):
     """根据文件名预览文件"""
     # 获取文件路径
     root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
-    convert_dir = os.path.join(root_dir, config['directories']['convert'].lstrip("./"))
-    download_dir = os.path.join(root_dir, config['directories']['download'].lstrip("./"))
+    convert_dir = FileUtils.normalize_path(config['directories']['convert'], root_dir)
+    download_dir = FileUtils.normalize_path(config['directories']['download'], root_dir)
     
     file_path = os.path.join(convert_dir, filename)
     download_path = os.path.join(download_dir, filename)
@@ -188,8 +208,8 @@ def _find_alternative_path(file_path, config):
     possible_paths = [
         file_path,  # 原始路径
         os.path.join(root_dir, file_path.lstrip("/")),  # 相对于根目录的路径
-        os.path.join(root_dir, config['directories']['convert'].lstrip("./"), os.path.basename(file_path)),  # 转换目录
-        os.path.join(root_dir, config['directories']['download'].lstrip("./"), os.path.basename(file_path))   # 下载目录
+        os.path.join(FileUtils.normalize_path(config['directories']['convert'], root_dir), os.path.basename(file_path)),  # 转换目录
+        os.path.join(FileUtils.normalize_path(config['directories']['download'], root_dir), os.path.basename(file_path))   # 下载目录
     ]
     
     for path in possible_paths:
@@ -200,16 +220,8 @@ def _find_alternative_path(file_path, config):
     return None
 
 def _get_pdf_path(file_path, config):
-    """获取对应的PDF文件路径"""
-    # 获取项目根目录和转换目录
-    root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
-    convert_dir = os.path.join(root_dir, config['directories']['convert'].lstrip("./"))
-    
-    # 生成PDF文件路径
-    base_name = os.path.splitext(os.path.basename(file_path))[0]
-    pdf_path = os.path.join(convert_dir, f"{base_name}.pdf")
-    
-    return pdf_path
+    """获取对应的PDF文件路径，转换结果按文件内容存储"""
+    return get_services(config).converter.get_output_path(file_path, 'pdf')
 
 def _ensure_file_id(file_path, file_mapping, original_name=None):
     """确保文件有对应的ID"""
@@ -238,7 +250,7 @@ def preview_file(file_id):
             }), 500
         
         # 创建文件映射实例
-        file_mapping = FileMapping(config)
+        file_mapping = get_services(config).file_mapping
         
         # 通过辅助函数预览文件
         return _preview_by_file_id(file_id, file_mapping, config)
@@ -265,7 +277,7 @@ def direct_view_file(file_id):
             }), 500
         
         # 创建文件映射实例
-        file_mapping = FileMapping(config)
+        file_mapping = get_services(config).file_mapping
         
         # 获取文件路径
         file_path, original_name = file_mapping.get_by_id(file_id)
@@ -296,10 +308,11 @@ def direct_view_file(file_id):
             pdf_path = _get_pdf_path(file_path, config)
             if os.path.exists(pdf_path):
                 logger.info(f"使用转换后的PDF文件: {pdf_path}")
-                return send_file(pdf_path, as_attachment=False)
+                return generate_file_response(pdf_path, cacheable=True, as_attachment=False)
         
         # 直接发送文件，确保在浏览器中预览而不是下载
-        return send_file(file_path, as_attachment=False)
+        # 快速预览的部分结果会被完整结果替换，不能长期缓存
+        return generate_file_response(file_path, cacheable=not file_mapping.is_partial(file_id), as_attachment=False)
     
     except Exception as e:
         import traceback
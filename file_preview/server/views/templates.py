@@ -41,24 +41,62 @@ LOADING_TEMPLATE = """
         }
     </style>
     <script>
+        // 处理任务状态，返回任务是否已结束
+        function handleStatus(data) {
+            if (data.status === 'success') {
+                window.location.href = data.preview_url;
+                return true;
+            } else if (data.status === 'failed') {
+                document.querySelector('.message').textContent = '转换失败: ' + data.error;
+                return true;
+            } else if (data.queue_position) {
+                document.querySelector('.message').textContent = '排队中，当前排在第 ' + data.queue_position + ' 位...';
+            } else if (data.queue_depth !== undefined) {
+                document.querySelector('.message').textContent = '排队中，队列中共有 ' + data.queue_depth + ' 个任务...';
+            } else if (data.progress) {
+                document.querySelector('.message').textContent = '处理中 ' + data.progress + '%...';
+            }
+            return false;
+        }
+        // 不支持事件流时使用长轮询，服务端在状态变化时立即返回
         function checkStatus() {
-            fetch('/api/convert/status?task_id={{ task_id }}')
+            fetch('/api/convert/status?task_id={{ task_id }}&wait=25')
                 .then(response => response.json())
                 .then(data => {
-                    if (data.status === 'success') {
-                        window.location.href = data.preview_url;
-                    } else if (data.status === 'failed') {
-                        document.querySelector('.message').textContent = '转换失败: ' + data.error;
-                    } else {
-                        setTimeout(checkStatus, 1000);
+                    if (!handleStatus(data)) {
+                        setTimeout(checkStatus, 100);
                     }
                 })
                 .catch(error => {
                     document.querySelector('.message').textContent = '发生错误: ' + error;
                 });
         }
+        function watchEvents() {
+            var source = new EventSource('/api/convert/events/{{ task_id }}');
+            var finished = false;
+            source.addEventListener('status', function(event) {
+                finished = handleStatus(JSON.parse(event.data));
+                if (finished) {
+                    source.close();
+                }
+            });
+            source.addEventListener('timeout', function() {
+                source.close();
+                watchEvents();
+            });
+            source.onerror = function() {
+                source.close();
+                if (!finished) {
+                    checkStatus();
+                }
+            };
+        }
         window.onload = function() {
-            checkStatus();
+            if (window.EventSource) {
+                watchEvents();
+            } else {
+                checkStatus();
+            }
         };
     </script>
 </head>
@@ -127,7 +165,10 @@ EXCEL_PREVIEW_TEMPLATE = """
         window.previewParams = {
             filePath: "{{ filePath }}",
             fileType: "{{ fileType }}",
-            fileName: "{{ fileName }}"
+            fileName: "{{ fileName }}",
+            fileId: "{{ fileId }}",
+            // 服务端分页的工作表数据接口，为空时前端下载整个工作簿解析
+            sheetsApi: "{{ sheetsApi }}"
         };
     </script>
     <script type="module" src="/static/dist/assets/index-2aad9fde.js"></script>
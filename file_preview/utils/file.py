@@ -7,6 +7,7 @@ import hashlib
 import logging
 import time
 from typing import Dict, Any, Optional, Tuple
+from ..core.hashing import file_md5
 
 logger = logging.getLogger('file_preview')
 
@@ -69,11 +70,7 @@ def get_file_md5(file_path: str) -> str:
     Returns:
         MD5 值
     """
-    hash_md5 = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+    return file_md5(file_path)
 
 def get_url_md5(url: str) -> str:
     """
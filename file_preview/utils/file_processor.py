@@ -4,19 +4,28 @@
 """
 
 import os
+import shutil
 import logging
 import time
 from typing import Dict, Any, Optional, Tuple, List
-from ..core.converter import FileConverter
-from ..core.cache import CacheManager
 from .file_utils import get_file_info, is_supported_format, get_file_md5, get_url_md5
-from .mapping import FileMapping
-from ..core.downloader import FileDownloader
+from .services import get_services
+from .sheets import ensure_sheet_store, OPENPYXL_AVAILABLE, SHEET_EXTENSIONS
+from .thumbnails import schedule_thumbnails
+from .scheduler import get_scheduler, TaskQueueFullError
+from .inflight import inflight
+from .freshness import is_url_result_fresh
 from .utils_core import FileUtils
 
 # 获取日志记录器
 logger = logging.getLogger('file_preview')
 
+# 快速预览默认只转换的页数
+DEFAULT_QUICK_PREVIEW_PAGES = 5
+
+# 超过该大小（字节）的文档启用快速预览
+DEFAULT_QUICK_PREVIEW_MIN_SIZE = 20 * 1024 * 1024
+
 class FileProcessor:
     """文件处理器"""
     
@@ -28,13 +37,17 @@ class FileProcessor:
             config: 配置字典
         """
         self.config = config
-        self.converter = FileConverter(config)
-        self.cache_manager = CacheManager(config)
-        self.file_mapping = FileMapping(config)
-        self.downloader = FileDownloader(config)
+        
+        # 使用进程共享的服务，创建处理器不再初始化目录和缓存后端
+        services = get_services(config)
+        self.converter = services.converter
+        self.cache_manager = services.cache_manager
+        self.file_mapping = services.file_mapping
+        self.downloader = services.downloader
+        self.negative_cache = services.negative_cache
     
     def process_file(self, file_path: str, file_md5: Optional[str] = None, 
-                    original_name: Optional[str] = None) -> Dict[str, Any]:
+                    original_name: Optional[str] = None, content_md5: Optional[str] = None) -> Dict[str, Any]:
         """
         处理文件，根据文件类型选择不同的处理方式
         
@@ -42,6 +55,7 @@ class FileProcessor:
             file_path: 文件路径
             file_md5: 文件MD5（可选）
             original_name: 原始文件名（可选）
+            content_md5: 接收文件时已计算的内容MD5（可选），提供时不再读取文件计算
             
         Returns:
             处理结果字典
@@ -69,9 +83,23 @@ class FileProcessor:
                     "error": f"不支持的文件格式: {original_file_info['extension']}"
                 }
             
-            # 如果未提供 MD5，则计算文件 MD5
+            # 如果未提供 MD5，则使用接收时计算的内容 MD5，都没有时再计算
+            if not content_md5:
+                content_md5 = get_file_md5(file_path)
             if not file_md5:
-                file_md5 = get_file_md5(file_path)
+                file_md5 = content_md5
+            
+            # 同一内容最近转换失败过，退避时间内直接返回缓存的错误
+            failure = self.negative_cache.get(content_md5)
+            if failure:
+                logger.info(f"文件最近转换失败，{failure['retry_after']} 秒后才会重试: {content_md5}")
+                return {
+                    "status": "failed",
+                    "message": "文件处理失败",
+                    "error": failure['error'],
+                    "failure_class": failure['failure_class'],
+                    "retry_after": failure['retry_after']
+                }
             
             # 获取文件扩展名（小写）
             extension = original_file_info['extension'].lower()
@@ -88,9 +116,15 @@ class FileProcessor:
             
             # 根据文件类型选择不同的处理方式
             if extension in ['.doc', '.docx', '.ppt', '.pptx']:
+                # 大文件先只转换前几页，完整转换在后台进行
+                if self._use_quick_preview(file_path):
+                    result_path = self.converter.convert(file_path, pages=self._quick_preview_pages())
+                    conversion_method = "first_pages"
+                
                 # 文档和演示文稿转换为PDF
-                result_path = self._process_to_pdf(file_path, file_md5)
-                conversion_method = "to_pdf"
+                if not result_path:
+                    result_path = self._process_to_pdf(file_path, file_md5)
+                    conversion_method = "to_pdf"
             elif extension == '.xls':
                 # XLS 转换为 XLSX
                 result_path = self._process_xls_to_xlsx(file_path, file_md5)
@@ -107,13 +141,20 @@ class FileProcessor:
             conversion_time_end = time.time()
             conversion_duration = conversion_time_end - conversion_time_start
             
-            # 如果处理失败
+            # 如果处理失败，按转换器给出的失败类型记录失败结果，退避时间内不再重复转换
             if not result_path:
+                failure = None
+                if conversion_method != "cache_only":
+                    failure = self.converter.last_failure
+                failure_class, error = failure or ('conversion', "处理过程中出错")
+                self.negative_cache.record(content_md5, failure_class, error)
                 return {
                     "status": "failed",
                     "message": "文件处理失败",
-                    "error": "处理过程中出错"
+                    "error": error,
+                    "failure_class": failure_class
                 }
+            self.negative_cache.clear(content_md5)
             
             # 获取转换后的文件信息
             converted_file_info = get_file_info(result_path)
@@ -125,9 +166,13 @@ class FileProcessor:
                 'extension': original_file_info['extension'],
                 'size': os.path.getsize(file_path) if os.path.exists(file_path) else 0,
                 'last_modified': os.path.getmtime(file_path) if os.path.exists(file_path) else 0,
-                'md5': file_md5
+                'md5': file_md5,
+                'content_md5': content_md5
             }
             
+            # 转换结果按内容存储，文件名固定，返回给客户端时使用原始文件名
+            result_filename = f"{os.path.splitext(original_filename)[0]}{converted_file_info['extension']}"
+            
             # 获取转换后文件的MIME类型
             import mimetypes
             converted_mime_type = mimetypes.guess_type(result_path)[0] or 'application/octet-stream'
@@ -135,7 +180,7 @@ class FileProcessor:
             # 构建详细的转换文件信息
             converted_file_details = {
                 'path': result_path,
-                'filename': os.path.basename(result_path),
+                'filename': result_filename,
                 'extension': converted_file_info['extension'],
                 'size': os.path.getsize(result_path) if os.path.exists(result_path) else 0,
                 'conversion_method': conversion_method,
@@ -145,6 +190,23 @@ class FileProcessor:
                 'mime_type': converted_mime_type
             }
             
+            # 快速预览只包含前几页，完整结果生成后替换
+            if conversion_method == "first_pages":
+                converted_file_details['partial'] = True
+                converted_file_details['pages'] = self._quick_preview_pages()
+            
+            # Excel工作簿在转换阶段生成工作表存储，预览时按行块读取，不再重复解析
+            if (OPENPYXL_AVAILABLE and converted_file_info['extension'].lower() in SHEET_EXTENSIONS
+                    and self.config.get('sheets', {}).get('precompute', True)):
+                try:
+                    converted_file_details['sheet_store'] = ensure_sheet_store(result_path, self.config)
+                except Exception as e:
+                    logger.warning(f"生成工作表存储失败: {str(e)}")
+            
+            # PDF结果在后台预生成前几页缩略图
+            if converted_file_info['extension'].lower() == '.pdf':
+                schedule_thumbnails(result_path, self.config)
+            
             # 添加文件映射，包含详细的原始和转换信息
             file_id = self.file_mapping.add(
                 file_md5, 
@@ -154,6 +216,9 @@ class FileProcessor:
                 converted_info=converted_file_details
             )
             
+            if file_id and converted_file_details.get('partial'):
+                self._schedule_full_conversion(file_path, file_md5, file_id, converted_file_details)
+            
             # 生成任务ID
             task_id = os.urandom(16).hex()
             
@@ -163,7 +228,7 @@ class FileProcessor:
                 "message": "文件已处理",
                 "task_id": task_id,
                 "file_id": file_id,
-                "filename": os.path.basename(result_path),
+                "filename": result_filename,
                 "original_name": original_filename,
                 "output_path": result_path,
                 "file_type": converted_file_info['extension'].lstrip('.'),
@@ -204,8 +269,9 @@ class FileProcessor:
             existing_file_id = self.file_mapping.get_id_by_url(url) or self.file_mapping.get_id_by_md5(url_md5)
             if existing_file_id:
                 file_info = self.file_mapping.get_file_info(existing_file_id)
-                if file_info and os.path.exists(file_info.get('path')):
-                    # 文件已存在，直接返回信息
+                if (file_info and os.path.exists(file_info.get('path'))
+                        and is_url_result_fresh(existing_file_id, file_info, self.config)):
+                    # 文件已存在且远程文件未变化，直接返回信息
                     task_id = os.urandom(16).hex()
                     
                     # 构建响应
@@ -228,24 +294,58 @@ class FileProcessor:
                     return response
             
             # 下载文件
-            file_path = self.downloader.download(url)
-            if not file_path:
+            return self.process_download(url, self.downloader.fetch(url), url_md5)
+        
+        except Exception as e:
+            logger.error(f"处理URL失败: {str(e)}", exc_info=True)
+            return {
+                "status": "failed",
+                "message": "处理URL失败",
+                "error": str(e)
+            }
+    
+    def process_download(self, url: str, download_result: Optional[Dict[str, Any]],
+                         url_md5: Optional[str] = None) -> Dict[str, Any]:
+        """
+        处理已下载的URL文件，处理结束后删除下载的文件
+        
+        Args:
+            url: 文件URL
+            download_result: 下载结果，下载失败时为None
+            url_md5: URL的MD5值
+        
+        Returns:
+            处理结果字典
+        """
+        try:
+            if not download_result:
+                failure = self.downloader.get_failure(url)
                 return {
                     "status": "failed",
                     "message": "下载失败",
-                    "error": "下载URL文件失败"
+                    "error": failure['error'] if failure else "下载URL文件失败"
                 }
+            file_path = download_result['path']
+            if not url_md5:
+                url_md5 = FileUtils.get_url_md5(url)
             
             try:
                 # 记录下载信息
                 download_info = {
                     'url': url,
                     'download_time': time.time(),
-                    'url_md5': url_md5
+                    'url_md5': url_md5,
+                    'content_md5': download_result['md5'],
+                    'file_size': download_result['size'],
+                    'validators': download_result.get('validators', {})
                 }
                 
                 # 处理文件
-                response = self.process_file(file_path, url_md5, os.path.basename(file_path))
+                response = self.process_file(file_path, url_md5, download_result.get('filename'),
+                                             content_md5=download_result['md5'])
+                
+                # 内容转换失败时URL也进入退避，下次请求不再下载
+                self.record_url_failure(url, response, download_result)
                 
                 # 添加URL到文件映射
                 if response["status"] == "success" and response.get("file_id"):
@@ -276,6 +376,21 @@ class FileProcessor:
                 "error": str(e)
             }
     
+    def record_url_failure(self, url: str, response: Dict[str, Any], download_result: Dict[str, Any]) -> None:
+        """
+        下载的文件转换失败并已记录失败结果时，同样记录URL的失败
+        
+        Args:
+            url: 文件URL
+            response: 处理结果
+            download_result: 下载结果
+        """
+        if response.get("status") == "success":
+            return
+        failure = self.negative_cache.get(download_result['md5'])
+        if failure:
+            self.downloader.record_failure(url, failure['failure_class'], failure['error'])
+    
     def get_file_by_id(self, file_id: str) -> Dict[str, Any]:
         """
         通过文件ID获取文件
@@ -365,6 +480,108 @@ class FileProcessor:
             logger.error(f"PDF转换失败: {str(e)}", exc_info=True)
             return None
     
+    def _quick_preview_pages(self) -> int:
+        """快速预览转换的页数"""
+        return self.config.get('conversion', {}).get('quick_preview_pages', DEFAULT_QUICK_PREVIEW_PAGES)
+    
+    def _use_quick_preview(self, file_path: str) -> bool:
+        """
+        是否对文件使用快速预览
+        
+        Args:
+            file_path: 文件路径
+        
+        Returns:
+            已启用、文件足够大且还没有完整转换结果时返回True
+        """
+        conversion = self.config.get('conversion', {})
+        if not conversion.get('quick_preview', True):
+            return False
+        if os.path.getsize(file_path) < conversion.get('quick_preview_min_size', DEFAULT_QUICK_PREVIEW_MIN_SIZE):
+            return False
+        return not os.path.exists(self.converter.get_output_path(file_path, 'pdf'))
+    
+    def _schedule_full_conversion(self, file_path: str, file_md5: str, file_id: str,
+                                  converted_info: Dict[str, Any]) -> bool:
+        """
+        提交后台完整转换，完成后替换文件ID对应的快速预览结果
+        
+        上传或下载的原始文件在处理结束后可能被删除，后台转换使用放在转换结果目录下的副本。
+        
+        Args:
+            file_path: 文件路径
+            file_md5: 文件MD5
+            file_id: 文件ID
+            converted_info: 快速预览的转换信息
+        
+        Returns:
+            是否已提交
+        """
+        inflight_key = f"full_pdf:{file_md5}"
+        task_token = os.urandom(8).hex()
+        if inflight.claim(inflight_key, task_token) is not None:
+            return False
+        
+        extension = os.path.splitext(file_path)[1].lower()
+        source_path = self.converter.get_output_path(file_path, extension.lstrip('.'), variant='source')
+        try:
+            try:
+                os.link(file_path, source_path)
+            except OSError:
+                shutil.copyfile(file_path, source_path)
+            
+            get_scheduler().submit(inflight.bind(inflight_key, task_token, self._complete_full_conversion),
+                                   args=(source_path, file_md5, file_id, converted_info))
+            logger.info(f"已提交后台完整转换: {file_id}")
+            return True
+        except TaskQueueFullError:
+            logger.warning(f"任务队列已满，暂不进行完整转换: {file_id}")
+        except Exception as e:
+            logger.error(f"提交完整转换失败: {str(e)}", exc_info=True)
+        
+        inflight.release(inflight_key, task_token)
+        if os.path.exists(source_path):
+            os.remove(source_path)
+        return False
+    
+    def _complete_full_conversion(self, source_path: str, file_md5: str, file_id: str,
+                                  converted_info: Dict[str, Any]) -> Optional[str]:
+        """
+        执行完整转换并替换文件映射中的快速预览结果
+        
+        Args:
+            source_path: 原始文件副本路径，转换结束后删除
+            file_md5: 文件MD5
+            file_id: 文件ID
+            converted_info: 快速预览的转换信息
+        
+        Returns:
+            完整PDF路径，失败则返回None
+        """
+        try:
+            conversion_time_start = time.time()
+            pdf_path = self._process_to_pdf(source_path, file_md5)
+            if not pdf_path:
+                logger.error(f"后台完整转换失败，保留快速预览结果: {file_id}")
+                return None
+            
+            full_info = {key: value for key, value in converted_info.items() if key not in ('partial', 'pages')}
+            full_info.update({
+                'path': pdf_path,
+                'size': os.path.getsize(pdf_path),
+                'conversion_method': "to_pdf",
+                'conversion_time': conversion_time_start,
+                'conversion_duration': time.time() - conversion_time_start,
+                'md5': get_file_md5(pdf_path)
+            })
+            self.file_mapping.replace_converted(file_id, pdf_path, full_info)
+            schedule_thumbnails(pdf_path, self.config)
+            return pdf_path
+        
+        finally:
+            if os.path.exists(source_path):
+                os.remove(source_path)
+    
     def _process_xls_to_xlsx(self, file_path: str, file_md5: str) -> Optional[str]:
         """
         将XLS文件转换为XLSX并缓存
@@ -449,7 +666,7 @@ class FileProcessor:
             root_dir = FileUtils.get_project_root()
             
             # 获取转换目录的绝对路径
-            convert_dir_abs = os.path.join(root_dir, self.config['directories']['convert'].lstrip("./"))
+            convert_dir_abs = FileUtils.normalize_path(self.config['directories']['convert'], root_dir)
             
             # 确保转换目录存在
             os.makedirs(convert_dir_abs, exist_ok=True)
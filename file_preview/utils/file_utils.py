@@ -7,10 +7,8 @@ import logging
 import hashlib
 import mimetypes
 from typing import Dict, Any, Optional, Tuple
-from ..core.converter import FileConverter
-from ..core.downloader import FileDownloader
-from ..core.cache import CacheManager
-from ..utils.mapping import FileMapping
+from ..core.hashing import save_chunks, iter_chunks
+from .services import get_services
 from .utils_core import FileUtils, MIME_TO_EXT, DEFAULT_SUPPORTED_FORMATS
 
 # 获取日志记录器
@@ -54,9 +52,9 @@ def save_uploaded_file(file, filename: str) -> str:
     upload_dir = os.path.join(root_dir, 'uploads')
     os.makedirs(upload_dir, exist_ok=True)
     
-    # 保存文件
+    # 保存文件，写入的同时计算内容MD5，后续计算MD5时直接复用
     file_path = os.path.join(upload_dir, filename)
-    file.save(file_path)
+    save_chunks(iter_chunks(file.stream), file_path)
     
     return file_path
 
@@ -147,7 +145,7 @@ def process_file_conversion(file_path: str, config: Dict[str, Any],
             possible_paths = [
                 file_path,  # 原始路径
                 os.path.join(root_dir, file_path.lstrip("/")),  # 相对于根目录的路径
-                os.path.join(root_dir, config['directories']['download'].lstrip("./"), os.path.basename(file_path))  # 下载目录
+                os.path.join(FileUtils.normalize_path(config['directories']['download'], root_dir), os.path.basename(file_path))  # 下载目录
             ]
             
             # 尝试所有可能的路径
@@ -175,8 +173,8 @@ def process_file_conversion(file_path: str, config: Dict[str, Any],
             }
         
         # 转换文件
-        converter = FileConverter(config)
-        cache_manager = CacheManager(config)
+        converter = get_services(config).converter
+        cache_manager = get_services(config).cache_manager
         
         # 检查缓存
         if cache_manager.exists(file_path):
@@ -194,7 +192,7 @@ def process_file_conversion(file_path: str, config: Dict[str, Any],
             cache_manager.put(file_path, pdf_path)
         
         # 添加文件映射
-        file_mapping = FileMapping(config)
+        file_mapping = get_services(config).file_mapping
         md5_key = file_md5 or url_md5
         file_id = ""
         if md5_key:
@@ -207,7 +205,7 @@ def process_file_conversion(file_path: str, config: Dict[str, Any],
             "status": "success",
             "message": "文件已转换",
             "task_id": task_id,
-            "filename": os.path.basename(pdf_path),
+            "filename": f"{os.path.splitext(original_name or os.path.basename(file_path))[0]}.pdf",
             "file_id": file_id
         }
         
@@ -233,14 +231,15 @@ def download_and_process_url(url: str, config: Dict[str, Any], url_md5: str) ->
     """
     try:
         # 下载文件
-        downloader = FileDownloader(config)
-        file_path = downloader.download(url)
-        if not file_path:
+        downloader = get_services(config).downloader
+        download_result = downloader.fetch(url)
+        if not download_result:
             return None, {
                 "status": "failed",
                 "message": "下载失败",
                 "error": "下载失败"
             }
+        file_path = download_result['path']
         
         try:
             # 处理文件转换
@@ -248,12 +247,12 @@ def download_and_process_url(url: str, config: Dict[str, Any], url_md5: str) ->
                 file_path=file_path,
                 config=config,
                 url_md5=url_md5,
-                original_name=os.path.basename(file_path)
+                original_name=download_result['filename']
             )
             
             # 确保响应中包含文件ID
             if response["status"] == "success" and not response.get("file_id") and url_md5:
-                file_mapping = FileMapping(config)
+                file_mapping = get_services(config).file_mapping
                 file_id = file_mapping.get_id_by_md5(url_md5)
                 if file_id:
                     response["file_id"] = file_id
@@ -283,7 +282,7 @@ def check_mapped_file(md5_hash: str, config: Dict[str, Any]) -> Optional[str]:
     Returns:
         任务ID或None
     """
-    file_mapping = FileMapping(config)
+    file_mapping = get_services(config).file_mapping
     mapped_pdf = file_mapping.get(md5_hash)
     
     if mapped_pdf:
@@ -323,7 +322,7 @@ def process_excel_direct_preview(file_path: str, filename: str, config: Dict[str
             file_path = target_path
     
     # 添加文件映射并获取文件ID
-    file_mapping = FileMapping(config)
+    file_mapping = get_services(config).file_mapping
     file_id = file_mapping.add(file_md5, file_path, filename)
     
     # 生成响应
@@ -351,7 +350,7 @@ def handle_file_by_id(file_id: str, config: Dict[str, Any], action: str = 'previ
         响应字典或None（如果文件不存在）
     """
     # 获取映射
-    file_mapping = FileMapping(config)
+    file_mapping = get_services(config).file_mapping
     file_path, original_name = file_mapping.get_by_id(file_id)
     
     if not file_path or not os.path.exists(file_path):
@@ -383,7 +382,7 @@ def process_url_file(url: str, config: Dict[str, Any], action: str = 'preview',
     url_md5 = get_url_md5(url)
     
     # 检查文件映射
-    file_mapping = FileMapping(config)
+    file_mapping = get_services(config).file_mapping
     file_id = file_mapping.get_id_by_md5(url_md5)
     
     # 如果文件已经存在
@@ -401,41 +400,28 @@ def process_url_file(url: str, config: Dict[str, Any], action: str = 'preview',
     # 如果是下载操作
     if action == 'download':
         # 下载文件
-        downloader = FileDownloader(config)
-        file_path = downloader.download(url)
-        if not file_path:
+        downloader = get_services(config).downloader
+        download_result = downloader.fetch(url)
+        if not download_result:
             return {
                 "status": "failed",
                 "message": "下载文件失败",
                 "error": "无法从URL下载文件"
             }
         
-        try:
-            # 获取文件名和类型
-            filename = os.path.basename(file_path)
-            
-            # 移动到下载目录
-            target_path = os.path.join(config['directories']['download'], filename)
-            if file_path != target_path and not os.path.exists(target_path):
-                os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                os.rename(file_path, target_path)
-                file_path = target_path
-            
-            # 添加文件映射
-            file_id = file_mapping.add(url_md5, file_path, filename)
-            
-            # 生成响应
-            return generate_file_response(
-                file_path=file_path,
-                file_id=file_id,
-                original_name=filename,
-                action='download',
-                convert_to_pdf=False
-            )
-        finally:
-            # 确保文件被处理
-            if os.path.exists(file_path) and file_path != target_path:
-                os.remove(file_path)
+        # 下载器已将文件写入下载目录，直接登记映射，不再移动或复制；下载文件名是随机生成的，使用URL中的原始文件名
+        file_path = download_result['path']
+        filename = download_result['filename']
+        file_id = file_mapping.add(url_md5, file_path, filename)
+        
+        # 生成响应
+        return generate_file_response(
+            file_path=file_path,
+            file_id=file_id,
+            original_name=filename,
+            action='download',
+            convert_to_pdf=False
+        )
     
     # 对于Excel文件的直接预览或其他预览/转换操作，使用异步处理
     # 生成任务ID
@@ -473,7 +459,7 @@ def process_uploaded_file(file_path: str, filename: str, config: Dict[str, Any],
         possible_paths = [
             file_path,  # 原始路径
             os.path.join(root_dir, file_path.lstrip("/")),  # 相对于根目录的路径
-            os.path.join(root_dir, config['directories']['download'].lstrip("./"), filename)  # 下载目录
+            os.path.join(FileUtils.normalize_path(config['directories']['download'], root_dir), filename)  # 下载目录
         ]
         
         # 尝试所有可能的路径
@@ -496,7 +482,7 @@ def process_uploaded_file(file_path: str, filename: str, config: Dict[str, Any],
     file_md5 = get_file_md5(file_path)
     
     # 检查文件映射
-    file_mapping = FileMapping(config)
+    file_mapping = get_services(config).file_mapping
     existing_file_id = file_mapping.get_id_by_md5(file_md5)
     
     # 如果文件已经存在
@@ -0,0 +1,58 @@
+"""
+URL转换结果的新鲜度检查
+超过有效期的结果用 ETag/Last-Modified 发送条件请求重新验证，远程文件未变化时继续使用
+"""
+
+import time
+import logging
+from typing import Dict, Any, Optional
+from .services import get_services
+from .inflight import inflight
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 默认有效期（秒）
+DEFAULT_REVALIDATE_AFTER = 3600
+
+def is_url_result_fresh(file_id: str, file_info: Optional[Dict[str, Any]], config: Dict[str, Any]) -> bool:
+    """
+    检查URL对应的已有转换结果是否可以继续使用
+    
+    有效期内直接使用；超过有效期时发送条件请求，未变化则刷新验证时间，已变化时需要重新下载转换。
+    没有校验信息的旧记录或验证请求失败时继续使用已有结果。
+    
+    Args:
+        file_id: 文件ID
+        file_info: 文件信息
+        config: 配置字典
+    
+    Returns:
+        是否可以继续使用
+    """
+    download_info = (file_info or {}).get('download_info') or {}
+    url = download_info.get('url')
+    if not url:
+        return True
+    
+    revalidate_after = config.get('download', {}).get('revalidate_after', DEFAULT_REVALIDATE_AFTER)
+    validated_time = download_info.get('validated_time', download_info.get('download_time', 0))
+    if revalidate_after is None or time.time() - validated_time < revalidate_after:
+        return True
+    
+    validators = download_info.get('validators') or {}
+    if not (validators.get('etag') or validators.get('last_modified')):
+        return True
+    
+    # 同一URL的并发请求只发送一次验证请求
+    services = get_services(config)
+    unchanged = inflight.call(f"revalidate:{url}", services.downloader.revalidate, url, validators)
+    if unchanged is False:
+        logger.info(f"远程文件已变化，需要重新转换: {url}")
+        return False
+    
+    if unchanged:
+        logger.info(f"远程文件未变化，继续使用已有结果: {url}")
+        download_info['validated_time'] = time.time()
+        services.file_mapping.update_download_info(file_id, download_info)
+    return True
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+进行中任务登记
+同一资源（URL或文件内容）并发请求时合并为一次处理
+"""
+
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+def get_inflight_key(url_md5: Optional[str] = None, file_md5: Optional[str] = None,
+                     file_id: Optional[str] = None) -> Optional[str]:
+    """
+    生成进行中任务的登记键
+    
+    Args:
+        url_md5: URL的MD5值
+        file_md5: 文件内容的MD5值
+        file_id: 文件ID
+    
+    Returns:
+        登记键，没有可用标识时返回None
+    """
+    if url_md5:
+        return f"url:{url_md5}"
+    if file_md5:
+        return f"file:{file_md5}"
+    if file_id:
+        return f"id:{file_id}"
+    return None
+
+class _Call:
+    """同步合并调用的共享结果"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class InflightRegistry:
+    """
+    进行中任务登记表
+    
+    后台任务通过 claim/release 登记，后到的请求直接复用首个请求的任务ID；
+    同步处理通过 call 合并，后到的调用等待并共享首个调用的结果。
+    """
+    
+    def __init__(self):
+        """初始化登记表"""
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._calls = {}
+        
+        # 统计信息
+        self.leaders = 0
+        self.joined = 0
+    
+    def claim(self, key: str, task_id: str) -> Optional[str]:
+        """
+        登记后台任务
+        
+        Args:
+            key: 登记键
+            task_id: 新任务ID
+        
+        Returns:
+            已在处理同一资源的任务ID；返回None表示当前任务登记成功，需要由调用方执行
+        """
+        with self._lock:
+            leader_task_id = self._tasks.get(key)
+            if leader_task_id is not None:
+                self.joined += 1
+                logger.info(f"复用进行中的任务: {key} -> {leader_task_id}")
+                return leader_task_id
+            self._tasks[key] = task_id
+            self.leaders += 1
+            return None
+    
+    def release(self, key: str, task_id: str) -> None:
+        """
+        解除后台任务登记
+        
+        Args:
+            key: 登记键
+            task_id: 任务ID，只有登记者本身可以解除
+        """
+        with self._lock:
+            if self._tasks.get(key) == task_id:
+                del self._tasks[key]
+    
+    def bind(self, key: str, task_id: str, task_function: Callable) -> Callable:
+        """
+        包装任务函数，执行结束后自动解除登记
+        
+        Args:
+            key: 登记键
+            task_id: 任务ID
+            task_function: 任务函数
+        
+        Returns:
+            包装后的任务函数
+        """
+        def run(*args, **kwargs):
+            try:
+                return task_function(*args, **kwargs)
+            finally:
+                self.release(key, task_id)
+        return run
+    
+    def call(self, key: str, function: Callable, *args, **kwargs) -> Any:
+        """
+        同步合并调用，同一键同时只执行一次
+        
+        Args:
+            key: 登记键
+            function: 处理函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+        
+        Returns:
+            处理函数的返回值（并发调用方共享同一结果）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.joined += 1
+                leader = False
+        
+        if not leader:
+            logger.info(f"等待进行中的处理结果: {key}")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "inflight": len(self._tasks) + len(self._calls),
+                "leaders": self.leaders,
+                "joined": self.joined
+            }
+
+# 进程级共享的登记表
+inflight = InflightRegistry()
\ No newline at end of file
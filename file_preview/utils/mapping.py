@@ -3,9 +3,9 @@
 """
 
 import os
-import json
 import logging
 import time
+import threading
 import uuid
 import base64
 import hashlib
@@ -13,6 +13,7 @@ from typing import Dict, Any, Optional, Tuple, List, Union
 from datetime import datetime
 
 from ..core.cache import CacheManager
+from ..core.hashing import file_md5
 
 logger = logging.getLogger('file_preview')
 
@@ -21,16 +22,20 @@ class FileMapping:
     文件映射类
     """
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], cache_manager: Optional[CacheManager] = None):
         """
         初始化
         
         Args:
             config: 配置字典
+            cache_manager: 共享的缓存管理器，默认新建
         """
         self.config = config
         self.cache_dir = config.get('directories', {}).get('cache', './cache')
-        self.cache_manager = CacheManager(config)
+        self.cache_manager = cache_manager or CacheManager(config)
+        
+        # 实例在多个请求线程间共享，保护"查找后写入"的映射操作
+        self._lock = threading.RLock()
         
         # 确保缓存目录存在
         os.makedirs(self.cache_dir, exist_ok=True)
@@ -43,32 +48,8 @@ class FileMapping:
         self.md5_mappings_dir = os.path.join(self.cache_dir, 'md5_mappings')
         os.makedirs(self.md5_mappings_dir, exist_ok=True)
         
-        # 加载现有映射
-        self.mappings = self._load_mappings()
         self.retention_days = config.get('cache', {}).get('retention_days', 7)
     
-    def _load_mappings(self):
-        """加载现有的文件映射"""
-        mappings = {}
-        try:
-            # 尝试从文件或数据库加载映射
-            mappings_path = os.path.join(self.cache_dir, 'mappings.json')
-            if os.path.exists(mappings_path):
-                with open(mappings_path, 'r', encoding='utf-8') as f:
-                    mappings = json.load(f)
-        except Exception as e:
-            logger.error(f"加载文件映射失败: {str(e)}")
-        return mappings
-    
-    def _save_mappings(self):
-        """保存文件映射到文件"""
-        try:
-            mappings_path = os.path.join(self.cache_dir, 'mappings.json')
-            with open(mappings_path, 'w', encoding='utf-8') as f:
-                json.dump(self.mappings, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"保存文件映射失败: {str(e)}")
-    
     def generate_file_id(self) -> str:
         """
         生成唯一文件ID
@@ -105,6 +86,13 @@ class FileMapping:
         Returns:
             文件唯一ID
         """
+        with self._lock:
+            return self._add(md5_hash, file_path, original_name, source_url, original_file_info, converted_info)
+    
+    def _add(self, md5_hash: str, file_path: str, original_name: Optional[str],
+             source_url: Optional[str], original_file_info: Optional[Dict[str, Any]],
+             converted_info: Optional[Dict[str, Any]]) -> str:
+        """添加文件映射，调用方需持有锁"""
         # 确保使用绝对路径
         if not os.path.isabs(file_path):
             # 获取项目根目录
@@ -118,38 +106,42 @@ class FileMapping:
         # 检查md5是否已经有映射的文件ID
         existing_file_id = self.cache_manager.get_file_id_by_md5(md5_hash)
         if existing_file_id:
-            # 如果文件ID已存在，但文件路径不同，需要更新
             existing_file_path = self.cache_manager.get_file_path_by_id(existing_file_id)
             if existing_file_path and os.path.exists(existing_file_path):
-                # 获取现有文件信息
-                file_info = self.cache_manager.get_file_info(existing_file_id) or {}
-                
-                # 更新访问时间
-                file_info['last_accessed'] = time.time()
-                
-                # 如果原始文件名不同且提供了新的名称，更新它
-                if original_name and file_info.get('original_name') != original_name:
-                    file_info['original_name'] = original_name
-                
-                # 如果提供了URL且现有信息中没有URL，或URL不同，则更新
-                if source_url:
-                    if 'source_url' not in file_info or file_info['source_url'] != source_url:
-                        file_info['source_url'] = source_url
-                        # 添加URL映射
-                        self._add_url_mapping(source_url, existing_file_id)
-                
-                # 如果提供了原始文件信息，更新它
-                if original_file_info:
-                    file_info['original_file_info'] = original_file_info
-                
-                # 如果提供了转换信息，更新它
-                if converted_info:
-                    file_info['converted_info'] = converted_info
-                
-                # 更新文件信息
-                self.cache_manager.put_file_info(existing_file_id, file_info)
-                
-                return existing_file_id
+                if self._is_refreshed(existing_file_path, file_path):
+                    # 结果内容已变化（如来源URL的内容更新后重新转换），分配新的文件ID；
+                    # 文件ID对应的内容不会被替换，旧ID继续指向旧的结果
+                    logger.info(f"结果内容已变化，分配新的文件ID: {md5_hash} ({existing_file_id})")
+                else:
+                    # 获取现有文件信息
+                    file_info = self.cache_manager.get_file_info(existing_file_id) or {}
+                    
+                    # 更新访问时间
+                    file_info['last_accessed'] = time.time()
+                    
+                    # 如果原始文件名不同且提供了新的名称，更新它
+                    if original_name and file_info.get('original_name') != original_name:
+                        file_info['original_name'] = original_name
+                    
+                    # 如果提供了URL且现有信息中没有URL，或URL不同，则更新
+                    if source_url:
+                        if 'source_url' not in file_info or file_info['source_url'] != source_url:
+                            file_info['source_url'] = source_url
+                            # 添加URL映射
+                            self._add_url_mapping(source_url, existing_file_id)
+                    
+                    # 如果提供了原始文件信息，更新它
+                    if original_file_info:
+                        file_info['original_file_info'] = original_file_info
+                    
+                    # 如果提供了转换信息，更新它
+                    if converted_info:
+                        file_info['converted_info'] = converted_info
+                    
+                    # 更新文件信息
+                    self.cache_manager.put_file_info(existing_file_id, file_info)
+                    
+                    return existing_file_id
         
         # 生成新的文件ID
         file_id = self.generate_file_id()
@@ -211,6 +203,22 @@ class FileMapping:
         
         return file_id
     
+    @staticmethod
+    def _is_refreshed(existing_file_path: str, file_path: str) -> bool:
+        """
+        检查重新登记的结果文件内容是否与现有结果不同
+        
+        Args:
+            existing_file_path: 现有结果的文件路径
+            file_path: 重新登记的文件路径
+        
+        Returns:
+            内容是否已变化；路径不同但内容相同（如重复上传同一文件）时为False
+        """
+        if file_path == existing_file_path or not os.path.exists(file_path):
+            return False
+        return file_md5(file_path) != file_md5(existing_file_path)
+    
     # 兼容性别名，用于支持旧的 add_file 调用
     def add_file(self, file_path: str, original_name: Optional[str] = None, source_url: Optional[str] = None) -> str:
         """
@@ -225,14 +233,7 @@ class FileMapping:
             文件唯一ID
         """
         # 计算文件的 MD5
-        try:
-            from .file_utils import get_file_md5
-            md5_hash = get_file_md5(file_path)
-        except ImportError:
-            # 简单实现 MD5 计算
-            md5_hash = ""
-            with open(file_path, 'rb') as f:
-                md5_hash = hashlib.md5(f.read()).hexdigest()
+        md5_hash = file_md5(file_path)
         
         return self.add(md5_hash, file_path, original_name, source_url)
     
@@ -385,16 +386,77 @@ class FileMapping:
         Returns:
             是否成功
         """
-        # 获取文件信息
-        file_info = self.cache_manager.get_file_info(file_id)
-        if not file_info:
-            return False
+        # 读取和写回之间持锁，避免覆盖同时进行的替换
+        with self._lock:
+            # 获取文件信息
+            file_info = self.cache_manager.get_file_info(file_id)
+            if not file_info:
+                return False
+            
+            # 更新访问时间
+            file_info['last_accessed'] = time.time()
+            
+            # 更新缓存
+            return self.cache_manager.put_file_info(file_id, file_info)
+    
+    def replace_converted(self, file_id: str, file_path: str, converted_info: Dict[str, Any]) -> bool:
+        """
+        替换文件ID对应的转换结果，文件ID保持不变
+        
+        用于快速预览生成的部分结果在完整转换完成后被替换。
+        
+        Args:
+            file_id: 文件ID
+            file_path: 新的结果文件路径
+            converted_info: 新的转换信息
         
-        # 更新访问时间
-        file_info['last_accessed'] = time.time()
+        Returns:
+            是否成功
+        """
+        with self._lock:
+            file_info = self.cache_manager.get_file_info(file_id)
+            if not file_info:
+                return False
+            
+            file_info['path'] = file_path
+            file_info['file_size'] = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            file_info['converted_info'] = converted_info
+            self.cache_manager.put_file_info(file_id, file_info)
+            self.cache_manager.put_id_mapping(file_id, file_path)
         
-        # 更新缓存
-        return self.cache_manager.put_file_info(file_id, file_info)
+        logger.info(f"替换转换结果: {file_id} -> {file_path}")
+        return True
+    
+    def update_download_info(self, file_id: str, download_info: Dict[str, Any]) -> bool:
+        """
+        更新文件的下载信息
+        
+        Args:
+            file_id: 文件ID
+            download_info: 下载信息
+        
+        Returns:
+            是否成功
+        """
+        with self._lock:
+            file_info = self.cache_manager.get_file_info(file_id)
+            if not file_info:
+                return False
+            file_info['download_info'] = download_info
+            return self.cache_manager.put_file_info(file_id, file_info)
+    
+    def is_partial(self, file_id: str) -> bool:
+        """
+        文件ID对应的转换结果是否为只包含前几页的快速预览
+        
+        Args:
+            file_id: 文件ID
+        
+        Returns:
+            是否为部分结果
+        """
+        file_info = self.cache_manager.get_file_info(file_id) or {}
+        return bool((file_info.get('converted_info') or {}).get('partial'))
     
     def get_id_by_md5(self, md5_hash: str) -> Optional[str]:
         """
@@ -533,25 +595,26 @@ class FileMapping:
         Returns:
             是否成功
         """
-        # 获取文件信息
-        file_info = self.cache_manager.get_file_info(file_id)
-        if not file_info:
-            return False
-        
-        # 删除MD5映射
-        md5_hash = file_info.get('md5_hash')
-        if md5_hash:
-            self.cache_manager.delete_md5_mapping(md5_hash)
-        
-        # 删除文件信息
-        self.cache_manager.delete_file_info(file_id)
-        
-        # 删除ID映射
-        self.cache_manager.delete_id_mapping(file_id)
-        
-        logger.info(f"删除文件映射: {file_id}")
-        
-        return True
+        with self._lock:
+            # 获取文件信息
+            file_info = self.cache_manager.get_file_info(file_id)
+            if not file_info:
+                return False
+            
+            # 删除MD5映射
+            md5_hash = file_info.get('md5_hash')
+            if md5_hash:
+                self.cache_manager.delete_md5_mapping(md5_hash)
+            
+            # 删除文件信息
+            self.cache_manager.delete_file_info(file_id)
+            
+            # 删除ID映射
+            self.cache_manager.delete_id_mapping(file_id)
+            
+            logger.info(f"删除文件映射: {file_id}")
+            
+            return True
     
     def list_files(self, limit: int = 20, offset: int = 0, 
                    filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
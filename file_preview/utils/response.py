@@ -2,7 +2,14 @@
 响应工具函数
 """
 
-from flask import jsonify
+from flask import jsonify, send_file, current_app, request
+from ..core.hashing import file_md5
+
+# 转换结果默认的浏览器缓存时间（秒）
+DEFAULT_ARTIFACT_MAX_AGE = 86400
+
+# 携带内容版本的URL参数，值为文件内容的MD5
+VERSION_PARAM = 'v'
 
 def generate_error_response(error_message, status_code=400):
     """
@@ -19,4 +26,57 @@ def generate_error_response(error_message, status_code=400):
         'status': 'failed',
         'message': error_message,
         'error': error_message
-    }), status_code 
\ No newline at end of file
+    }), status_code 
+
+def generate_busy_response(error_message, retry_after):
+    """
+    生成服务繁忙响应，告知客户端稍后重试
+    
+    Args:
+        error_message: 错误信息
+        retry_after: 建议的重试等待时间（秒）
+    
+    Returns:
+        元组 (响应JSON, 状态码, 响应头)
+    """
+    return jsonify({
+        'status': 'failed',
+        'message': '服务繁忙，请稍后重试',
+        'error': error_message,
+        'retry_after': retry_after
+    }), 503, {'Retry-After': str(retry_after)}
+
+def generate_file_response(file_path, etag=None, cacheable=False, **kwargs):
+    """
+    发送文件，支持 ETag 条件请求（304）和 Range 分段请求（206）
+    
+    文件ID不按内容分配（URL的内容更新后同一来源会得到新的结果），只有URL中带有与内容MD5一致的
+    版本参数（?v=<md5>）时才允许浏览器和CDN长期缓存，其余响应每次通过 ETag 验证。
+    
+    Args:
+        file_path: 文件路径
+        etag: 文件内容的MD5，未提供时根据文件计算
+        cacheable: 是否为完整的转换结果（快速预览的部分结果会被替换，不能长期缓存）
+        **kwargs: 传给 send_file 的其他参数（mimetype、as_attachment、download_name 等）
+    
+    Returns:
+        文件响应
+    """
+    server_config = current_app.config.get('CONFIG', {}).get('server', {})
+    etag = etag or file_md5(file_path)
+    
+    response = send_file(
+        file_path,
+        etag=etag,
+        conditional=True,
+        **kwargs
+    )
+    
+    if cacheable and request.args.get(VERSION_PARAM) == etag:
+        response.cache_control.public = True
+        response.cache_control.max_age = server_config.get('artifact_max_age', DEFAULT_ARTIFACT_MAX_AGE)
+        response.cache_control.immutable = server_config.get('artifact_immutable', True)
+    else:
+        response.cache_control.no_cache = True
+    
+    return response
\ No newline at end of file
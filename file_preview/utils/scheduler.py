@@ -0,0 +1,282 @@
+"""
+后台任务调度器
+提供有界的工作线程池和排队准入控制
+"""
+
+import math
+import time
+import queue
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable, Tuple
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 默认配置
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_QUEUE_SIZE = 100
+
+# 没有历史耗时数据时估算的单个任务耗时（秒）
+DEFAULT_TASK_DURATION = 5.0
+
+# 建议重试时间的上限（秒）
+MAX_RETRY_AFTER = 300
+
+class TaskQueueFullError(Exception):
+    """任务队列已满，拒绝新任务"""
+    
+    def __init__(self, message: str, retry_after: int):
+        """
+        初始化异常
+        
+        Args:
+            message: 错误信息
+            retry_after: 建议的重试等待时间（秒）
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class ScheduledTask:
+    """已提交到调度器的任务"""
+    
+    def __init__(self, task_function: Callable, args: Tuple, kwargs: Dict[str, Any],
+                 on_start: Optional[Callable[[float], None]] = None):
+        """
+        初始化任务
+        
+        Args:
+            task_function: 任务函数
+            args: 位置参数
+            kwargs: 关键字参数
+            on_start: 任务开始执行时的回调，参数为排队等待时间（秒）
+        """
+        self.task_function = task_function
+        self.args = args
+        self.kwargs = kwargs
+        self.on_start = on_start
+        self.queued_at = time.time()
+        self.started_at = None
+        # 进入队列的序号，与调度器已取出的任务数之差即为当前排队位置
+        self.sequence = 0
+        self.position = 0
+
+class TaskScheduler:
+    """
+    有界的后台任务调度器
+    
+    固定数量的工作线程从有界队列中取任务执行，队列满时拒绝新任务并给出建议的重试时间，
+    避免突发请求创建大量线程和并发转换进程耗尽内存。
+    """
+    
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE):
+        """
+        初始化调度器并启动工作线程
+        
+        Args:
+            max_workers: 工作线程数
+            max_queue_size: 最大排队任务数
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max(1, max_queue_size)
+        
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._closed = False
+        self._enqueued = 0
+        self._dequeued = 0
+        
+        # 统计信息
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.avg_wait_time = 0.0
+        self.avg_duration = None
+        
+        self._workers = []
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"file-preview-worker-{i}")
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+        
+        logger.info(f"任务调度器初始化完成，工作线程数: {self.max_workers}, 队列容量: {self.max_queue_size}")
+    
+    def submit(self, task_function: Callable, args: Tuple = (), kwargs: Optional[Dict[str, Any]] = None,
+               on_start: Optional[Callable[[float], None]] = None) -> ScheduledTask:
+        """
+        提交任务
+        
+        Args:
+            task_function: 任务函数
+            args: 位置参数
+            kwargs: 关键字参数
+            on_start: 任务开始执行时的回调，参数为排队等待时间（秒）
+        
+        Returns:
+            已提交的任务
+        
+        Raises:
+            TaskQueueFullError: 队列已满
+        """
+        if self._closed:
+            raise TaskQueueFullError("任务调度器已关闭", self.estimate_retry_after())
+        
+        task = ScheduledTask(task_function, tuple(args), kwargs or {}, on_start)
+        # 入队和分配序号在同一个锁内完成，序号与队列中的顺序一致
+        with self._lock:
+            try:
+                self._queue.put_nowait(task)
+            except queue.Full:
+                self.rejected += 1
+                task = None
+            else:
+                self._enqueued += 1
+                task.sequence = self._enqueued
+                task.position = self._enqueued - self._dequeued
+                self.submitted += 1
+        
+        if task is None:
+            retry_after = self.estimate_retry_after()
+            logger.warning(f"任务队列已满 ({self.max_queue_size})，拒绝新任务，建议 {retry_after} 秒后重试")
+            raise TaskQueueFullError("服务繁忙，任务队列已满", retry_after)
+        
+        return task
+    
+    def position(self, task: ScheduledTask) -> int:
+        """
+        获取任务当前的排队位置
+        
+        队列先进先出，任务的位置为它的序号减去已被工作线程取出的任务数。
+        
+        Args:
+            task: 已提交的任务
+        
+        Returns:
+            排队位置（从1开始），任务已开始执行时为0
+        """
+        with self._lock:
+            return max(task.sequence - self._dequeued, 0)
+    
+    def _worker_loop(self) -> None:
+        """工作线程主循环"""
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            
+            task.started_at = time.time()
+            wait_time = task.started_at - task.queued_at
+            with self._lock:
+                self._dequeued += 1
+                self._running += 1
+                self.avg_wait_time = self._moving_average(self.avg_wait_time, wait_time)
+            
+            succeeded = False
+            try:
+                if task.on_start:
+                    task.on_start(wait_time)
+                task.task_function(*task.args, **task.kwargs)
+                succeeded = True
+            except Exception as e:
+                logger.error(f"后台任务执行失败: {str(e)}", exc_info=True)
+            finally:
+                duration = time.time() - task.started_at
+                with self._lock:
+                    self._running -= 1
+                    if succeeded:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    self.avg_duration = self._moving_average(self.avg_duration, duration)
+                self._queue.task_done()
+    
+    @staticmethod
+    def _moving_average(current: Optional[float], value: float, alpha: float = 0.2) -> float:
+        """指数移动平均"""
+        if current is None:
+            return value
+        return current + alpha * (value - current)
+    
+    def estimate_retry_after(self) -> int:
+        """
+        估算队列腾出空间所需的时间
+        
+        Returns:
+            建议的重试等待时间（秒）
+        """
+        duration = self.avg_duration or DEFAULT_TASK_DURATION
+        backlog = self._queue.qsize() + self._running
+        retry_after = math.ceil(duration * backlog / self.max_workers)
+        return min(max(retry_after, 1), MAX_RETRY_AFTER)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取调度器统计信息
+        
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "queue_depth": self._queue.qsize(),
+                "running": self._running,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_wait_time": round(self.avg_wait_time, 3),
+                "avg_duration": round(self.avg_duration, 3) if self.avg_duration is not None else None
+            }
+    
+    def shutdown(self) -> None:
+        """停止接收新任务，工作线程处理完已排队的任务后退出"""
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(None)
+
+# 进程级共享的调度器
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def configure_scheduler(config: Dict[str, Any]) -> TaskScheduler:
+    """
+    按配置创建进程共享的调度器，配置未变化时复用现有调度器
+    
+    Args:
+        config: 配置字典
+    
+    Returns:
+        调度器实例
+    """
+    global _scheduler
+    
+    performance = config.get('performance', {})
+    max_workers = int(performance.get('max_workers', DEFAULT_MAX_WORKERS))
+    max_queue_size = int(performance.get('max_queue_size', DEFAULT_MAX_QUEUE_SIZE))
+    
+    with _scheduler_lock:
+        if _scheduler is not None:
+            if _scheduler.max_workers == max_workers and _scheduler.max_queue_size == max_queue_size:
+                return _scheduler
+            _scheduler.shutdown()
+        _scheduler = TaskScheduler(max_workers, max_queue_size)
+        return _scheduler
+
+def get_scheduler() -> TaskScheduler:
+    """
+    获取进程共享的调度器，尚未配置时使用默认配置创建
+    
+    Returns:
+        调度器实例
+    """
+    global _scheduler
+    
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TaskScheduler()
+        return _scheduler
\ No newline at end of file
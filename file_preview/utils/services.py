@@ -0,0 +1,76 @@
+"""
+共享服务
+缓存管理器、文件映射、转换器、失败结果缓存、下载器、异步下载引擎和缩略图生成器在进程内按配置只创建一次，由各请求和后台任务共享
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any
+from ..core.cache import CacheManager
+from ..core.converter import FileConverter
+from ..core.downloader import FileDownloader
+from ..core.async_downloader import AsyncDownloadEngine
+from ..core.negative_cache import NegativeCache
+from ..core.pdf_tools import PdfThumbnailer
+from .mapping import FileMapping
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 最多保留的配置数，应用只有一份配置，其余来自测试或命令行
+MAX_CACHED_CONFIGS = 8
+
+class Services:
+    """
+    共享服务容器
+    
+    所有服务在创建时初始化目录和缓存后端，之后的请求直接复用，不再重复创建。
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        初始化共享服务
+        
+        Args:
+            config: 配置字典
+        """
+        self.config = config
+        self.cache_manager = CacheManager(config)
+        self.file_mapping = FileMapping(config, cache_manager=self.cache_manager)
+        self.converter = FileConverter(config)
+        self.negative_cache = NegativeCache(config, self.cache_manager)
+        self.downloader = FileDownloader(config, negative_cache=self.negative_cache)
+        self.download_engine = AsyncDownloadEngine(config, self.downloader)
+        self.thumbnailer = PdfThumbnailer(config)
+
+# 按配置对象缓存的服务
+_services = OrderedDict()
+_services_lock = threading.Lock()
+
+def get_services(config: Dict[str, Any]) -> Services:
+    """
+    获取配置对应的共享服务，首次调用时创建
+    
+    同一个配置字典始终返回同一组服务，应用中各请求和后台任务传入的都是 app.config['CONFIG']。
+    
+    Args:
+        config: 配置字典
+    
+    Returns:
+        共享服务
+    """
+    key = id(config)
+    with _services_lock:
+        services = _services.get(key)
+        # 服务持有配置的引用，配置未被回收时id不会被复用，这里再确认一次是同一个对象
+        if services is not None and services.config is config:
+            _services.move_to_end(key)
+            return services
+        
+        services = Services(config)
+        _services[key] = services
+        while len(_services) > MAX_CACHED_CONFIGS:
+            _services.popitem(last=False)
+        logger.info("共享服务初始化完成")
+        return services
\ No newline at end of file
@@ -0,0 +1,605 @@
+"""
+工作表数据
+在服务端将Excel工作簿解析为按行块压缩的存储文件，按行列窗口返回单元格数据，前端无需下载和解析整个工作簿
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import logging
+import threading
+import datetime
+import decimal
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator, BinaryIO
+from .inflight import inflight
+from .services import get_services
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 支持服务端解析的格式
+SHEET_EXTENSIONS = ['.xlsx', '.xlsm']
+
+# 默认配置
+DEFAULT_CACHE_ENTRIES = 8
+DEFAULT_MAX_WINDOW_ROWS = 1000
+DEFAULT_MAX_WINDOW_COLS = 200
+DEFAULT_CHUNK_ROWS = 1000
+
+# 存储文件格式
+STORE_MAGIC = b'FPSHEET1'
+STORE_FOOTER = '>QQ'
+STORE_VARIANT = 'sheets'
+
+class SheetNotFoundError(KeyError):
+    """工作表不存在"""
+    pass
+
+def _cell_value(value: Any) -> Any:
+    """
+    将单元格值转换为可JSON序列化的值
+    
+    Args:
+        value: 单元格原始值
+    
+    Returns:
+        JSON可序列化的值
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return str(value)
+
+def _color(color: Any) -> Optional[str]:
+    """获取颜色的RGB值，主题色和索引色不处理"""
+    if color is not None and getattr(color, 'type', None) == 'rgb' and isinstance(color.rgb, str):
+        # openpyxl 返回 ARGB，去掉透明度
+        return f"#{color.rgb[-6:]}"
+    return None
+
+def _cell_style(cell: Any) -> Dict[str, Any]:
+    """
+    提取单元格的显示样式
+    
+    Args:
+        cell: openpyxl 单元格
+    
+    Returns:
+        样式字典，只包含非默认值
+    """
+    style = {}
+    
+    font = getattr(cell, 'font', None)
+    if font is not None:
+        if font.b:
+            style['bold'] = True
+        if font.i:
+            style['italic'] = True
+        if font.u:
+            style['underline'] = True
+        color = _color(font.color)
+        if color and color != '#000000':
+            style['color'] = color
+    
+    fill = getattr(cell, 'fill', None)
+    if fill is not None and fill.fill_type == 'solid':
+        background = _color(fill.fgColor)
+        if background:
+            style['background'] = background
+    
+    alignment = getattr(cell, 'alignment', None)
+    if alignment is not None:
+        if alignment.horizontal:
+            style['align'] = alignment.horizontal
+        if alignment.vertical:
+            style['valign'] = alignment.vertical
+        if alignment.wrap_text:
+            style['wrap'] = True
+    
+    number_format = getattr(cell, 'number_format', None)
+    if number_format and number_format != 'General':
+        style['format'] = number_format
+    
+    return style
+
+class SheetData:
+    """
+    解析后的工作表
+    
+    单元格值和样式编号按行存储，相同的样式只保存一次。
+    """
+    
+    def __init__(self, name: str):
+        """
+        初始化
+        
+        Args:
+            name: 工作表名称
+        """
+        self.name = name
+        self.values: List[List[Any]] = []
+        self.style_ids: List[List[int]] = []
+        # 样式编号 0 表示默认样式
+        self.styles: List[Dict[str, Any]] = [{}]
+        self.max_col = 0
+    
+    @property
+    def max_row(self) -> int:
+        """行数"""
+        return len(self.values)
+    
+    def get_rows(self, start: int, end: int) -> Tuple[List[List[Any]], List[List[int]]]:
+        """
+        获取行数据
+        
+        Args:
+            start: 起始行（从0开始）
+            end: 结束行（不含）
+        
+        Returns:
+            (单元格值, 样式编号)
+        """
+        return self.values[start:end], self.style_ids[start:end]
+    
+    def info(self) -> Dict[str, Any]:
+        """工作表概要信息"""
+        return {
+            "name": self.name,
+            "max_row": self.max_row,
+            "max_col": self.max_col
+        }
+    
+    def window(self, row_start: int, row_end: int, col_start: int, col_end: int) -> Dict[str, Any]:
+        """
+        获取行列窗口内的单元格
+        
+        Args:
+            row_start: 起始行（从0开始，含）
+            row_end: 结束行（含）
+            col_start: 起始列（从0开始，含）
+            col_end: 结束列（含）
+        
+        Returns:
+            窗口数据，styles 只包含窗口内用到的样式
+        """
+        row_end = min(row_end, self.max_row - 1)
+        col_end = min(col_end, self.max_col - 1)
+        width = max(col_end - col_start + 1, 0)
+        
+        cells = []
+        style_ids = []
+        used_styles = {}
+        values, row_styles = self.get_rows(row_start, row_end + 1)
+        for row_values, row_style_ids in zip(values, row_styles):
+            row_values = row_values[col_start:col_end + 1]
+            row_style_ids = row_style_ids[col_start:col_end + 1]
+            padding = width - len(row_values)
+            cells.append(row_values + [None] * padding)
+            style_ids.append(row_style_ids + [0] * padding)
+            for style_id in row_style_ids:
+                if style_id and style_id not in used_styles:
+                    used_styles[style_id] = self.styles[style_id]
+        
+        return {
+            "sheet": self.name,
+            "max_row": self.max_row,
+            "max_col": self.max_col,
+            "rows": [row_start, row_start + len(cells) - 1],
+            "cols": [col_start, col_start + width - 1],
+            "cells": cells,
+            "style_ids": style_ids,
+            "styles": {str(style_id): style for style_id, style in used_styles.items()}
+        }
+
+class Workbook:
+    """解析后的工作簿"""
+    
+    def __init__(self, sheets: List[SheetData]):
+        """
+        初始化
+        
+        Args:
+            sheets: 工作表列表
+        """
+        self.sheets = OrderedDict((sheet.name, sheet) for sheet in sheets)
+    
+    def sheet_names(self) -> List[str]:
+        """工作表名称列表"""
+        return list(self.sheets.keys())
+    
+    def get_sheet(self, sheet: str) -> SheetData:
+        """
+        按名称或序号获取工作表
+        
+        Args:
+            sheet: 工作表名称，或从0开始的序号
+        
+        Returns:
+            工作表
+        
+        Raises:
+            SheetNotFoundError: 工作表不存在
+        """
+        if sheet in self.sheets:
+            return self.sheets[sheet]
+        if sheet.isdigit() and int(sheet) < len(self.sheets):
+            return list(self.sheets.values())[int(sheet)]
+        raise SheetNotFoundError(sheet)
+
+class StoredSheet(SheetData):
+    """
+    存储文件中的工作表
+    
+    只在内存中保留索引，读取行时按行块定位到存储文件中对应的位置，只解压用到的行块。
+    """
+    
+    def __init__(self, store_path: str, meta: Dict[str, Any]):
+        """
+        初始化
+        
+        Args:
+            store_path: 存储文件路径
+            meta: 索引中该工作表的信息
+        """
+        super().__init__(meta['name'])
+        self.store_path = store_path
+        self.styles = meta['styles']
+        self.max_col = meta['max_col']
+        self.chunk_rows = meta['chunk_rows']
+        self.chunks = meta['chunks']
+        self._max_row = meta['max_row']
+    
+    @property
+    def max_row(self) -> int:
+        """行数"""
+        return self._max_row
+    
+    def _read_chunk(self, f: BinaryIO, index: int) -> Tuple[List[List[Any]], List[List[int]]]:
+        """读取一个行块，按列存储的数据转换为按行"""
+        offset, length = self.chunks[index]
+        f.seek(offset)
+        chunk = json.loads(zlib.decompress(f.read(length)).decode('utf-8'))
+        return [list(row) for row in zip(*chunk['values'])], [list(row) for row in zip(*chunk['styles'])]
+    
+    def get_rows(self, start: int, end: int) -> Tuple[List[List[Any]], List[List[int]]]:
+        """
+        获取行数据
+        
+        Args:
+            start: 起始行（从0开始）
+            end: 结束行（不含）
+        
+        Returns:
+            (单元格值, 样式编号)
+        """
+        end = min(end, self.max_row)
+        values = []
+        style_ids = []
+        if start >= end:
+            return values, style_ids
+        
+        with open(self.store_path, 'rb') as f:
+            for index in range(start // self.chunk_rows, (end - 1) // self.chunk_rows + 1):
+                chunk_values, chunk_styles = self._read_chunk(f, index)
+                chunk_start = index * self.chunk_rows
+                lower = max(start - chunk_start, 0)
+                upper = min(end - chunk_start, len(chunk_values))
+                values.extend(chunk_values[lower:upper])
+                style_ids.extend(chunk_styles[lower:upper])
+        return values, style_ids
+
+def _iter_worksheet_rows(worksheet: Any, styles: List[Dict[str, Any]]) -> Iterator[Tuple[List[Any], List[int]]]:
+    """
+    流式读取工作表的行，样式去重后追加到样式表
+    
+    Args:
+        worksheet: openpyxl 只读工作表
+        styles: 样式表，编号 0 为默认样式
+    
+    Returns:
+        (单元格值, 样式编号) 迭代器
+    """
+    style_index = {}
+    for row in worksheet.iter_rows():
+        values = []
+        style_ids = []
+        for cell in row:
+            values.append(_cell_value(cell.value))
+            style = _cell_style(cell) if getattr(cell, 'has_style', False) else {}
+            if not style:
+                style_ids.append(0)
+                continue
+            key = tuple(sorted(style.items()))
+            style_id = style_index.get(key)
+            if style_id is None:
+                style_id = len(styles)
+                style_index[key] = style_id
+                styles.append(style)
+            style_ids.append(style_id)
+        yield values, style_ids
+
+def _trim_row(values: List[Any], style_ids: List[int]) -> Tuple[List[Any], List[int]]:
+    """去掉行尾的空单元格"""
+    end = len(values)
+    while end > 0 and values[end - 1] is None and style_ids[end - 1] == 0:
+        end -= 1
+    return values[:end], style_ids[:end]
+
+def _encode_chunk(rows: List[Tuple[List[Any], List[int]]]) -> bytes:
+    """将行块按列存储并压缩，同一列的值类型相近，压缩率更高"""
+    width = max((len(values) for values, _ in rows), default=0)
+    columns = [[values[col] if col < len(values) else None for values, _ in rows] for col in range(width)]
+    style_columns = [[style_ids[col] if col < len(style_ids) else 0 for _, style_ids in rows] for col in range(width)]
+    # 没有单元格的行块也要保留行数
+    if not width:
+        columns, style_columns = [[None] * len(rows)], [[0] * len(rows)]
+    data = json.dumps({"values": columns, "styles": style_columns}, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(data.encode('utf-8'))
+
+def write_sheet_store(store_path: str, sheets: Iterable[Tuple[str, Iterable[Tuple[List[Any], List[int]]], List[Dict[str, Any]]]],
+                      chunk_rows: int = DEFAULT_CHUNK_ROWS) -> None:
+    """
+    将工作表写入存储文件
+    
+    文件格式：魔数 | 压缩的行块... | 压缩的JSON索引 | 索引偏移和长度 | 魔数。
+    索引记录每个工作表的行列数、样式表和各行块的偏移与长度，读取任意行只需定位到对应行块。
+    先写入临时文件再替换，读取方不会看到写了一半的文件。
+    
+    Args:
+        store_path: 存储文件路径
+        sheets: (工作表名称, 行迭代器, 样式表) 迭代器；样式表在行迭代过程中补全
+        chunk_rows: 每个行块的行数
+    """
+    os.makedirs(os.path.dirname(store_path), exist_ok=True)
+    temp_path = f"{store_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(STORE_MAGIC)
+            index = []
+            for name, rows, styles in sheets:
+                chunks = []
+                pending = []
+                max_row = 0
+                max_col = 0
+                
+                for values, style_ids in rows:
+                    values, style_ids = _trim_row(values, style_ids)
+                    pending.append((values, style_ids))
+                    if values:
+                        max_row = chunk_rows * len(chunks) + len(pending)
+                        max_col = max(max_col, len(values))
+                    if len(pending) == chunk_rows:
+                        data = _encode_chunk(pending)
+                        chunks.append([f.tell(), len(data)])
+                        f.write(data)
+                        pending = []
+                
+                if pending:
+                    data = _encode_chunk(pending)
+                    chunks.append([f.tell(), len(data)])
+                    f.write(data)
+                
+                index.append({
+                    "name": name,
+                    "max_row": max_row,
+                    "max_col": max_col,
+                    "chunk_rows": chunk_rows,
+                    "styles": styles,
+                    "chunks": chunks
+                })
+            
+            index_data = zlib.compress(json.dumps({"sheets": index}, ensure_ascii=False).encode('utf-8'))
+            index_offset = f.tell()
+            f.write(index_data)
+            f.write(struct.pack(STORE_FOOTER, index_offset, len(index_data)))
+            f.write(STORE_MAGIC)
+        os.replace(temp_path, store_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def build_sheet_store(file_path: str, store_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> str:
+    """
+    流式解析工作簿并生成存储文件，已存在时直接返回
+    
+    使用只读模式逐行读取，公式单元格取缓存的计算结果，内存中最多保留一个行块。
+    
+    Args:
+        file_path: xlsx文件路径
+        store_path: 存储文件路径
+        chunk_rows: 每个行块的行数
+    
+    Returns:
+        存储文件路径
+    
+    Raises:
+        RuntimeError: 未安装 openpyxl
+    """
+    if os.path.exists(store_path):
+        return store_path
+    if not OPENPYXL_AVAILABLE:
+        raise RuntimeError("未安装 openpyxl，无法在服务端解析工作表")
+    
+    started = time.time()
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        def iter_sheets():
+            for worksheet in workbook.worksheets:
+                styles = [{}]
+                yield worksheet.title, _iter_worksheet_rows(worksheet, styles), styles
+        
+        write_sheet_store(store_path, iter_sheets(), chunk_rows)
+    finally:
+        workbook.close()
+
+    logger.info(f"工作表存储生成完成: {store_path}, 耗时: {time.time() - started:.3f} 秒")
+    return store_path
+
+def open_sheet_store(store_path: str) -> Workbook:
+    """
+    打开存储文件，只读取索引
+    
+    Args:
+        store_path: 存储文件路径
+    
+    Returns:
+        工作簿
+    
+    Raises:
+        ValueError: 文件格式错误
+    """
+    footer_size = struct.calcsize(STORE_FOOTER) + len(STORE_MAGIC)
+    with open(store_path, 'rb') as f:
+        if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+            raise ValueError(f"不是有效的工作表存储文件: {store_path}")
+        f.seek(-footer_size, os.SEEK_END)
+        footer = f.read(footer_size)
+        if footer[-len(STORE_MAGIC):] != STORE_MAGIC:
+            raise ValueError(f"工作表存储文件不完整: {store_path}")
+        index_offset, index_length = struct.unpack(STORE_FOOTER, footer[:-len(STORE_MAGIC)])
+        f.seek(index_offset)
+        index = json.loads(zlib.decompress(f.read(index_length)).decode('utf-8'))
+    return Workbook([StoredSheet(store_path, meta) for meta in index['sheets']])
+
+def get_sheet_store_path(file_path: str, config: Dict[str, Any]) -> str:
+    """
+    获取工作簿存储文件的路径，与转换结果一样按文件内容存放在转换目录下
+    
+    Args:
+        file_path: xlsx文件路径
+        config: 配置字典
+    
+    Returns:
+        存储文件路径
+    """
+    return get_services(config).converter.get_output_path(file_path, 'store', variant=STORE_VARIANT)
+
+def ensure_sheet_store(file_path: str, config: Dict[str, Any]) -> str:
+    """
+    获取工作簿的存储文件，不存在时生成，并发请求同一文件时只生成一次
+    
+    Args:
+        file_path: xlsx文件路径
+        config: 配置字典
+    
+    Returns:
+        存储文件路径
+    """
+    store_path = get_sheet_store_path(file_path, config)
+    if os.path.exists(store_path):
+        return store_path
+    chunk_rows = config.get('sheets', {}).get('chunk_rows', DEFAULT_CHUNK_ROWS)
+    return inflight.call(f"sheets:{store_path}", build_sheet_store, file_path, store_path, chunk_rows)
+
+class WorkbookCache:
+    """
+    已打开的工作表存储缓存
+    
+    以存储文件路径为键，只缓存索引，行数据每次从存储文件按需读取。
+    """
+    
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        """
+        初始化
+        
+        Args:
+            max_entries: 最多缓存的工作簿数
+        """
+        self.max_entries = max_entries
+        self._workbooks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def configure(self, config: Dict[str, Any]) -> None:
+        """
+        按配置设置缓存容量
+        
+        Args:
+            config: 配置字典
+        """
+        self.max_entries = config.get('sheets', {}).get('cache_entries', DEFAULT_CACHE_ENTRIES)
+    
+    def get(self, file_path: str, config: Dict[str, Any], store_path: Optional[str] = None) -> Workbook:
+        """
+        获取工作簿，存储文件不存在时先生成
+        
+        Args:
+            file_path: xlsx文件路径
+            config: 配置字典
+            store_path: 转换时已生成的存储文件路径（可选）
+        
+        Returns:
+            工作簿
+        """
+        if not store_path or not os.path.exists(store_path):
+            store_path = ensure_sheet_store(file_path, config)
+        
+        with self._lock:
+            workbook = self._workbooks.get(store_path)
+            if workbook is not None:
+                self._workbooks.move_to_end(store_path)
+                self.hits += 1
+                return workbook
+            self.misses += 1
+        
+        workbook = open_sheet_store(store_path)
+        
+        with self._lock:
+            self._workbooks[store_path] = workbook
+            while len(self._workbooks) > self.max_entries:
+                self._workbooks.popitem(last=False)
+        return workbook
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._workbooks),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+def parse_range(value: Optional[str], default: Tuple[int, int], max_size: int) -> Tuple[int, int]:
+    """
+    解析 "起始-结束" 形式的范围参数（从0开始，含两端）
+    
+    Args:
+        value: 参数值，如 "0-199"，单个数字表示只取一行（列）
+        default: 未提供参数时的默认范围
+        max_size: 范围最大长度，超出时截断
+    
+    Returns:
+        (起始, 结束)
+    
+    Raises:
+        ValueError: 参数格式错误
+    """
+    if not value:
+        start, end = default
+    elif '-' in value:
+        start_text, end_text = value.split('-', 1)
+        start, end = int(start_text), int(end_text)
+    else:
+        start = end = int(value)
+    
+    if start < 0 or end < start:
+        raise ValueError(f"无效的范围: {value}")
+    return start, min(end, start + max_size - 1)
+
+# 进程级共享的解析结果缓存
+workbook_cache = WorkbookCache()
\ No newline at end of file
@@ -0,0 +1,414 @@
+"""
+任务状态存储
+支持进程内存储和Redis存储，任务状态按TTL过期
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 默认配置
+DEFAULT_TASK_TTL = 3600
+DEFAULT_MAX_TASKS = 10000
+
+# 无法接收变更通知时的轮询间隔（秒）
+WAIT_POLL_INTERVAL = 0.5
+
+class BaseTaskStore:
+    """任务状态存储基类"""
+    
+    def __init__(self, ttl: int = DEFAULT_TASK_TTL):
+        """
+        初始化存储
+        
+        Args:
+            ttl: 任务状态保留时间（秒），每次写入后重新计时
+        """
+        self.ttl = ttl
+    
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态（副本），不存在或已过期时返回None"""
+        raise NotImplementedError
+    
+    def set(self, task_id: str, task_data: Dict[str, Any]) -> None:
+        """整体设置任务状态"""
+        raise NotImplementedError
+    
+    def update(self, task_id: str, fields: Dict[str, Any]) -> None:
+        """合并更新任务状态的部分字段，任务不存在时创建"""
+        raise NotImplementedError
+    
+    def delete(self, task_id: str) -> None:
+        """删除任务状态"""
+        raise NotImplementedError
+    
+    def exists(self, task_id: str) -> bool:
+        """检查任务是否存在"""
+        return self.get(task_id) is not None
+    
+    def wait(self, task_id: str, previous: Optional[Dict[str, Any]], timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        等待任务状态发生变化
+        
+        Args:
+            task_id: 任务ID
+            previous: 调用方已知的任务状态
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            与已知状态不同的最新状态；超时时返回当前状态
+        """
+        deadline = time.time() + timeout
+        while True:
+            current = self.get(task_id)
+            remaining = deadline - time.time()
+            if current != previous or remaining <= 0:
+                return current
+            time.sleep(min(WAIT_POLL_INTERVAL, remaining))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        raise NotImplementedError
+
+class MemoryTaskStore(BaseTaskStore):
+    """
+    进程内任务状态存储
+    
+    按写入顺序维护任务，过期任务在写入时从最旧一端清理，超过容量时淘汰最旧的任务。
+    每次写入都会唤醒等待状态变化的调用方。
+    """
+    
+    def __init__(self, ttl: int = DEFAULT_TASK_TTL, max_tasks: int = DEFAULT_MAX_TASKS):
+        """
+        初始化存储
+        
+        Args:
+            ttl: 任务状态保留时间（秒）
+            max_tasks: 最多保留的任务数
+        """
+        super().__init__(ttl)
+        self.max_tasks = max_tasks
+        self._tasks = OrderedDict()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.evicted = 0
+    
+    def _is_expired(self, entry: tuple, now: float) -> bool:
+        """检查条目是否过期"""
+        return entry[0] <= now
+    
+    def _touch(self, task_id: str, task_data: Dict[str, Any]) -> None:
+        """写入条目并移到最新一端，需持有锁"""
+        now = time.time()
+        self._tasks[task_id] = (now + self.ttl, task_data)
+        self._tasks.move_to_end(task_id)
+        self._changed.notify_all()
+        
+        # 清理过期和超出容量的条目
+        while self._tasks:
+            oldest_id, oldest = next(iter(self._tasks.items()))
+            if not self._is_expired(oldest, now) and len(self._tasks) <= self.max_tasks:
+                break
+            del self._tasks[oldest_id]
+            self.evicted += 1
+    
+    def _get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态副本，需持有锁"""
+        entry = self._tasks.get(task_id)
+        if entry is None:
+            return None
+        if self._is_expired(entry, time.time()):
+            del self._tasks[task_id]
+            self.evicted += 1
+            return None
+        return dict(entry[1])
+    
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态（副本），不存在或已过期时返回None"""
+        with self._lock:
+            return self._get(task_id)
+    
+    def set(self, task_id: str, task_data: Dict[str, Any]) -> None:
+        """整体设置任务状态"""
+        with self._lock:
+            self._touch(task_id, dict(task_data))
+    
+    def update(self, task_id: str, fields: Dict[str, Any]) -> None:
+        """合并更新任务状态的部分字段，任务不存在时创建"""
+        with self._lock:
+            entry = self._tasks.get(task_id)
+            task_data = dict(entry[1]) if entry is not None and not self._is_expired(entry, time.time()) else {}
+            task_data.update(fields)
+            self._touch(task_id, task_data)
+    
+    def delete(self, task_id: str) -> None:
+        """删除任务状态"""
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            self._changed.notify_all()
+    
+    def wait(self, task_id: str, previous: Optional[Dict[str, Any]], timeout: float) -> Optional[Dict[str, Any]]:
+        """等待任务状态发生变化，写入时被唤醒"""
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                current = self._get(task_id)
+                remaining = deadline - time.time()
+                if current != previous or remaining <= 0:
+                    return current
+                self._changed.wait(remaining)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        with self._lock:
+            return {
+                "type": "memory",
+                "tasks": len(self._tasks),
+                "max_tasks": self.max_tasks,
+                "ttl": self.ttl,
+                "evicted": self.evicted
+            }
+
+class RedisTaskStore(BaseTaskStore):
+    """
+    Redis任务状态存储
+    
+    每个任务保存为一个哈希，字段值为JSON编码，多进程部署时各进程共享任务状态。
+    写入时在任务频道上发布通知，等待状态变化的进程通过订阅该频道被唤醒。
+    """
+    
+    def __init__(self, config: Dict[str, Any], ttl: int = DEFAULT_TASK_TTL):
+        """
+        初始化存储
+        
+        Args:
+            config: 配置字典，使用其中的redis配置
+            ttl: 任务状态保留时间（秒）
+        """
+        super().__init__(ttl)
+        if not REDIS_AVAILABLE:
+            raise ImportError("未安装redis模块，无法使用Redis任务存储")
+        
+        redis_config = config.get('redis', {})
+        self.prefix = f"{redis_config.get('prefix', 'file_preview:')}task:"
+        self.client = redis.Redis(
+            host=redis_config.get('host', 'localhost'),
+            port=redis_config.get('port', 6379),
+            db=redis_config.get('db', 0),
+            password=redis_config.get('password'),
+            decode_responses=True
+        )
+    
+    def _key(self, task_id: str) -> str:
+        """生成任务键"""
+        return f"{self.prefix}{task_id}"
+    
+    def _channel(self, task_id: str) -> str:
+        """生成任务变更通知频道"""
+        return f"{self.prefix}events:{task_id}"
+    
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+        """编码字段值"""
+        return {field: json.dumps(value, ensure_ascii=False) for field, value in fields.items()}
+    
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态（副本），不存在或已过期时返回None"""
+        try:
+            fields = self.client.hgetall(self._key(task_id))
+        except Exception as e:
+            logger.error(f"Redis获取任务状态失败: {str(e)}")
+            return None
+        if not fields:
+            return None
+        return {field: json.loads(value) for field, value in fields.items()}
+    
+    def set(self, task_id: str, task_data: Dict[str, Any]) -> None:
+        """整体设置任务状态"""
+        key = self._key(task_id)
+        try:
+            pipe = self.client.pipeline()
+            pipe.delete(key)
+            if task_data:
+                pipe.hset(key, mapping=self._encode(task_data))
+                pipe.expire(key, self.ttl)
+            pipe.publish(self._channel(task_id), 'set')
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis设置任务状态失败: {str(e)}")
+    
+    def update(self, task_id: str, fields: Dict[str, Any]) -> None:
+        """合并更新任务状态的部分字段，任务不存在时创建"""
+        if not fields:
+            return
+        key = self._key(task_id)
+        try:
+            pipe = self.client.pipeline()
+            pipe.hset(key, mapping=self._encode(fields))
+            pipe.expire(key, self.ttl)
+            pipe.publish(self._channel(task_id), 'update')
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis更新任务状态失败: {str(e)}")
+    
+    def delete(self, task_id: str) -> None:
+        """删除任务状态"""
+        try:
+            pipe = self.client.pipeline()
+            pipe.delete(self._key(task_id))
+            pipe.publish(self._channel(task_id), 'delete')
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis删除任务状态失败: {str(e)}")
+    
+    def exists(self, task_id: str) -> bool:
+        """检查任务是否存在"""
+        try:
+            return bool(self.client.exists(self._key(task_id)))
+        except Exception as e:
+            logger.error(f"Redis检查任务状态失败: {str(e)}")
+            return False
+    
+    def wait(self, task_id: str, previous: Optional[Dict[str, Any]], timeout: float) -> Optional[Dict[str, Any]]:
+        """等待任务状态发生变化，订阅失败时回退到轮询"""
+        deadline = time.time() + timeout
+        try:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self._channel(task_id))
+        except Exception as e:
+            logger.warning(f"Redis订阅任务状态失败: {str(e)}，改为轮询")
+            return super().wait(task_id, previous, timeout)
+        
+        try:
+            # 订阅后再读取状态，避免错过订阅前的写入
+            current = self.get(task_id)
+            while current == previous:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                if pubsub.get_message(timeout=remaining):
+                    current = self.get(task_id)
+            return current
+        except Exception as e:
+            logger.error(f"Redis等待任务状态失败: {str(e)}")
+            return self.get(task_id)
+        finally:
+            pubsub.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        return {
+            "type": "redis",
+            "ttl": self.ttl
+        }
+
+class TaskStore:
+    """
+    任务状态存储入口
+    
+    模块间共享同一个实例，应用启动时按配置切换后端。
+    """
+    
+    def __init__(self):
+        """使用默认配置的进程内存储初始化"""
+        self.backend = MemoryTaskStore()
+    
+    def configure(self, config: Dict[str, Any]) -> None:
+        """
+        按配置创建存储后端，启用Redis时使用Redis存储，失败时回退到进程内存储
+        
+        Args:
+            config: 配置字典
+        """
+        task_config = config.get('tasks', {})
+        ttl = task_config.get('ttl', DEFAULT_TASK_TTL)
+        max_tasks = task_config.get('max_tasks', DEFAULT_MAX_TASKS)
+        
+        if config.get('redis', {}).get('enabled', False) and REDIS_AVAILABLE:
+            try:
+                self.backend = RedisTaskStore(config, ttl)
+                logger.info("使用Redis任务存储")
+                return
+            except Exception as e:
+                logger.warning(f"初始化Redis任务存储失败: {str(e)}，回退到进程内存储")
+        
+        self.backend = MemoryTaskStore(ttl, max_tasks)
+        logger.info("使用进程内任务存储")
+    
+    def get(self, task_id: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        获取任务状态
+        
+        Args:
+            task_id: 任务ID
+            default: 任务不存在时的返回值
+        
+        Returns:
+            任务状态副本，修改返回值不会影响存储
+        """
+        task_data = self.backend.get(task_id)
+        return default if task_data is None else task_data
+    
+    def set(self, task_id: str, task_data: Dict[str, Any]) -> None:
+        """
+        整体设置任务状态
+        
+        Args:
+            task_id: 任务ID
+            task_data: 任务状态
+        """
+        self.backend.set(task_id, task_data)
+    
+    def update(self, task_id: str, **fields) -> None:
+        """
+        合并更新任务状态的部分字段
+        
+        Args:
+            task_id: 任务ID
+            **fields: 需要更新的字段
+        """
+        self.backend.update(task_id, fields)
+    
+    def delete(self, task_id: str) -> None:
+        """
+        删除任务状态
+        
+        Args:
+            task_id: 任务ID
+        """
+        self.backend.delete(task_id)
+    
+    def wait(self, task_id: str, previous: Optional[Dict[str, Any]] = None,
+             timeout: float = 30) -> Optional[Dict[str, Any]]:
+        """
+        等待任务状态发生变化
+        
+        Args:
+            task_id: 任务ID
+            previous: 调用方已知的任务状态
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            与已知状态不同的最新状态；超时时返回当前状态
+        """
+        return self.backend.wait(task_id, previous, timeout)
+    
+    def __contains__(self, task_id: str) -> bool:
+        """检查任务是否存在"""
+        return self.backend.exists(task_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        return self.backend.get_stats()
\ No newline at end of file
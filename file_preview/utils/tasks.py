@@ -7,9 +7,6 @@ import logging
 import threading
 import enum
 from typing import Dict, Any, Callable, Optional, Tuple
-from ..core.converter import FileConverter
-from ..core.downloader import FileDownloader
-from ..core.cache import CacheManager
 from ..utils.file_utils import (get_file_info, is_supported_format, get_file_md5, 
                              get_url_md5, generate_file_response, process_file_conversion as process_file_conversion_util,
                              download_and_process_url as download_and_process_url_util,
@@ -17,18 +14,29 @@ from ..utils.file_utils import (get_file_info, is_supported_format, get_file_md5
                              handle_file_by_id as handle_file_by_id_util,
                              process_url_file as process_url_file_util,
                              process_uploaded_file as process_uploaded_file_util)
-from ..utils.mapping import FileMapping
+from .services import get_services
 from .utils_core import TaskUtils, FileUtils, MIME_TO_EXT, ResponseUtils
+from .scheduler import get_scheduler, TaskQueueFullError, TaskScheduler, ScheduledTask
+from ..core.async_downloader import DownloadQueueFullError
+from .inflight import inflight, get_inflight_key
+from .freshness import is_url_result_fresh
+from .task_store import TaskStore
 from urllib.parse import urlparse
-import requests
 import hashlib
 import time
 
 # 获取日志记录器
 logger = logging.getLogger('file_preview')
 
-# 存储转换任务状态
-conversion_tasks = {}
+# 存储转换任务状态，应用启动时按配置选择进程内或Redis存储
+conversion_tasks = TaskStore()
+
+# 调度器记录的排队信息，任务状态整体更新时保留
+SCHEDULING_FIELDS = ('queued_at', 'started_at', 'wait_time')
+
+# 本进程中尚未开始执行的任务，用于在读取状态时计算当前排队位置
+_queued_tasks: Dict[str, Tuple[TaskScheduler, ScheduledTask]] = {}
+_queued_tasks_lock = threading.Lock()
 
 class TaskStatus(enum.Enum):
     """任务状态枚举"""
@@ -50,32 +58,46 @@ def update_task_status(task_id: str, status: TaskStatus, progress: int = None, m
     """
     logger.debug(f"更新任务状态: {task_id}, 状态: {status.value}, 进度: {progress}, 消息: {message}")
     
-    if task_id not in conversion_tasks:
-        conversion_tasks[task_id] = {}
-    
-    conversion_tasks[task_id]['status'] = status.value
+    fields = {'status': status.value}
     
     if progress is not None:
-        conversion_tasks[task_id]['progress'] = progress
+        fields['progress'] = progress
     
     if message:
-        conversion_tasks[task_id]['message'] = message
+        fields['message'] = message
         
     if error:
-        conversion_tasks[task_id]['error'] = error
+        fields['error'] = error
+    
+    conversion_tasks.update(task_id, **fields)
+
+def set_task(task_id: str, task_data: Dict[str, Any]) -> None:
+    """
+    设置任务状态，保留已记录的排队信息
+    
+    Args:
+        task_id: 任务ID
+        task_data: 任务状态
+    """
+    previous = conversion_tasks.get(task_id) or {}
+    for field in SCHEDULING_FIELDS:
+        if field in previous and field not in task_data:
+            task_data[field] = previous[field]
+    conversion_tasks.set(task_id, task_data)
 
-def get_url_content_type(url: str) -> Optional[str]:
+def get_url_content_type(url: str, config: Dict[str, Any]) -> Optional[str]:
     """
-    获取URL的内容类型
+    获取URL的内容类型，复用下载器的HTTP连接池
     
     Args:
         url: URL
+        config: 配置字典
         
     Returns:
         内容类型或None
     """
     try:
-        response = requests.head(url, timeout=10)
+        response = get_services(config).downloader.http.head(url, timeout=10)
         response.raise_for_status()
         return response.headers.get('content-type')
     except Exception as e:
@@ -86,6 +108,167 @@ def get_url_content_type(url: str) -> Optional[str]:
 create_task_id = TaskUtils.create_task_id
 start_background_task = TaskUtils.start_background_task
 
+def schedule_task(task_id: str, task_function: Callable, *args, **kwargs) -> None:
+    """
+    提交任务到后台调度器，并在任务状态中记录排队位置和等待时间
+    
+    Args:
+        task_id: 任务ID
+        task_function: 任务函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+    
+    Raises:
+        TaskQueueFullError: 任务队列已满，此时任务记录会被移除
+    """
+    def on_start(wait_time: float) -> None:
+        with _queued_tasks_lock:
+            _queued_tasks.pop(task_id, None)
+        conversion_tasks.update(task_id, started_at=time.time(), wait_time=round(wait_time, 3))
+    
+    scheduler = get_scheduler()
+    try:
+        scheduled = scheduler.submit(task_function, args, kwargs, on_start=on_start)
+    except TaskQueueFullError:
+        conversion_tasks.delete(task_id)
+        raise
+    
+    with _queued_tasks_lock:
+        # 任务可能在登记前就已开始执行
+        if scheduled.started_at is None:
+            _queued_tasks[task_id] = (scheduler, scheduled)
+    conversion_tasks.update(task_id, queued_at=scheduled.queued_at)
+    logger.info(f"任务已进入队列: {task_id}, 排队位置: {scheduled.position}")
+
+def is_task_queued(task_status: Optional[Dict[str, Any]]) -> bool:
+    """
+    检查任务是否已进入调度器队列但尚未开始执行
+    
+    Args:
+        task_status: 任务状态
+    
+    Returns:
+        是否正在排队
+    """
+    return (task_status is not None and task_status.get('status') in ('pending', 'processing')
+            and 'queued_at' in task_status and 'started_at' not in task_status)
+
+def get_queue_info(task_id: str, task_status: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    获取排队中任务的当前排队信息
+    
+    排队位置随前面的任务开始执行而变化，因此在读取状态时计算，不写入任务状态。
+    任务由本进程调度时返回排队位置（queue_position）；由其他进程调度时（如共享Redis存储的多进程部署）
+    无法得知其位置，返回本进程调度器当前的排队任务数（queue_depth）作为参考。
+    
+    Args:
+        task_id: 任务ID
+        task_status: 任务状态
+    
+    Returns:
+        排队信息，任务不在排队时为空字典
+    """
+    if not is_task_queued(task_status):
+        return {}
+    
+    with _queued_tasks_lock:
+        entry = _queued_tasks.get(task_id)
+    if entry is not None:
+        scheduler, scheduled = entry
+        position = scheduler.position(scheduled)
+        if position > 0:
+            return {'queue_position': position}
+        return {}
+    return {'queue_depth': get_scheduler().get_stats()['queue_depth']}
+
+def schedule_download(task_id: str, inflight_key: Optional[str], url: str, config: Dict[str, Any],
+                      task_function: Callable, *args, **kwargs) -> None:
+    """
+    在异步下载引擎中下载URL，下载完成后把处理函数提交到后台调度器
+    
+    下载期间不占用调度器线程。处理函数通过 download_result 关键字参数接收下载结果，下载失败时为None。
+    未启用下载引擎时，下载和处理一起作为一个任务提交到调度器。
+    
+    Args:
+        task_id: 任务ID
+        inflight_key: 进行中任务的登记键，处理结束或无法进入队列时解除登记
+        url: 文件URL
+        config: 配置信息
+        task_function: 处理函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+    
+    Raises:
+        TaskQueueFullError: 等待下载的URL数或任务队列已满，此时任务记录会被移除
+    """
+    services = get_services(config)
+    engine = services.download_engine
+    
+    # URL最近下载或转换失败过，退避时间内直接返回缓存的错误
+    failure = services.downloader.get_failure(url)
+    if failure:
+        if inflight_key:
+            inflight.release(inflight_key, task_id)
+        set_task(task_id, get_failure_task(failure))
+        return
+    
+    task_function = _bind_inflight(inflight_key, task_id, task_function)
+    
+    if not engine.enabled:
+        def download_and_run():
+            return task_function(*args, download_result=services.downloader.fetch(url), **kwargs)
+        schedule_task(task_id, download_and_run)
+        return
+    
+    try:
+        future = engine.submit(url)
+    except DownloadQueueFullError as e:
+        conversion_tasks.delete(task_id)
+        raise TaskQueueFullError(str(e), get_scheduler().estimate_retry_after())
+    
+    conversion_tasks.update(task_id, message='正在下载文件...')
+    
+    def on_downloaded(future) -> None:
+        try:
+            download_result = future.result()
+        except Exception as e:
+            logger.error(f"下载URL失败: {url}, {str(e)}")
+            download_result = None
+        
+        try:
+            schedule_task(task_id, task_function, *args, download_result=download_result, **kwargs)
+        except TaskQueueFullError as e:
+            if inflight_key:
+                inflight.release(inflight_key, task_id)
+            if download_result:
+                services.downloader.cleanup(download_result['path'])
+            set_task(task_id, {
+                'status': 'failed',
+                'message': '服务繁忙',
+                'error': str(e)
+            })
+    
+    # 回调在回调线程中执行，任务调度和任务状态写入不阻塞下载引擎的事件循环
+    engine.add_done_callback(future, on_downloaded)
+
+def get_failure_task(failure: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    根据失败记录生成失败的任务状态
+    
+    Args:
+        failure: 失败结果缓存中的记录
+    
+    Returns:
+        任务状态
+    """
+    return {
+        'status': 'failed',
+        'message': '最近处理失败，暂不重试',
+        'error': failure['error'],
+        'failure_class': failure['failure_class'],
+        'retry_after': failure['retry_after']
+    }
+
 def get_task_status(task_id: str) -> Dict[str, Any]:
     """
     获取任务状态
@@ -96,11 +279,10 @@ def get_task_status(task_id: str) -> Dict[str, Any]:
     Returns:
         任务状态
     """
-    logger.info(f"获取任务状态: {task_id}, 当前任务列表: {list(conversion_tasks.keys())}")
-    if task_id not in conversion_tasks:
+    task_status = conversion_tasks.get(task_id)
+    if task_status is None:
         logger.warning(f"任务不存在: {task_id}")
-        return None
-    return conversion_tasks[task_id]
+    return task_status
 
 def process_file_conversion(task_id: str, file_path: str, config: Dict[str, Any], 
                           file_md5: Optional[str] = None, url_md5: Optional[str] = None,
@@ -128,7 +310,7 @@ def process_file_conversion(task_id: str, file_path: str, config: Dict[str, Any]
             possible_paths = [
                 file_path,  # 原始路径
                 os.path.join(root_dir, file_path.lstrip("/")),  # 相对于根目录的路径
-                os.path.join(root_dir, config['directories']['download'].lstrip("./"), os.path.basename(file_path))  # 下载目录
+                os.path.join(FileUtils.normalize_path(config['directories']['download'], root_dir), os.path.basename(file_path))  # 下载目录
             ]
             
             # 尝试所有可能的路径
@@ -143,10 +325,10 @@ def process_file_conversion(task_id: str, file_path: str, config: Dict[str, Any]
             if not file_found:
                 logger.error(f"文件不存在: {file_path}")
                 error_msg = f"[Errno 2] No such file or directory: '{file_path}'"
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'failed',
                     'error': error_msg
-                }
+                })
                 return
         
         # 调用工具函数处理转换
@@ -161,7 +343,7 @@ def process_file_conversion(task_id: str, file_path: str, config: Dict[str, Any]
             
             # 获取文件ID
             if file_md5 or url_md5:
-                file_mapping = FileMapping(config)
+                file_mapping = get_services(config).file_mapping
                 file_id = file_mapping.get_id_by_md5(file_md5 or url_md5) or response.get('file_id', '')
             else:
                 file_id = response.get('file_id', '')
@@ -180,32 +362,32 @@ def process_file_conversion(task_id: str, file_path: str, config: Dict[str, Any]
                 if not preview_url and file_id:
                     preview_url = f"/preview?file_id={file_id}"
                 
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'completed',
                     'message': response.get('message', '文件转换成功'),
                     'file_id': file_id,
                     'download_url': download_url,
                     'preview_url': preview_url
-                }
+                })
             else:
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'failed',
                     'error': response.get('error', '转换失败')
-                }
+                })
             
         except Exception as e:
             logger.error(f"转换过程中发生错误: {str(e)}", exc_info=True)
-            conversion_tasks[task_id] = {
+            set_task(task_id, {
                 'status': 'failed',
                 'error': str(e)
-            }
+            })
         
     except Exception as e:
         logger.error(f"处理文件转换任务失败: {str(e)}", exc_info=True)
-        conversion_tasks[task_id] = {
+        set_task(task_id, {
             'status': 'failed',
             'error': str(e)
-        }
+        })
 
 def download_and_process_url(task_id: str, url: str, config: Dict[str, Any], url_md5: str = None) -> Dict[str, Any]:
     """
@@ -224,15 +406,15 @@ def download_and_process_url(task_id: str, url: str, config: Dict[str, Any], url
         logger.info(f"开始下载并处理URL: {url}")
         
         # 初始化下载器和转换器
-        downloader = FileDownloader(config)
-        converter = FileConverter(config)
-        file_mapping = FileMapping(config)
+        downloader = get_services(config).downloader
+        converter = get_services(config).converter
+        file_mapping = get_services(config).file_mapping
         
         # 更新任务状态
-        conversion_tasks[task_id] = {
+        set_task(task_id, {
             'status': 'processing',
             'message': '正在下载文件...'
-        }
+        })
         
         # 如果未提供URL的MD5，计算它
         if not url_md5:
@@ -242,65 +424,106 @@ def download_and_process_url(task_id: str, url: str, config: Dict[str, Any], url
         existing_file_id = file_mapping.get_id_by_url(url) or file_mapping.get_id_by_md5(url_md5)
         if existing_file_id:
             file_info = file_mapping.get_file_info(existing_file_id)
-            if file_info and os.path.exists(file_info.get('path', '')):
-                # 已存在处理结果，直接使用
+            if (file_info and os.path.exists(file_info.get('path', ''))
+                    and is_url_result_fresh(existing_file_id, file_info, config)):
+                # 已存在处理结果且远程文件未变化，直接使用
                 logger.info(f"URL已有处理结果: {url} -> {existing_file_id}")
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'completed',
                     'message': '文件处理完成',
                     'file_id': existing_file_id,
                     'download_url': f"/api/download?file_id={existing_file_id}",
                     'preview_url': f"/preview?file_id={existing_file_id}",
                     'file_info': file_info
-                }
-                return conversion_tasks[task_id]
+                })
+                return conversion_tasks.get(task_id)
+        
+        # 下载文件，下载的同时计算内容MD5
+        download_result = downloader.fetch(url)
+        return process_downloaded_url(task_id, url, config, url_md5, download_result=download_result)
+    
+    except Exception as e:
+        logger.exception(f"处理URL失败: {str(e)}")
+        set_task(task_id, {
+            'status': 'failed',
+            'message': '处理URL失败',
+            'error': str(e)
+        })
+        return conversion_tasks.get(task_id)
+
+def process_downloaded_url(task_id: str, url: str, config: Dict[str, Any], url_md5: str = None,
+                           download_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    处理已下载的URL文件
+    
+    Args:
+        task_id: 任务ID
+        url: URL
+        config: 配置信息
+        url_md5: URL的MD5值
+        download_result: 下载结果，下载失败时为None
+    
+    Returns:
+        处理结果
+    """
+    try:
+        file_mapping = get_services(config).file_mapping
+        if not url_md5:
+            url_md5 = get_url_md5(url)
         
-        # 下载文件
-        temp_file_path = downloader.download(url)
-        if not temp_file_path:
+        if not download_result:
             logger.error(f"下载文件失败: {url}")
-            conversion_tasks[task_id] = {
+            failure = get_services(config).downloader.get_failure(url)
+            set_task(task_id, {
                 'status': 'failed',
                 'message': '下载文件失败',
-                'error': f'无法下载文件: {url}'
-            }
-            return conversion_tasks[task_id]
+                'error': failure['error'] if failure else f'无法下载文件: {url}'
+            })
+            return conversion_tasks.get(task_id)
+        
+        conversion_tasks.update(task_id, status='processing', message='正在处理文件...')
             
-        # 提取原始文件名
-        original_filename = os.path.basename(temp_file_path)
+        # 下载文件名是随机生成的，原始文件名来自URL
+        temp_file_path = download_result['path']
+        original_filename = download_result.get('filename') or os.path.basename(temp_file_path)
         logger.info(f"文件下载完成: {temp_file_path}")
         
-        # 获取原始文件信息
-        original_file_info = get_file_info(temp_file_path)
-        
-        # 构建下载信息
-        download_info = {
-            'url': url,
-            'download_time': time.time(),
-            'original_filename': original_filename,
-            'temp_path': temp_file_path,
-            'url_md5': url_md5,
-            'file_size': os.path.getsize(temp_file_path) if os.path.exists(temp_file_path) else 0,
-            'file_extension': original_file_info.get('extension', '')
-        }
-        
-        # 检查文件格式是否支持
-        if not is_supported_format(temp_file_path, config):
-            logger.error(f"不支持的文件格式: {temp_file_path}")
-            conversion_tasks[task_id] = {
-                'status': 'failed',
-                'message': '不支持的文件格式',
-                'error': f'不支持的文件格式: {os.path.basename(temp_file_path)}'
-            }
-            return conversion_tasks[task_id]
-        
-        # 使用FileProcessor处理文件
+        # 处理结束后（包括格式不支持时）删除下载的临时文件
         try:
+            # 获取原始文件信息
+            original_file_info = get_file_info(temp_file_path)
+            
+            # 构建下载信息
+            download_info = {
+                'url': url,
+                'download_time': time.time(),
+                'original_filename': original_filename,
+                'temp_path': temp_file_path,
+                'url_md5': url_md5,
+                'content_md5': download_result['md5'],
+                'file_size': download_result['size'],
+                'file_extension': original_file_info.get('extension', ''),
+                'validators': download_result.get('validators', {})
+            }
+            
+            # 检查文件格式是否支持
+            if not is_supported_format(temp_file_path, config):
+                logger.error(f"不支持的文件格式: {original_filename}")
+                set_task(task_id, {
+                    'status': 'failed',
+                    'message': '不支持的文件格式',
+                    'error': f'不支持的文件格式: {original_filename}'
+                })
+                return conversion_tasks.get(task_id)
+            
+            # 使用FileProcessor处理文件
             from ..utils.file_processor import FileProcessor
             processor = FileProcessor(config)
             
             # 处理文件，包含详细信息
-            response = processor.process_file(temp_file_path, url_md5, original_filename)
+            response = processor.process_file(temp_file_path, url_md5, original_filename,
+                                              content_md5=download_result['md5'])
+            processor.record_url_failure(url, response, download_result)
             
             # 添加URL映射信息
             if response.get('status') == 'success' and response.get('file_id'):
@@ -318,7 +541,7 @@ def download_and_process_url(task_id: str, url: str, config: Dict[str, Any], url
                     file_mapping.cache_manager.put_file_info(file_id, file_info)
                 
                 # 更新任务状态
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'completed',
                     'message': '文件处理完成',
                     'file_id': file_id,
@@ -327,22 +550,22 @@ def download_and_process_url(task_id: str, url: str, config: Dict[str, Any], url
                     'file_info': file_info,
                     'original_file_info': response.get('original_file_info'),
                     'converted_file_info': response.get('converted_file_info')
-                }
+                })
             else:
                 # 处理失败
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'failed',
                     'message': '文件处理失败',
                     'error': response.get('error', '处理失败')
-                }
+                })
                 
         except Exception as e:
             logger.error(f"处理文件时发生错误: {str(e)}", exc_info=True)
-            conversion_tasks[task_id] = {
+            set_task(task_id, {
                 'status': 'failed',
                 'message': '文件处理失败',
                 'error': str(e)
-            }
+            })
         finally:
             # 清理临时文件
             try:
@@ -352,16 +575,16 @@ def download_and_process_url(task_id: str, url: str, config: Dict[str, Any], url
             except Exception as e:
                 logger.error(f"删除临时文件失败: {str(e)}")
                 
-        return conversion_tasks[task_id]
+        return conversion_tasks.get(task_id)
             
     except Exception as e:
         logger.exception(f"处理URL失败: {str(e)}")
-        conversion_tasks[task_id] = {
+        set_task(task_id, {
             'status': 'failed',
             'message': '处理URL失败',
             'error': str(e)
-        }
-        return conversion_tasks[task_id]
+        })
+        return conversion_tasks.get(task_id)
 
 def process_task(task_type: str, task_id: str, config: Dict[str, Any], **kwargs) -> None:
     """
@@ -374,10 +597,10 @@ def process_task(task_type: str, task_id: str, config: Dict[str, Any], **kwargs)
         **kwargs: 其他参数
     """
     # 初始化任务状态
-    conversion_tasks[task_id] = {
+    set_task(task_id, {
         'status': 'processing',
         'task_type': task_type
-    }
+    })
     
     try:
         logger.info(f"开始处理任务: {task_id}, 类型: {task_type}")
@@ -406,21 +629,20 @@ def process_task(task_type: str, task_id: str, config: Dict[str, Any], **kwargs)
                 # 如果update_task_status函数未定义，直接更新状态
                 if "update_task_status" in str(e):
                     logger.error(f"函数未定义: {str(e)}，直接更新任务状态")
-                    conversion_tasks[task_id] = {
+                    set_task(task_id, {
                         'status': 'failed',
                         'error': 'URL处理失败: 内部函数未定义',
                         'message': '处理失败'
-                    }
+                    })
                 else:
                     raise
         elif task_type == 'file_id':
             # 处理文件ID
-            file_mapping = FileMapping(config)
+            file_mapping = get_services(config).file_mapping
             file_path, original_name = file_mapping.get_by_id(kwargs.get('file_id'))
             
             if not file_path:
-                conversion_tasks[task_id]['status'] = 'failed'
-                conversion_tasks[task_id]['error'] = f'找不到文件ID: {kwargs.get("file_id")}'
+                conversion_tasks.update(task_id, status='failed', error=f'找不到文件ID: {kwargs.get("file_id")}')
                 return
                 
             process_file_conversion(
@@ -431,13 +653,11 @@ def process_task(task_type: str, task_id: str, config: Dict[str, Any], **kwargs)
             )
         else:
             logger.error(f"未知任务类型: {task_type}")
-            conversion_tasks[task_id]['status'] = 'failed'
-            conversion_tasks[task_id]['error'] = f'未知任务类型: {task_type}'
+            conversion_tasks.update(task_id, status='failed', error=f'未知任务类型: {task_type}')
             
     except Exception as e:
         logger.exception(f"任务处理失败: {task_id}, 错误: {str(e)}")
-        conversion_tasks[task_id]['status'] = 'failed'
-        conversion_tasks[task_id]['error'] = str(e)
+        conversion_tasks.update(task_id, status='failed', error=str(e))
 
 def check_mapped_file(md5_hash: str, config: Dict[str, Any]) -> Optional[str]:
     """
@@ -450,7 +670,7 @@ def check_mapped_file(md5_hash: str, config: Dict[str, Any]) -> Optional[str]:
     Returns:
         任务ID或None
     """
-    file_mapping = FileMapping(config)
+    file_mapping = get_services(config).file_mapping
     mapped_pdf = file_mapping.get(md5_hash)
     
     if mapped_pdf:
@@ -459,11 +679,11 @@ def check_mapped_file(md5_hash: str, config: Dict[str, Any]) -> Optional[str]:
         
         # 生成任务ID
         task_id = create_task_id()
-        conversion_tasks[task_id] = {
+        set_task(task_id, {
             'status': 'completed',
             'filename': os.path.basename(mapped_pdf),
             'file_id': file_id
-        }
+        })
         return task_id
     
     return None
@@ -482,9 +702,12 @@ def create_conversion_task(file_id=None, file_path=None, url=None, uploaded_file
         
     Returns:
         任务ID
+    
+    Raises:
+        TaskQueueFullError: 任务队列已满
     """
     # 首先检查是否已经有处理好的相同资源
-    file_mapping = FileMapping(config)
+    file_mapping = get_services(config).file_mapping
     
     # 用于追踪可能的文件ID和MD5
     existing_file_id = None
@@ -499,7 +722,8 @@ def create_conversion_task(file_id=None, file_path=None, url=None, uploaded_file
         if cached_file_id:
             # 检查文件是否存在
             file_path, original_name = file_mapping.get_by_id(cached_file_id)
-            if file_path and os.path.exists(file_path):
+            if (file_path and os.path.exists(file_path)
+                    and is_url_result_fresh(cached_file_id, file_mapping.get_file_info(cached_file_id), config)):
                 logger.info(f"使用已缓存的URL: {url} -> {cached_file_id}")
                 
                 # 创建完成状态的任务
@@ -509,14 +733,14 @@ def create_conversion_task(file_id=None, file_path=None, url=None, uploaded_file
                 preview_url = f"/preview?file_id={cached_file_id}"
                 
                 # 设置任务为完成状态
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'completed',
                     'file_id': cached_file_id,
                     'download_url': download_url,
                     'preview_url': preview_url,
                     'message': '使用已缓存的文件',
                     'filename': original_name or os.path.basename(file_path)
-                }
+                })
                 return task_id
             else:
                 # 记录URL MD5以便后续使用
@@ -527,7 +751,8 @@ def create_conversion_task(file_id=None, file_path=None, url=None, uploaded_file
             cached_file_id = file_mapping.get_id_by_md5(url_md5)
             if cached_file_id:
                 file_path, original_name = file_mapping.get_by_id(cached_file_id)
-                if file_path and os.path.exists(file_path):
+                if (file_path and os.path.exists(file_path)
+                        and is_url_result_fresh(cached_file_id, file_mapping.get_file_info(cached_file_id), config)):
                     logger.info(f"使用具有相同MD5的缓存文件: {url_md5} -> {cached_file_id}")
                     
                     # 添加URL映射
@@ -540,14 +765,14 @@ def create_conversion_task(file_id=None, file_path=None, url=None, uploaded_file
                     preview_url = f"/preview?file_id={cached_file_id}"
                     
                     # 设置任务为完成状态
-                    conversion_tasks[task_id] = {
+                    set_task(task_id, {
                         'status': 'completed',
                         'file_id': cached_file_id,
                         'download_url': download_url,
                         'preview_url': preview_url,
                         'message': '使用已缓存的文件',
                         'filename': original_name or os.path.basename(file_path)
-                    }
+                    })
                     return task_id
                 else:
                     # 记录URL MD5以便后续使用
@@ -569,14 +794,14 @@ def create_conversion_task(file_id=None, file_path=None, url=None, uploaded_file
                 preview_url = f"/preview?file_id={cached_file_id}"
                 
                 # 设置任务为完成状态
-                conversion_tasks[task_id] = {
+                set_task(task_id, {
                     'status': 'completed',
                     'file_id': cached_file_id,
                     'download_url': download_url,
                     'preview_url': preview_url,
                     'message': '使用已缓存的文件',
                     'filename': original_name or os.path.basename(cached_file_path)
-                }
+                })
                 return task_id
             else:
                 # 记录文件MD5以便后续使用
@@ -595,14 +820,14 @@ def create_conversion_task(file_id=None, file_path=None, url=None, uploaded_file
             preview_url = f"/preview?file_id={file_id}"
             
             # 设置任务为完成状态
-            conversion_tasks[task_id] = {
+            set_task(task_id, {
                 'status': 'completed',
                 'file_id': file_id,
                 'download_url': download_url,
                 'preview_url': preview_url,
                 'message': '使用已存在的文件',
                 'filename': original_name or os.path.basename(file_path)
-            }
+            })
             return task_id
         else:
             # 记录文件ID以便后续使用
@@ -611,6 +836,13 @@ def create_conversion_task(file_id=None, file_path=None, url=None, uploaded_file
     # 如果没有找到缓存，创建新任务
     task_id = create_task_id()
     
+    # 同一资源已有进行中的任务时直接复用，避免重复下载和转换
+    inflight_key = get_inflight_key(url_md5=url_md5, file_md5=file_md5, file_id=file_id)
+    if inflight_key:
+        leader_task_id = inflight.claim(inflight_key, task_id)
+        if leader_task_id:
+            return leader_task_id
+    
     # 初始化任务状态，包含已知的元数据信息
     task_data = {
         'status': 'pending',
@@ -628,31 +860,55 @@ def create_conversion_task(file_id=None, file_path=None, url=None, uploaded_file
     if file_id:
         task_data['file_id'] = file_id
         
-    conversion_tasks[task_id] = task_data
+    set_task(task_id, task_data)
     
     # 根据提供的参数类型，决定处理方式
-    if url:
-        # URL处理
-        start_background_task(download_and_process_url, task_id, url, config, url_md5=url_md5)
-    elif uploaded_file:
-        # 上传文件处理
-        start_background_task(process_task, 'uploaded_file', task_id, config, uploaded_file=uploaded_file)
-    elif file_path:
-        # 文件路径处理
-        start_background_task(process_file_conversion, task_id, file_path, config, file_md5=file_md5)
-    elif file_id:
-        # 文件ID处理
-        start_background_task(process_task, 'file_id', task_id, config, file_id=file_id)
-    else:
-        # 参数错误
-        conversion_tasks[task_id] = {
-            'status': 'failed',
-            'message': '参数错误',
-            'error': '必须提供file_id、file_path、url或上传文件之一'
-        }
+    try:
+        if url:
+            # URL处理，下载完成后再进入任务队列
+            schedule_download(task_id, inflight_key, url, config, process_downloaded_url,
+                              task_id, url, config, url_md5)
+        elif uploaded_file:
+            # 上传文件处理
+            schedule_task(task_id, process_task, 'uploaded_file', task_id, config, uploaded_file=uploaded_file)
+        elif file_path:
+            # 文件路径处理
+            schedule_task(task_id, _bind_inflight(inflight_key, task_id, process_file_conversion),
+                          task_id, file_path, config, file_md5=file_md5)
+        elif file_id:
+            # 文件ID处理
+            schedule_task(task_id, _bind_inflight(inflight_key, task_id, process_task),
+                          'file_id', task_id, config, file_id=file_id)
+        else:
+            # 参数错误
+            set_task(task_id, {
+                'status': 'failed',
+                'message': '参数错误',
+                'error': '必须提供file_id、file_path、url或上传文件之一'
+            })
+    except TaskQueueFullError:
+        if inflight_key:
+            inflight.release(inflight_key, task_id)
+        raise
     
     return task_id
 
+def _bind_inflight(inflight_key: Optional[str], task_id: str, task_function: Callable) -> Callable:
+    """
+    任务有登记键时，包装任务函数使其结束后解除进行中登记
+    
+    Args:
+        inflight_key: 登记键
+        task_id: 任务ID
+        task_function: 任务函数
+    
+    Returns:
+        任务函数
+    """
+    if not inflight_key:
+        return task_function
+    return inflight.bind(inflight_key, task_id, task_function)
+
 def get_url_md5(url: str) -> str:
     """
     获取URL的MD5值
@@ -0,0 +1,106 @@
+"""
+PDF页面缩略图
+PDF转换完成后在后台生成前几页的缩略图，与PDF存放在同一个按内容分配的目录下
+"""
+
+import os
+import logging
+from typing import Dict, Any, Optional, List
+from .services import get_services
+from .scheduler import get_scheduler, TaskQueueFullError
+from .inflight import inflight
+
+# 获取日志记录器
+logger = logging.getLogger('file_preview')
+
+# 默认预生成的页数
+DEFAULT_THUMBNAIL_PAGES = 3
+
+# 允许按需生成的最大页码
+DEFAULT_THUMBNAIL_MAX_PAGE = 50
+
+def get_thumbnail_path(pdf_path: str, page: int) -> str:
+    """
+    获取缩略图路径
+    
+    Args:
+        pdf_path: PDF文件路径
+        page: 页码（从1开始）
+    
+    Returns:
+        缩略图路径，如 convert/ab/<md5>/full.thumb-1.png
+    """
+    return f"{os.path.splitext(pdf_path)[0]}.thumb-{page}.png"
+
+def render_thumbnail(pdf_path: str, page: int, config: Dict[str, Any]) -> Optional[str]:
+    """
+    获取一页的缩略图，不存在时生成，同一页并发请求时只生成一次
+    
+    Args:
+        pdf_path: PDF文件路径
+        page: 页码（从1开始）
+        config: 配置字典
+    
+    Returns:
+        缩略图路径，无法生成时返回None
+    """
+    thumbnail_path = get_thumbnail_path(pdf_path, page)
+    if os.path.exists(thumbnail_path):
+        return thumbnail_path
+    
+    thumbnailer = get_services(config).thumbnailer
+    if not thumbnailer.available:
+        return None
+    
+    if inflight.call(f"thumbnail:{thumbnail_path}", thumbnailer.render_page, pdf_path, page, thumbnail_path):
+        return thumbnail_path
+    return None
+
+def render_thumbnails(pdf_path: str, config: Dict[str, Any]) -> List[str]:
+    """
+    生成前几页的缩略图，页码超出文档页数时停止
+    
+    Args:
+        pdf_path: PDF文件路径
+        config: 配置字典
+    
+    Returns:
+        已生成的缩略图路径列表
+    """
+    pages = config.get('thumbnails', {}).get('pages', DEFAULT_THUMBNAIL_PAGES)
+    thumbnails = []
+    for page in range(1, pages + 1):
+        thumbnail_path = render_thumbnail(pdf_path, page, config)
+        if not thumbnail_path:
+            break
+        thumbnails.append(thumbnail_path)
+    
+    logger.info(f"缩略图生成完成: {pdf_path}, 共 {len(thumbnails)} 页")
+    return thumbnails
+
+def schedule_thumbnails(pdf_path: str, config: Dict[str, Any]) -> bool:
+    """
+    提交后台任务生成缩略图，队列已满或不可用时跳过
+    
+    缩略图可以在请求时按需生成，后台生成只是预热，不占用排队名额时才提交。
+    
+    Args:
+        pdf_path: PDF文件路径
+        config: 配置字典
+    
+    Returns:
+        是否已提交
+    """
+    if not get_services(config).thumbnailer.available:
+        return False
+    
+    # 首页缩略图已存在说明之前已生成过
+    if os.path.exists(get_thumbnail_path(pdf_path, 1)):
+        return False
+    
+    try:
+        get_scheduler().submit(render_thumbnails, args=(pdf_path, config))
+        return True
+    except TaskQueueFullError:
+        logger.info(f"任务队列已满，跳过缩略图预生成: {pdf_path}")
+        return False
\ No newline at end of file
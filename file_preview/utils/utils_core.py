@@ -10,8 +10,9 @@ import time
 import uuid
 import base64
 import mimetypes
-import threading
 from typing import Dict, Any, Optional, Tuple, List, Callable, Union
+from .scheduler import get_scheduler
+from ..core.hashing import file_md5
 
 # 获取日志记录器
 logger = logging.getLogger('file_preview')
@@ -75,11 +76,7 @@ class FileUtils:
             return ""
             
         try:
-            hash_md5 = hashlib.md5()
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+            return file_md5(file_path)
         except Exception as e:
             logger.error(f"计算文件MD5失败: {str(e)}")
             return ""
@@ -321,16 +318,17 @@ class TaskUtils:
     @staticmethod
     def start_background_task(task_function: Callable, *args, **kwargs) -> None:
         """
-        启动后台任务
+        提交后台任务到有界调度器
         
         Args:
             task_function: 任务函数
             *args: 位置参数
             **kwargs: 关键字参数
+        
+        Raises:
+            TaskQueueFullError: 任务队列已满
         """
-        thread = threading.Thread(target=task_function, args=args, kwargs=kwargs)
-        thread.daemon = True
-        thread.start()
+        get_scheduler().submit(task_function, args, kwargs)
 
 
 class ResponseUtils:
@@ -0,0 +1,212 @@
+"""
+异步下载引擎测试
+"""
+
+import os
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+import pytest
+from file_preview.core.downloader import FileDownloader
+from file_preview.core.async_downloader import AsyncDownloadEngine, DownloadQueueFullError
+
+CONTENT = b'%PDF-1.4 test document'
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    """响应前等待一段时间的测试服务，记录同时处理的最大请求数"""
+    
+    protocol_version = 'HTTP/1.1'
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+    
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(0.1)
+        with cls.lock:
+            cls.active -= 1
+        
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(CONTENT)))
+        self.end_headers()
+        self.wfile.write(CONTENT)
+    
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def slow_server():
+    """启动测试服务"""
+    _SlowHandler.active = 0
+    _SlowHandler.max_active = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_per_origin_concurrency(slow_server, test_config: dict):
+    """
+    测试同一源站的并发下载数受源站限流器限制，所有下载完成后结果与同步下载一致
+    
+    Args:
+        slow_server: 测试服务
+        test_config: 测试配置
+    """
+    test_config['download'] = {'sniff': False, 'async_client': 'threads', 'per_origin_connections': 2,
+                               'async_threads': 8}
+    engine = AsyncDownloadEngine(test_config, FileDownloader(test_config))
+    base_url = f"http://127.0.0.1:{slow_server.server_port}"
+    results = []
+    try:
+        futures = [engine.submit(f"{base_url}/doc-{index}.pdf") for index in range(6)]
+        results = [future.result(timeout=10) for future in futures]
+        
+        assert _SlowHandler.max_active == 2
+        for result in results:
+            assert result['md5'] == hashlib.md5(CONTENT).hexdigest()
+            assert result['size'] == len(CONTENT)
+        
+        stats = engine.get_stats()
+        assert stats['completed'] == 6
+        assert stats['pending'] == 0
+        assert engine.downloader.limiter.get_stats()['in_flight'] == 0
+    finally:
+        engine.close()
+        for result in results:
+            FileDownloader(test_config).cleanup(result['path'])
+
+def test_pending_limit(slow_server, test_config: dict):
+    """
+    测试等待下载的URL数达到上限时拒绝新的下载
+    
+    Args:
+        slow_server: 测试服务
+        test_config: 测试配置
+    """
+    test_config['download'] = {'sniff': False, 'async_client': 'threads', 'async_max_pending': 1}
+    engine = AsyncDownloadEngine(test_config, FileDownloader(test_config))
+    url = f"http://127.0.0.1:{slow_server.server_port}/pending.pdf"
+    try:
+        future = engine.submit(url)
+        with pytest.raises(DownloadQueueFullError):
+            engine.submit(url)
+        
+        result = future.result(timeout=10)
+        assert engine.get_stats()['rejected'] == 1
+        FileDownloader(test_config).cleanup(result['path'])
+    finally:
+        engine.close()
+
+DOCX_CONTENT = b'PK\x03\x04' + b'word/document.xml' + b'x' * 200
+
+class _FileHandler(BaseHTTPRequestHandler):
+    """按路径返回不同内容的测试服务，/stream/ 下的响应不声明长度"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        name = self.path.rsplit('/', 1)[-1]
+        if name == 'missing.docx':
+            self._reply(404, b'')
+        elif name == 'image.docx':
+            self._reply(200, b'\x89PNG\r\n\x1a\n' + b'x' * 100)
+        else:
+            self._reply(200, DOCX_CONTENT, declare_length=not self.path.startswith('/stream/'))
+    
+    def _reply(self, status, body, declare_length=True):
+        self.send_response(status)
+        if declare_length:
+            self.send_header('Content-Length', str(len(body)))
+        else:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def file_server():
+    """启动测试服务"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def aiohttp_engine(test_config: dict):
+    """使用 aiohttp 客户端的下载引擎，失败记录用模拟对象代替"""
+    pytest.importorskip('aiohttp')
+    test_config['download'] = {'async_client': 'aiohttp', 'max_size': 100}
+    downloader = FileDownloader(test_config)
+    downloader.record_failure = MagicMock()
+    engine = AsyncDownloadEngine(test_config, downloader)
+    assert engine.use_aiohttp
+    yield engine
+    engine.close()
+
+def _download_files(engine: AsyncDownloadEngine) -> set:
+    return set(os.listdir(engine.downloader._get_download_dir()))
+
+def test_aiohttp_download(file_server, aiohttp_engine: AsyncDownloadEngine):
+    """
+    测试 aiohttp 下载成功，完成回调不在事件循环线程中执行
+    
+    Args:
+        file_server: 测试服务
+        aiohttp_engine: 下载引擎
+    """
+    aiohttp_engine.downloader.max_size = 0
+    future = aiohttp_engine.submit(f"http://127.0.0.1:{file_server.server_port}/files/report.docx")
+    callback_threads = []
+    done = threading.Event()
+    
+    def on_downloaded(finished):
+        callback_threads.append(threading.current_thread().name)
+        done.set()
+    
+    aiohttp_engine.add_done_callback(future, on_downloaded)
+    result = future.result(timeout=10)
+    try:
+        assert result['filename'] == 'report.docx'
+        assert result['size'] == len(DOCX_CONTENT)
+        assert result['md5'] == hashlib.md5(DOCX_CONTENT).hexdigest()
+        with open(result['path'], 'rb') as f:
+            assert f.read() == DOCX_CONTENT
+        
+        assert done.wait(timeout=5)
+        assert callback_threads[0].startswith('download-callback')
+        assert aiohttp_engine.get_stats()['client'] == 'aiohttp'
+    finally:
+        aiohttp_engine.downloader.cleanup(result['path'])
+
+@pytest.mark.parametrize('path, failure_class', [
+    ('/files/missing.docx', 'not_found'),
+    ('/files/image.docx', 'rejected'),
+    ('/stream/large.docx', 'rejected')
+])
+def test_aiohttp_download_failures(file_server, aiohttp_engine: AsyncDownloadEngine, path: str, failure_class: str):
+    """
+    测试 aiohttp 下载的响应状态失败、格式识别拒绝和超出大小上限，记录失败且不留下文件
+    
+    Args:
+        file_server: 测试服务
+        aiohttp_engine: 下载引擎
+        path: 请求路径
+        failure_class: 应记录的失败类型
+    """
+    before = _download_files(aiohttp_engine)
+    url = f"http://127.0.0.1:{file_server.server_port}{path}"
+    
+    assert aiohttp_engine.submit(url).result(timeout=10) is None
+    aiohttp_engine.downloader.record_failure.assert_called_once()
+    assert aiohttp_engine.downloader.record_failure.call_args[0][:2] == (url, failure_class)
+    assert _download_files(aiohttp_engine) == before
+    assert aiohttp_engine.get_stats()['failed'] == 1
\ No newline at end of file
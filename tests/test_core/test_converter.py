@@ -6,6 +6,7 @@ import os
 import pytest
 from unittest.mock import patch, MagicMock
 from file_preview.core.converter import FileConverter
+from file_preview.core.office_pool import OfficeWorkerError, OfficeTimeoutError, OfficeDocumentError
 
 def test_converter_init(test_config: dict):
     """
@@ -25,6 +26,9 @@ def test_converter_init(test_config: dict):
     
     # 验证目录已创建
     assert os.path.exists(converter.convert_dir)
+    
+    # 绝对路径的转换目录原样使用，转换结果不写到项目目录下
+    assert converter._get_convert_dir() == test_config['directories']['convert']
 
 @patch('subprocess.Popen')
 @patch('os.path.exists')
@@ -133,4 +137,199 @@ def test_convert_timeout(mock_popen: MagicMock, test_file: str, test_config: dic
     # 验证转换超时
     assert output_path is None
     assert mock_popen.call_count == test_config['conversion']['retry_times']
-    assert mock_process.kill.call_count == test_config['conversion']['retry_times'] 
\ No newline at end of file
+    assert mock_process.kill.call_count == test_config['conversion']['retry_times'] 
+
+@patch('subprocess.Popen')
+def test_convert_uses_profile_slot(mock_popen: MagicMock, test_file: str, test_config: dict):
+    """
+    测试单次进程转换使用独立的用户配置目录
+    
+    Args:
+        mock_popen: 模拟的 Popen
+        test_file: 测试文件路径
+        test_config: 测试配置
+    """
+    # 设置模拟返回值
+    mock_process = MagicMock()
+    mock_process.communicate.return_value = (b'', b'')
+    mock_process.returncode = 0
+    mock_popen.return_value = mock_process
+    
+    # 创建转换器
+    converter = FileConverter(test_config)
+    converter.pool = None
+    
+    # 转换文件
+    converter.convert(test_file)
+    
+    # 验证转换命令带有槽位配置目录
+    cmd = mock_popen.call_args[0][0]
+    profile_args = [arg for arg in cmd if arg.startswith('-env:UserInstallation=')]
+    assert len(profile_args) == 1
+    profile_path = profile_args[0].split('file://', 1)[1]
+    assert profile_path in converter.profile_slots.paths
+    assert os.path.isdir(profile_path)
+
+def _write(path: str, content: bytes) -> str:
+    """写入测试文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+def test_output_path_is_content_addressed(temp_dir: str, test_config: dict):
+    """
+    测试输出路径按文件内容生成，同名不同内容的文件不会共用结果
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    converter = FileConverter(test_config)
+    first = _write(os.path.join(temp_dir, 'a', 'report.docx'), b'first')
+    second = _write(os.path.join(temp_dir, 'b', 'report.docx'), b'second')
+    copy = _write(os.path.join(temp_dir, 'c', 'copy.docx'), b'first')
+    
+    first_output = converter.get_output_path(first, 'pdf')
+    assert first_output != converter.get_output_path(second, 'pdf')
+    assert first_output == converter.get_output_path(copy, 'pdf')
+    assert os.path.basename(first_output) == 'full.pdf'
+
+def test_convert_replaces_output_atomically(temp_dir: str, test_config: dict):
+    """
+    测试转换结果写入临时目录后替换到输出路径，不留下临时文件
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    converter = FileConverter(test_config)
+    input_path = _write(os.path.join(temp_dir, 'report.docx'), b'content')
+    
+    def fake_convert(source, target_path, target, timeout, filter_data=None):
+        assert os.path.basename(os.path.dirname(target_path)).startswith('.converting-')
+        _write(target_path, b'%PDF')
+    
+    converter.pool = MagicMock()
+    converter.pool.convert.side_effect = fake_convert
+    
+    output_path = converter.convert(input_path)
+    assert output_path == converter.get_output_path(input_path, 'pdf')
+    with open(output_path, 'rb') as f:
+        assert f.read() == b'%PDF'
+    assert os.listdir(os.path.dirname(output_path)) == ['full.pdf']
+    
+    # 已有结果时直接返回，不再转换
+    assert converter.convert(input_path) == output_path
+    assert converter.pool.convert.call_count == 1
+
+def test_convert_first_pages(temp_dir: str, test_config: dict):
+    """
+    测试快速预览只导出前几页，结果与完整转换分开存放
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    converter = FileConverter(test_config)
+    input_path = _write(os.path.join(temp_dir, 'slides.pptx'), b'slides')
+    
+    def fake_convert(source, target_path, target, timeout, filter_data=None):
+        _write(target_path, b'%PDF')
+    
+    converter.pool = MagicMock()
+    converter.pool.convert.side_effect = fake_convert
+    
+    output_path = converter.convert(input_path, pages=3)
+    assert os.path.basename(output_path) == 'first-3.pdf'
+    assert converter.pool.convert.call_args[0][4] == {'PageRange': '1-3'}
+    assert not os.path.exists(converter.get_output_path(input_path, 'pdf'))
+
+@patch('subprocess.Popen')
+def test_convert_first_pages_with_subprocess(mock_popen: MagicMock, temp_dir: str, test_config: dict):
+    """
+    测试单次进程转换通过过滤器选项指定页码范围
+    
+    Args:
+        mock_popen: 模拟的 Popen
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    mock_process = MagicMock()
+    mock_process.communicate.return_value = (b'', b'')
+    mock_process.returncode = 0
+    mock_popen.return_value = mock_process
+    
+    converter = FileConverter(test_config)
+    converter.pool = None
+    input_path = _write(os.path.join(temp_dir, 'slides.pptx'), b'slides')
+    converter.convert(input_path, pages=3)
+    
+    cmd = mock_popen.call_args[0][0]
+    convert_to = cmd[cmd.index('--convert-to') + 1]
+    assert convert_to == 'pdf:impress_pdf_Export:{"PageRange": {"type": "string", "value": "1-3"}}'
+
+def test_retry_policy_by_failure_class(temp_dir: str, test_config: dict):
+    """
+    测试按失败类型重试：文档错误不重试，超时只尝试一次，进程崩溃后重试
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    test_config['conversion']['retry_times'] = 3
+    test_config['conversion']['retry_backoff'] = 0
+    converter = FileConverter(test_config)
+    converter.pool = MagicMock()
+    input_path = _write(os.path.join(temp_dir, 'broken.docx'), b'broken')
+    
+    converter.pool.convert.side_effect = OfficeDocumentError("无法加载文档")
+    assert converter.convert(input_path) is None
+    assert converter.pool.convert.call_count == 1
+    assert converter.last_failure == ('bad_input', "无法加载文档")
+    
+    converter.pool.convert.reset_mock()
+    converter.pool.convert.side_effect = OfficeTimeoutError("转换超时")
+    assert converter.convert(input_path) is None
+    assert converter.pool.convert.call_count == 1
+    assert converter.last_failure[0] == 'timeout'
+    
+    def crash_once(source, target_path, target, timeout, filter_data=None):
+        if converter.pool.convert.call_count == 1:
+            raise OfficeWorkerError("工作进程已退出")
+        _write(target_path, b'%PDF')
+    
+    converter.pool.convert.reset_mock()
+    converter.pool.convert.side_effect = crash_once
+    assert converter.convert(input_path) == converter.get_output_path(input_path, 'pdf')
+    assert converter.pool.convert.call_count == 2
+    assert converter.last_failure is None
+    
+    stats = converter.get_stats()
+    assert stats['failures']['bad_input'] == 1
+    assert stats['failures']['timeout'] == 1
+    assert stats['failures']['crash'] == 1
+    assert stats['retries'] == 1
+
+@patch('subprocess.Popen')
+def test_subprocess_bad_input_not_retried(mock_popen: MagicMock, temp_dir: str, test_config: dict):
+    """
+    测试单次进程转换输出文档无法加载时不重试
+    
+    Args:
+        mock_popen: 模拟的 Popen
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    mock_process = MagicMock()
+    mock_process.communicate.return_value = (b'Error: source file could not be loaded', b'')
+    mock_process.returncode = 0
+    mock_popen.return_value = mock_process
+    
+    converter = FileConverter(test_config)
+    converter.pool = None
+    input_path = _write(os.path.join(temp_dir, 'broken.doc'), b'broken')
+    
+    assert converter.convert(input_path) is None
+    assert mock_popen.call_count == 1
+    assert converter.last_failure[0] == 'bad_input'
\ No newline at end of file
@@ -3,6 +3,7 @@
 """
 
 import os
+import hashlib
 import pytest
 from unittest.mock import patch, MagicMock
 from file_preview.core.downloader import FileDownloader
@@ -23,8 +24,11 @@ def test_downloader_init(test_config: dict):
     
     # 验证目录已创建
     assert os.path.exists(downloader.download_dir)
+    
+    # 绝对路径的下载目录原样使用，不放到项目目录下
+    assert downloader._get_download_dir() == test_config['directories']['download']
 
-@patch('requests.get')
+@patch('requests.Session.get')
 def test_download_success(mock_get: MagicMock, test_config: dict):
     """
     测试下载成功
@@ -58,7 +62,7 @@ def test_download_success(mock_get: MagicMock, test_config: dict):
         content = f.read()
     assert content == b'Test content'
 
-@patch('requests.get')
+@patch('requests.Session.get')
 def test_download_failure(mock_get: MagicMock, test_config: dict):
     """
     测试下载失败
@@ -83,7 +87,7 @@ def test_download_failure(mock_get: MagicMock, test_config: dict):
     mock_get.assert_called_once_with(url, timeout=test_config['performance']['download_timeout'], stream=True)
     assert output_path is None
 
-@patch('requests.get')
+@patch('requests.Session.get')
 def test_download_timeout(mock_get: MagicMock, test_config: dict):
     """
     测试下载超时
@@ -128,4 +132,124 @@ def test_cleanup(test_config: dict):
     downloader.cleanup(test_file)
     
     # 验证文件已删除
-    assert not os.path.exists(test_file) 
\ No newline at end of file
+    assert not os.path.exists(test_file)
+
+@patch('requests.Session.get')
+def test_fetch_computes_md5(mock_get: MagicMock, test_config: dict):
+    """
+    测试下载的同时计算内容MD5和大小，之后计算MD5时不再读取文件
+    
+    Args:
+        mock_get: 模拟的 requests.get
+        test_config: 测试配置
+    """
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.iter_content.return_value = [b'Test ', b'content']
+    mock_get.return_value = mock_response
+    
+    downloader = FileDownloader(test_config)
+    result = downloader.fetch('http://example.com/fetch.pdf')
+    
+    assert result['md5'] == hashlib.md5(b'Test content').hexdigest()
+    assert result['size'] == len(b'Test content')
+    
+    with patch('file_preview.core.hashing.compute_file_md5') as compute:
+        from file_preview.core.hashing import file_md5
+        assert file_md5(result['path']) == result['md5']
+        compute.assert_not_called()
+
+@patch('requests.Session.get')
+def test_fetch_rejects_unsupported_format(mock_get: MagicMock, test_config: dict):
+    """
+    测试根据文件开头识别出不支持的格式时中止下载，不留下文件
+    
+    Args:
+        mock_get: 模拟的 requests.Session.get
+        test_config: 测试配置
+    """
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.headers = {}
+    mock_response.iter_content.return_value = iter([b'\x89PNG\r\n\x1a\n....', b'more'])
+    mock_get.return_value = mock_response
+    
+    downloader = FileDownloader(test_config)
+    assert downloader.fetch('http://example.com/report.docx') is None
+    mock_response.close.assert_called_once()
+    
+    # 格式支持且文件名没有扩展名时补上识别出的扩展名
+    mock_response.iter_content.return_value = iter([b'PK\x03\x04....word/document.xml', b'more'])
+    result = downloader.fetch('http://example.com/files/12345')
+    assert result['filename'] == '12345.docx'
+    assert result['path'].endswith('.docx')
+
+@patch('requests.Session.get')
+def test_fetch_size_and_time_limits(mock_get: MagicMock, test_config: dict):
+    """
+    测试超出大小或时间上限时中止下载并删除已写入的部分
+    
+    Args:
+        mock_get: 模拟的 requests.Session.get
+        test_config: 测试配置
+    """
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.headers = {}
+    mock_get.return_value = mock_response
+    
+    test_config['download'] = {'max_size': 10}
+    downloader = FileDownloader(test_config)
+    
+    # 声明的大小超过上限时不读取内容
+    mock_response.headers = {'Content-Length': '11'}
+    assert downloader.fetch('http://example.com/large.docx') is None
+    mock_response.iter_content.assert_not_called()
+    
+    # 未声明大小时边下载边检查
+    mock_response.headers = {}
+    mock_response.iter_content.return_value = iter([b'123456', b'789012'])
+    with patch('file_preview.core.downloader.os.remove') as remove:
+        assert downloader.fetch('http://example.com/large.docx') is None
+    assert remove.call_args[0][0].endswith('.docx')
+    
+    # 超过时间上限
+    test_config['download'] = {'max_time': 5}
+    downloader = FileDownloader(test_config)
+    mock_response.iter_content.return_value = iter([b'123', b'456'])
+    with patch('file_preview.core.downloader.time.monotonic', side_effect=[0, 1, 10]):
+        assert downloader.fetch('http://example.com/slow.docx') is None
+
+@patch('requests.Session.get')
+def test_fetch_same_filename_uses_unique_paths(mock_get: MagicMock, test_config: dict):
+    """
+    测试不同URL的同名文件写入不同的临时文件，原始文件名作为元数据返回；内容为空时删除文件并记录失败
+    
+    Args:
+        mock_get: 模拟的 requests.Session.get
+        test_config: 测试配置
+    """
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.headers = {}
+    mock_get.return_value = mock_response
+    
+    test_config['download'] = {'sniff': False}
+    downloader = FileDownloader(test_config)
+    
+    mock_response.iter_content.return_value = iter([b'first'])
+    first = downloader.fetch('http://a.example/x/report.docx')
+    mock_response.iter_content.return_value = iter([b'second'])
+    second = downloader.fetch('http://b.example/y/report.docx')
+    
+    assert first['path'] != second['path']
+    assert first['filename'] == second['filename'] == 'report.docx'
+    with open(first['path'], 'rb') as f:
+        assert f.read() == b'first'
+    
+    downloader.record_failure = MagicMock()
+    mock_response.iter_content.return_value = iter([])
+    before = set(os.listdir(downloader._get_download_dir()))
+    assert downloader.fetch('http://c.example/empty.docx') is None
+    assert set(os.listdir(downloader._get_download_dir())) == before
+    downloader.record_failure.assert_called_once_with('http://c.example/empty.docx', 'empty', "下载的文件为空")
\ No newline at end of file
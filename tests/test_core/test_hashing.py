@@ -0,0 +1,81 @@
+"""
+文件内容摘要测试
+"""
+
+import io
+import os
+import hashlib
+from unittest.mock import patch
+from file_preview.core import hashing
+from file_preview.core.hashing import FileDigestCache, file_md5, compute_file_md5, save_chunks, iter_chunks
+
+def test_compute_file_md5(temp_dir: str):
+    """
+    测试分块计算的MD5与整体计算一致
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    file_path = os.path.join(temp_dir, 'large.bin')
+    content = os.urandom(3 * 1024 + 17)
+    with open(file_path, 'wb') as f:
+        f.write(content)
+    
+    assert compute_file_md5(file_path, chunk_size=1024) == hashlib.md5(content).hexdigest()
+
+def test_file_md5_memoized(temp_dir: str):
+    """
+    测试文件未变化时复用缓存结果，文件修改后重新计算
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    file_path = os.path.join(temp_dir, 'test.bin')
+    with open(file_path, 'wb') as f:
+        f.write(b'first')
+    
+    with patch.object(hashing, 'digest_cache', FileDigestCache()):
+        with patch.object(hashing, 'compute_file_md5', wraps=compute_file_md5) as compute:
+            assert file_md5(file_path) == hashlib.md5(b'first').hexdigest()
+            assert file_md5(file_path) == hashlib.md5(b'first').hexdigest()
+            assert compute.call_count == 1
+            
+            # 文件内容和大小变化后指纹不同，重新计算
+            with open(file_path, 'wb') as f:
+                f.write(b'second content')
+            assert file_md5(file_path) == hashlib.md5(b'second content').hexdigest()
+            assert compute.call_count == 2
+        
+        assert hashing.digest_cache.get_stats()['hits'] == 1
+
+def test_digest_cache_eviction():
+    """
+    测试超出容量时淘汰最久未使用的条目
+    """
+    cache = FileDigestCache(max_entries=2)
+    cache.put(('a', 1, 1, 1), 'digest-a')
+    cache.put(('b', 1, 1, 2), 'digest-b')
+    assert cache.get(('a', 1, 1, 1)) == 'digest-a'
+    
+    cache.put(('c', 1, 1, 3), 'digest-c')
+    assert cache.get(('b', 1, 1, 2)) is None
+    assert cache.get(('a', 1, 1, 1)) == 'digest-a'
+
+def test_save_chunks(temp_dir: str):
+    """
+    测试写入文件的同时计算MD5，并记录到摘要缓存
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    file_path = os.path.join(temp_dir, 'upload.bin')
+    content = os.urandom(10000)
+    
+    with patch.object(hashing, 'digest_cache', FileDigestCache()):
+        digest, size = save_chunks(iter_chunks(io.BytesIO(content), chunk_size=4096), file_path)
+        assert digest == hashlib.md5(content).hexdigest()
+        assert size == len(content)
+        
+        with patch.object(hashing, 'compute_file_md5') as compute:
+            assert file_md5(file_path) == digest
+            compute.assert_not_called()
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+HTTP连接池测试
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from file_preview.core.http_pool import HttpSessionPool
+
+class _Handler(BaseHTTPRequestHandler):
+    """支持长连接的测试服务"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        body = b'content'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'session=abc')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def test_connection_reuse(test_config: dict):
+    """
+    测试同一主机的请求复用连接，并统计命中和未命中次数
+    
+    Args:
+        test_config: 测试配置
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/file.pdf"
+    
+    pool = HttpSessionPool(test_config)
+    try:
+        for _ in range(3):
+            assert pool.get(url, timeout=5).content == b'content'
+        
+        # 其他线程使用独立的会话，但共享同一个连接池
+        thread = threading.Thread(target=lambda: pool.get(url, timeout=5).content)
+        thread.start()
+        thread.join()
+        
+        stats = pool.get_stats()
+        assert stats['requests'] == 4
+        assert stats['misses'] == 1
+        assert stats['hits'] == 3
+        
+        # 不保存服务端设置的 Cookie
+        assert len(pool.session.cookies) == 0
+    finally:
+        pool.close()
+        server.shutdown()
+        server.server_close()
+    
+    # 关闭后保留已淘汰连接池的计数
+    assert pool.get_stats()['requests'] == 4
\ No newline at end of file
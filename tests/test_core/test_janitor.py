@@ -0,0 +1,92 @@
+"""
+缓存清理任务测试
+"""
+
+import os
+import time
+from unittest.mock import patch
+from file_preview.core.cache import CacheManager
+from file_preview.core.janitor import CacheJanitor
+
+def test_cache_init_does_not_cleanup(test_config: dict):
+    """
+    测试创建缓存管理器时不再遍历清理缓存目录
+    
+    Args:
+        test_config: 测试配置
+    """
+    with patch('file_preview.core.cache.FileCacheBackend.cleanup') as cleanup:
+        CacheManager(test_config)
+        cleanup.assert_not_called()
+
+def test_run_once_removes_expired_files(test_config: dict):
+    """
+    测试执行一次清理会删除过期文件并记录统计信息
+    
+    Args:
+        test_config: 测试配置
+    """
+    cache_dir = test_config['directories']['cache']
+    os.makedirs(cache_dir, exist_ok=True)
+    expired_file = os.path.join(cache_dir, 'expired.bin')
+    with open(expired_file, 'wb') as f:
+        f.write(b'expired')
+    old_time = time.time() - (test_config['cache']['retention_days'] + 1) * 86400
+    os.utime(expired_file, (old_time, old_time))
+    
+    janitor = CacheJanitor(test_config, interval=0)
+    stats = janitor.run_once()
+    
+    assert not os.path.exists(expired_file)
+    assert stats['runs'] == 1
+    assert stats['last_error'] is None
+    assert stats['last_duration'] is not None
+
+def test_run_once_removes_stale_parts(test_config: dict):
+    """
+    测试清理时删除长时间未续传的 .part 文件和分段清单，保留最近更新的
+    
+    Args:
+        test_config: 测试配置
+    """
+    test_config['download'] = {'resume_max_age': 3600}
+    download_dir = test_config['directories']['download']
+    os.makedirs(download_dir, exist_ok=True)
+    
+    old_time = time.time() - 7200
+    stale = [os.path.join(download_dir, name) for name in ('stale.part', 'stale.part.json')]
+    fresh = os.path.join(download_dir, 'fresh.part')
+    other = os.path.join(download_dir, 'old.pdf')
+    for path in stale + [fresh, other]:
+        with open(path, 'wb') as f:
+            f.write(b'data')
+    for path in stale + [other]:
+        os.utime(path, (old_time, old_time))
+    
+    stats = CacheJanitor(test_config, interval=0).run_once()
+    
+    assert not any(os.path.exists(path) for path in stale)
+    assert os.path.exists(fresh)
+    assert os.path.exists(other)
+    assert stats['removed_parts'] == 2
+
+def test_start_and_stop(test_config: dict):
+    """
+    测试后台线程启动后立即清理一次，并能正常停止
+    
+    Args:
+        test_config: 测试配置
+    """
+    janitor = CacheJanitor(test_config, interval=60)
+    with patch.object(CacheManager, 'cleanup') as cleanup:
+        janitor.start()
+        try:
+            deadline = time.time() + 5
+            while janitor.runs == 0 and time.time() < deadline:
+                time.sleep(0.01)
+            assert janitor.is_running()
+            assert cleanup.call_count == 1
+        finally:
+            janitor.stop()
+    
+    assert not janitor.is_running()
\ No newline at end of file
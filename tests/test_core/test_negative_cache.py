@@ -0,0 +1,62 @@
+"""
+失败结果缓存测试
+"""
+
+from unittest.mock import patch, MagicMock
+from file_preview.core.cache import CacheManager
+from file_preview.core.downloader import FileDownloader
+from file_preview.core.negative_cache import NegativeCache, get_url_key
+
+def test_backoff_and_clear(test_config: dict):
+    """
+    测试连续失败时退避时间翻倍，成功后清除记录
+    
+    Args:
+        test_config: 测试配置
+    """
+    test_config['negative_cache'] = {'ttl': {'conversion': 100}, 'max_ttl': 300}
+    negative_cache = NegativeCache(test_config, CacheManager(test_config))
+    key = 'a' * 32
+    
+    assert negative_cache.get(key) is None
+    entry = negative_cache.record(key, 'conversion', '转换失败')
+    assert entry['retry_at'] - entry['failed_at'] == 100
+    assert negative_cache.record(key, 'conversion', '转换失败')['failures'] == 2
+    
+    entry = negative_cache.get(key)
+    assert entry['failure_class'] == 'conversion'
+    assert entry['error'] == '转换失败'
+    assert 199 <= entry['retry_after'] <= 200
+    
+    # 退避时间不超过上限
+    entry = negative_cache.record(key, 'conversion', '转换失败')
+    assert entry['retry_at'] - entry['failed_at'] == 300
+    
+    negative_cache.clear(key)
+    assert negative_cache.get(key) is None
+    assert negative_cache.record(key, 'conversion', '转换失败')['failures'] == 1
+
+@patch('requests.Session.get')
+def test_download_not_found_fails_fast(mock_get: MagicMock, test_config: dict):
+    """
+    测试URL返回404后，退避时间内再次下载不再发出请求
+    
+    Args:
+        mock_get: 模拟的 requests.Session.get
+        test_config: 测试配置
+    """
+    mock_response = MagicMock()
+    mock_response.status_code = 404
+    mock_get.return_value = mock_response
+    
+    negative_cache = NegativeCache(test_config, CacheManager(test_config))
+    downloader = FileDownloader(test_config, negative_cache=negative_cache)
+    url = 'http://example.com/missing.docx'
+    
+    assert downloader.fetch(url) is None
+    assert downloader.fetch(url) is None
+    assert mock_get.call_count == 1
+    
+    entry = negative_cache.get(get_url_key(url))
+    assert entry['failure_class'] == 'not_found'
+    assert '404' in entry['error']
\ No newline at end of file
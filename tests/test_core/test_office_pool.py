@@ -0,0 +1,179 @@
+"""
+LibreOffice 进程池测试
+"""
+
+import os
+import pytest
+from contextlib import contextmanager
+from unittest.mock import patch, MagicMock
+from file_preview.core.office_pool import (OfficePool, OfficeWorker, OfficeWorkerError, ProfileSlots, get_profile_dir,
+                                           get_instance_dir, release_instance_dirs)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+@contextmanager
+def _other_process(instance_dir):
+    """模拟其他服务进程占用实例目录，期间本进程释放已占用的实例目录"""
+    release_instance_dirs()
+    fd = os.open(os.path.join(instance_dir, '.lock'), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    try:
+        yield
+    finally:
+        release_instance_dirs()
+        os.close(fd)
+
+def _fake_start(worker):
+    """模拟启动工作进程"""
+    worker.process = MagicMock()
+    worker.process.poll.return_value = None
+    worker.desktop = MagicMock()
+    worker.jobs = 0
+
+def _fake_stop(worker):
+    """模拟关闭工作进程"""
+    if worker.process is not None:
+        worker.process.poll.return_value = 0
+    worker.desktop = None
+
+def _fake_convert(worker, input_path, output_path, target, timeout, filter_data=None):
+    """模拟转换成功"""
+    worker.jobs += 1
+
+def test_pool_init(test_config: dict):
+    """
+    测试进程池初始化
+    
+    Args:
+        test_config: 测试配置
+    """
+    pool = OfficePool(test_config)
+    
+    # 进程池大小来自 performance.worker_processes
+    assert pool.size == test_config['performance']['worker_processes']
+    assert len(pool.workers) == pool.size
+    
+    # 每个工作进程拥有独立的连接和配置目录，配置目录位于当前服务进程占用的实例目录下
+    assert len({worker.connection_string for worker in pool.workers}) == pool.size
+    assert len({worker.profile_path for worker in pool.workers}) == pool.size
+    for worker in pool.workers:
+        assert worker.profile_path.startswith(get_instance_dir(pool.profile_dir))
+        assert worker.profile_path.startswith(get_profile_dir(test_config))
+        assert f"_{os.getpid()}_" in worker.connection_string
+    
+    # 其他服务进程使用不同的管道和配置目录
+    worker = pool.workers[0]
+    connection_string, profile_path = worker.connection_string, worker.profile_path
+    with patch('file_preview.core.office_pool.os.getpid', return_value=os.getpid() + 1):
+        assert worker.connection_string != connection_string
+    if fcntl is not None:
+        with _other_process(os.path.dirname(profile_path)):
+            assert worker.profile_path != profile_path
+    
+    # 进程在首次使用前不会启动
+    assert not any(worker.is_alive() for worker in pool.workers)
+
+@patch.object(OfficeWorker, 'convert', _fake_convert)
+@patch.object(OfficeWorker, 'stop', _fake_stop)
+@patch.object(OfficeWorker, 'start', _fake_start)
+def test_pool_recycle_after_max_jobs(test_config: dict):
+    """
+    测试工作进程处理指定数量任务后被回收
+    
+    Args:
+        test_config: 测试配置
+    """
+    test_config['performance']['worker_processes'] = 1
+    test_config['conversion']['worker_max_jobs'] = 2
+    pool = OfficePool(test_config)
+    worker = pool.workers[0]
+    
+    pool.convert('a.docx', 'a.pdf', 'pdf', 10)
+    assert worker.is_alive()
+    
+    # 第二个任务后达到上限，进程被回收
+    pool.convert('b.docx', 'b.pdf', 'pdf', 10)
+    assert not worker.is_alive()
+    assert worker.restarts == 1
+    
+    # 下一个任务会重新启动进程
+    pool.convert('c.docx', 'c.pdf', 'pdf', 10)
+    assert worker.is_alive()
+    assert worker.jobs == 1
+    assert pool.get_stats()['total_jobs'] == 3
+
+@patch.object(OfficeWorker, 'kill', _fake_stop)
+@patch.object(OfficeWorker, 'start', _fake_start)
+def test_pool_crashed_worker(test_config: dict):
+    """
+    测试工作进程崩溃后被结束并在下次使用时重启
+    
+    Args:
+        test_config: 测试配置
+    """
+    test_config['performance']['worker_processes'] = 1
+    pool = OfficePool(test_config)
+    worker = pool.workers[0]
+    
+    with patch.object(OfficeWorker, 'convert', side_effect=OfficeWorkerError('crashed')):
+        with pytest.raises(OfficeWorkerError):
+            pool.convert('a.docx', 'a.pdf', 'pdf', 10)
+    
+    assert not worker.is_alive()
+    assert pool.get_stats()['failed_jobs'] == 1
+    
+    # 崩溃的工作进程已归还到进程池，下次使用时重新启动
+    with patch.object(OfficeWorker, 'convert', _fake_convert):
+        pool.convert('b.docx', 'b.pdf', 'pdf', 10)
+    assert worker.is_alive()
+    assert worker.restarts == 1
+
+def test_profile_slots(temp_dir: str):
+    """
+    测试并发槽位使用互不相同的配置目录并被复用
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    slots = ProfileSlots(os.path.join(temp_dir, 'slots'), 2)
+    assert all(path.startswith(get_instance_dir(os.path.join(temp_dir, 'slots'))) for path in slots.paths)
+    
+    with slots.acquire() as first:
+        with slots.acquire() as second:
+            # 并发占用的槽位配置目录不同
+            assert first != second
+            assert os.path.isdir(first) and os.path.isdir(second)
+            assert slots.get_stats()['idle'] == 0
+    
+    # 释放后槽位可以复用
+    assert slots.get_stats()['idle'] == 2
+    with slots.acquire() as path:
+        assert path in (first, second)
+    
+    # 进程退出后配置目录保留
+    release_instance_dirs()
+    assert os.path.isdir(first)
+
+def test_instance_dir_reused_after_restart(temp_dir: str):
+    """
+    测试实例目录在进程间互斥，进程退出后由重启的进程复用
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    pytest.importorskip('fcntl')
+    root_dir = os.path.join(temp_dir, 'pool')
+    
+    first = get_instance_dir(root_dir)
+    assert get_instance_dir(root_dir) == first
+    
+    # 实例目录被其他服务进程占用时，占用另一个实例目录
+    with _other_process(first):
+        assert get_instance_dir(root_dir) != first
+    
+    # 占用的进程退出后，重启的进程复用同一个实例目录
+    assert get_instance_dir(root_dir) == first
+    release_instance_dirs()
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+源站限流测试
+"""
+
+import time
+import asyncio
+import threading
+import pytest
+from file_preview.core.origin_limiter import OriginLimiter, TokenBucket, get_origin
+
+def _wait_for(condition, timeout: float = 5) -> None:
+    """等待条件成立"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_fair_dispatch_across_origins():
+    """
+    测试总连接数已满时，等待的下载按源站轮流放行，而不是按到达顺序
+    """
+    limiter = OriginLimiter({'download': {'max_connections': 1, 'per_origin_connections': 0}})
+    first = limiter.acquire('http://a.example/0')
+    order = []
+    
+    def download(url):
+        with limiter.acquire(url):
+            order.append(get_origin(url))
+    
+    threads = []
+    for url in ['http://a.example/1', 'http://a.example/2', 'http://a.example/3', 'http://b.example/1']:
+        thread = threading.Thread(target=download, args=(url,))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: limiter.get_stats()['waiting'] == len(threads))
+    
+    first.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    
+    assert order == ['http://a.example:80', 'http://b.example:80', 'http://a.example:80', 'http://a.example:80']
+    assert limiter.get_stats()['in_flight'] == 0
+
+def test_per_origin_connections():
+    """
+    测试单个源站达到连接上限时只有该源站等待，事件循环中的等待不阻塞线程
+    """
+    limiter = OriginLimiter({'download': {'max_connections': 0, 'per_origin_connections': 1}})
+    slot = limiter.acquire('https://slow.example/a.docx')
+    with limiter.acquire('https://fast.example/b.docx'):
+        stats = limiter.get_stats()
+        assert stats['origins']['https://slow.example:443']['in_flight'] == 1
+        assert stats['origins']['https://fast.example:443']['in_flight'] == 1
+    
+    async def acquire_later():
+        pending = asyncio.ensure_future(limiter.acquire_async('https://slow.example/c.docx'))
+        await asyncio.sleep(0.05)
+        assert not pending.done()
+        slot.release()
+        return await asyncio.wait_for(pending, timeout=5)
+    
+    second = asyncio.run(acquire_later())
+    assert limiter.get_stats()['origins']['https://slow.example:443']['in_flight'] == 1
+    second.release()
+    assert limiter.get_stats()['in_flight'] == 0
+
+def test_token_bucket():
+    """
+    测试令牌桶允许一秒的突发，超出部分换算为等待时间
+    """
+    bucket = TokenBucket(1000)
+    assert bucket.reserve(1000) == 0
+    assert bucket.reserve(500) == pytest.approx(0.5, abs=0.05)
+    
+    limiter = OriginLimiter({'download': {'per_origin_bandwidth': 100}})
+    assert limiter.throttle('http://a.example/x', 100) == 0
+    assert limiter.throttle('http://a.example/x', 100) > 0.9
+    assert limiter.throttle('http://b.example/x', 100) == 0
+    assert limiter.get_stats()['origins']['http://a.example:80']['bytes'] == 200
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+PDF后处理工具测试
+"""
+
+import os
+import stat
+from unittest.mock import patch
+from file_preview.core import pdf_tools
+from file_preview.core.pdf_tools import PdfLinearizer
+
+def _write_fake_qpdf(temp_dir: str, exit_code: int) -> str:
+    """创建模拟的 qpdf 脚本，在输出文件前加上标记"""
+    script_path = os.path.join(temp_dir, 'qpdf')
+    with open(script_path, 'w') as f:
+        f.write(f'#!/bin/sh\n(echo linearized; cat "$2") > "$3"\nexit {exit_code}\n')
+    os.chmod(script_path, os.stat(script_path).st_mode | stat.S_IEXEC)
+    return script_path
+
+def test_linearize_disabled(temp_dir: str, test_config: dict):
+    """
+    测试未启用时不处理文件
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    pdf_path = os.path.join(temp_dir, 'test.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(b'%PDF')
+    
+    assert PdfLinearizer(test_config).linearize(pdf_path) is False
+
+@patch.object(pdf_tools, 'PIKEPDF_AVAILABLE', False)
+def test_linearize_with_qpdf(temp_dir: str, test_config: dict):
+    """
+    测试使用 qpdf 原地替换PDF，失败时保留原文件
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    pdf_path = os.path.join(temp_dir, 'test.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(b'%PDF\n')
+    
+    test_config['conversion']['pdf_linearize'] = True
+    test_config['conversion']['qpdf_path'] = _write_fake_qpdf(temp_dir, 0)
+    assert PdfLinearizer(test_config).linearize(pdf_path) is True
+    with open(pdf_path, 'rb') as f:
+        assert f.read() == b'linearized\n%PDF\n'
+    
+    test_config['conversion']['qpdf_path'] = _write_fake_qpdf(temp_dir, 2)
+    assert PdfLinearizer(test_config).linearize(pdf_path) is False
+    with open(pdf_path, 'rb') as f:
+        assert f.read() == b'linearized\n%PDF\n'
+    assert not os.path.exists(f"{pdf_path}.linearized")
\ No newline at end of file
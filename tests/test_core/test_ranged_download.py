@@ -0,0 +1,152 @@
+"""
+分段并行下载测试
+"""
+
+import os
+import hashlib
+import threading
+from unittest.mock import patch, MagicMock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from file_preview.core.downloader import FileDownloader
+
+CONTENT = bytes(range(256)) * 4
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """支持 Range 请求的测试服务，fail_from 之后的分段返回错误"""
+    
+    protocol_version = 'HTTP/1.1'
+    ranges = []
+    fail_from = None
+    etag = '"v1"'
+    
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        if not range_header:
+            self._reply(200, CONTENT)
+            return
+        
+        start, end = (int(value) for value in range_header.split('=')[1].split('-'))
+        type(self).ranges.append((start, end))
+        if self.fail_from is not None and start >= self.fail_from:
+            self._reply(503, b'')
+            return
+        self._reply(206, CONTENT[start:end + 1], {'Content-Range': f"bytes {start}-{end}/{len(CONTENT)}"})
+    
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def range_server():
+    """启动支持 Range 请求的测试服务"""
+    _RangeHandler.ranges = []
+    _RangeHandler.fail_from = None
+    _RangeHandler.etag = '"v1"'
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_parallel_download_with_resume(range_server, test_config: dict):
+    """
+    测试大文件分段并行下载，中断后只下载未完成的分段
+    
+    Args:
+        range_server: 测试服务
+        test_config: 测试配置
+    """
+    test_config['download'] = {'parallel_min_size': 512, 'chunk_size': 256, 'parallel_connections': 2,
+                               'range_retries': 0}
+    downloader = FileDownloader(test_config)
+    url = f"http://127.0.0.1:{range_server.server_port}/large.pdf"
+    
+    # 后两个分段失败，保留 .part 文件和清单
+    _RangeHandler.fail_from = 512
+    assert downloader.fetch(url) is None
+    
+    # 再次下载时只请求未完成的分段
+    _RangeHandler.fail_from = None
+    _RangeHandler.ranges = []
+    with patch('file_preview.core.hashing.compute_file_md5') as compute:
+        result = downloader.fetch(url)
+    
+    # MD5在分段完成时计算，不再重新读取整个文件
+    compute.assert_not_called()
+    assert sorted(_RangeHandler.ranges) == [(512, 767), (768, 1023)]
+    assert result['size'] == len(CONTENT)
+    assert result['md5'] == hashlib.md5(CONTENT).hexdigest()
+    with open(result['path'], 'rb') as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(f"{result['path']}.part")
+    assert not os.path.exists(f"{result['path']}.part.json")
+
+def test_no_resume_without_validator(range_server, test_config: dict):
+    """
+    测试响应没有 ETag/Last-Modified 时不保留已下载的部分，再次下载时重新下载所有分段
+    
+    Args:
+        range_server: 测试服务
+        test_config: 测试配置
+    """
+    test_config['download'] = {'parallel_min_size': 512, 'chunk_size': 256, 'parallel_connections': 2,
+                               'range_retries': 0}
+    downloader = FileDownloader(test_config)
+    url = f"http://127.0.0.1:{range_server.server_port}/unversioned.pdf"
+    _RangeHandler.etag = None
+    
+    _RangeHandler.fail_from = 512
+    assert downloader.fetch(url) is None
+    assert not os.path.exists(f"{downloader.get_resume_path(url)}.part")
+    assert not os.path.exists(f"{downloader.get_resume_path(url)}.part.json")
+    
+    _RangeHandler.fail_from = None
+    _RangeHandler.ranges = []
+    result = downloader.fetch(url)
+    assert sorted(_RangeHandler.ranges) == [(0, 255), (256, 511), (512, 767), (768, 1023)]
+    assert result['md5'] == hashlib.md5(CONTENT).hexdigest()
+
+def test_small_file_streams_serially(range_server, test_config: dict):
+    """
+    测试小于阈值的文件不使用分段下载
+    
+    Args:
+        range_server: 测试服务
+        test_config: 测试配置
+    """
+    test_config['download'] = {'parallel_min_size': 4096}
+    downloader = FileDownloader(test_config)
+    result = downloader.fetch(f"http://127.0.0.1:{range_server.server_port}/small.pdf")
+    
+    assert result['md5'] == hashlib.md5(CONTENT).hexdigest()
+    assert _RangeHandler.ranges == []
+
+def test_parallel_download_over_time_limit(range_server, test_config: dict):
+    """
+    测试分段下载超过时间上限时中止，不保留断点续传文件并记录失败
+    
+    Args:
+        range_server: 测试服务
+        test_config: 测试配置
+    """
+    test_config['download'] = {'parallel_min_size': 512, 'chunk_size': 256, 'parallel_connections': 2}
+    downloader = FileDownloader(test_config)
+    downloader.record_failure = MagicMock()
+    downloader.get_deadline = lambda: 0
+    url = f"http://127.0.0.1:{range_server.server_port}/slow.pdf"
+    
+    assert downloader.fetch(url) is None
+    assert downloader.record_failure.call_args[0][:2] == (url, 'rejected')
+    assert not os.path.exists(f"{downloader.get_resume_path(url)}.part")
+    assert not os.path.exists(f"{downloader.get_resume_path(url)}.part.json")
\ No newline at end of file
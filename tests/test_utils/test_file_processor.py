@@ -0,0 +1,54 @@
+"""
+文件处理器测试
+"""
+
+import os
+from unittest.mock import patch, MagicMock
+from file_preview.utils.file_processor import FileProcessor
+
+def test_quick_preview_replaced_by_full(temp_dir: str, test_config: dict):
+    """
+    测试大文档先返回前几页，完整转换完成后替换同一文件ID的结果
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    test_config['conversion'].update({'quick_preview_pages': 2, 'quick_preview_min_size': 0})
+    test_config['thumbnails'] = {'enabled': False}
+    input_path = os.path.join(temp_dir, 'report.docx')
+    with open(input_path, 'wb') as f:
+        f.write(b'slides')
+    
+    processor = FileProcessor(test_config)
+    
+    def fake_convert(source, target_path, target, timeout, filter_data=None):
+        with open(target_path, 'wb') as f:
+            f.write(b'%PDF first' if filter_data else b'%PDF full')
+    
+    processor.converter.pool = MagicMock()
+    processor.converter.pool.convert.side_effect = fake_convert
+    
+    # 后台任务延后执行，先确认返回的是快速预览结果
+    scheduler = MagicMock()
+    with patch('file_preview.utils.file_processor.get_scheduler', return_value=scheduler):
+        response = processor.process_file(input_path, original_name='report.docx')
+    
+    assert response['status'] == 'success'
+    assert response['converted_file_info']['partial'] is True
+    assert os.path.basename(response['output_path']) == 'first-2.pdf'
+    file_id = response['file_id']
+    assert processor.file_mapping.is_partial(file_id)
+    
+    # 原始文件被删除后，后台任务仍可使用副本完成转换
+    task_function = scheduler.submit.call_args[0][0]
+    task_args = scheduler.submit.call_args[1]['args']
+    os.remove(input_path)
+    full_path = task_function(*task_args)
+    
+    assert os.path.basename(full_path) == 'full.pdf'
+    assert not os.path.exists(task_args[0])
+    file_info = processor.file_mapping.get_file_info(file_id)
+    assert file_info['path'] == full_path
+    assert file_info['converted_info']['path'] == full_path
+    assert not processor.file_mapping.is_partial(file_id)
\ No newline at end of file
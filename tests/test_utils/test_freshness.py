@@ -0,0 +1,101 @@
+"""
+URL转换结果新鲜度检查测试
+"""
+
+import os
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from file_preview.utils.services import get_services
+from file_preview.utils.freshness import is_url_result_fresh
+
+class _ConditionalHandler(BaseHTTPRequestHandler):
+    """支持 If-None-Match 的测试服务"""
+    
+    protocol_version = 'HTTP/1.1'
+    etag = '"v1"'
+    requests = 0
+    
+    def do_GET(self):
+        type(self).requests += 1
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+            return
+        body = b'content'
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def test_revalidate_url_result(temp_dir: str, test_config: dict):
+    """
+    测试有效期内直接使用，过期后未变化时刷新验证时间，远程文件变化后需要重新转换
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ConditionalHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/report.pdf"
+    
+    test_config['download'] = {'revalidate_after': 60}
+    file_mapping = get_services(test_config).file_mapping
+    result_path = os.path.join(temp_dir, 'report.pdf')
+    with open(result_path, 'wb') as f:
+        f.write(b'%PDF')
+    file_id = file_mapping.add('url-md5', result_path, 'report.pdf')
+    
+    def download_info(age):
+        return {'url': url, 'download_time': time.time() - age, 'validators': {'etag': '"v1"'}}
+    
+    try:
+        # 有效期内不发送请求
+        file_mapping.update_download_info(file_id, download_info(10))
+        assert is_url_result_fresh(file_id, file_mapping.get_file_info(file_id), test_config)
+        assert _ConditionalHandler.requests == 0
+        
+        # 过期后条件请求返回304，刷新验证时间
+        file_mapping.update_download_info(file_id, download_info(120))
+        assert is_url_result_fresh(file_id, file_mapping.get_file_info(file_id), test_config)
+        assert _ConditionalHandler.requests == 1
+        assert is_url_result_fresh(file_id, file_mapping.get_file_info(file_id), test_config)
+        assert _ConditionalHandler.requests == 1
+        
+        # 远程文件变化
+        _ConditionalHandler.etag = '"v2"'
+        file_mapping.update_download_info(file_id, download_info(120))
+        assert not is_url_result_fresh(file_id, file_mapping.get_file_info(file_id), test_config)
+    finally:
+        server.shutdown()
+        server.server_close()
+def test_refreshed_result_gets_new_file_id(temp_dir: str, test_config: dict):
+    """
+    测试重新转换得到不同内容时分配新的文件ID，旧ID仍指向旧的结果
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    file_mapping = get_services(test_config).file_mapping
+    paths = []
+    for name, content in (('v1.pdf', b'%PDF v1'), ('v2.pdf', b'%PDF v2'), ('copy.pdf', b'%PDF v2')):
+        paths.append(os.path.join(temp_dir, name))
+        with open(paths[-1], 'wb') as f:
+            f.write(content)
+    
+    old_id = file_mapping.add('refreshed-url-md5', paths[0], 'report.pdf')
+    new_id = file_mapping.add('refreshed-url-md5', paths[1], 'report.pdf')
+    assert new_id != old_id
+    assert file_mapping.get_by_id(old_id)[0] == paths[0]
+    assert file_mapping.get_by_id(new_id)[0] == paths[1]
+    assert file_mapping.get_id_by_md5('refreshed-url-md5') == new_id
+    
+    # 内容相同的文件不分配新ID
+    assert file_mapping.add('refreshed-url-md5', paths[2], 'report.pdf') == new_id
\ No newline at end of file
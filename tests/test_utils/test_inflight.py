@@ -0,0 +1,87 @@
+"""
+进行中任务登记测试
+"""
+
+import threading
+import pytest
+from file_preview.utils.inflight import InflightRegistry, get_inflight_key
+
+def test_inflight_key():
+    """
+    测试登记键按URL、文件内容、文件ID的优先级生成
+    """
+    assert get_inflight_key(url_md5='a', file_md5='b') == 'url:a'
+    assert get_inflight_key(file_md5='b', file_id='c') == 'file:b'
+    assert get_inflight_key(file_id='c') == 'id:c'
+    assert get_inflight_key() is None
+
+def test_claim_and_release():
+    """
+    测试后到的请求复用进行中的任务，任务结束后重新登记
+    """
+    registry = InflightRegistry()
+    
+    assert registry.claim('url:a', 'task-1') is None
+    assert registry.claim('url:a', 'task-2') == 'task-1'
+    
+    # 非登记者不能解除登记
+    registry.release('url:a', 'task-2')
+    assert registry.claim('url:a', 'task-3') == 'task-1'
+    
+    # 包装的任务执行结束后自动解除登记
+    registry.bind('url:a', 'task-1', lambda: None)()
+    assert registry.claim('url:a', 'task-4') is None
+    
+    stats = registry.get_stats()
+    assert stats['leaders'] == 2
+    assert stats['joined'] == 2
+
+def test_call_shares_result():
+    """
+    测试并发的同步调用只执行一次并共享结果
+    """
+    registry = InflightRegistry()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+    
+    def process():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'status': 'success'}
+    
+    leader = threading.Thread(target=lambda: results.append(registry.call('file:a', process)))
+    leader.start()
+    assert started.wait(5)
+    
+    follower = threading.Thread(target=lambda: results.append(registry.call('file:a', process)))
+    follower.start()
+    
+    # 等待后到的调用进入等待状态
+    while registry.get_stats()['joined'] == 0:
+        threading.Event().wait(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    
+    assert len(calls) == 1
+    assert results == [{'status': 'success'}, {'status': 'success'}]
+    
+    # 调用结束后同一键可以再次执行
+    registry.call('file:a', lambda: None)
+    assert registry.get_stats()['inflight'] == 0
+
+def test_call_propagates_error():
+    """
+    测试处理失败时异常传递给调用方
+    """
+    registry = InflightRegistry()
+    
+    def fail():
+        raise ValueError('转换失败')
+    
+    with pytest.raises(ValueError):
+        registry.call('file:a', fail)
+    assert registry.get_stats()['inflight'] == 0
\ No newline at end of file
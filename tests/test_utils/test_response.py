@@ -0,0 +1,91 @@
+"""
+响应工具测试
+"""
+
+import os
+import hashlib
+from flask import Flask
+from file_preview.utils.response import generate_file_response
+
+def _create_app(file_path: str) -> Flask:
+    """创建只包含文件下载路由的测试应用"""
+    app = Flask(__name__)
+    app.config['CONFIG'] = {'server': {'artifact_max_age': 600}}
+    
+    @app.route('/artifact')
+    def artifact():
+        return generate_file_response(file_path, cacheable=True, mimetype='application/pdf')
+    
+    @app.route('/original')
+    def original():
+        return generate_file_response(file_path, mimetype='application/pdf')
+    
+    return app
+
+def test_etag_and_conditional_get(temp_dir: str):
+    """
+    测试 ETag 使用内容MD5，带 If-None-Match 时返回304
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    file_path = os.path.join(temp_dir, 'test.pdf')
+    content = b'%PDF-1.4 test content'
+    with open(file_path, 'wb') as f:
+        f.write(content)
+    
+    client = _create_app(file_path).test_client()
+    digest = hashlib.md5(content).hexdigest()
+    response = client.get(f'/artifact?v={digest}')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{digest}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=600' in response.headers['Cache-Control']
+    response.close()
+    
+    response = client.get('/artifact', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    response.close()
+    
+    response = client.get('/original')
+    assert 'no-cache' in response.headers['Cache-Control']
+    response.close()
+
+def test_unversioned_artifact_revalidates(temp_dir: str):
+    """
+    测试不带内容版本参数或版本不一致时，转换结果每次通过 ETag 验证
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    file_path = os.path.join(temp_dir, 'test.pdf')
+    with open(file_path, 'wb') as f:
+        f.write(b'%PDF-1.4 test content')
+    
+    client = _create_app(file_path).test_client()
+    for url in ('/artifact', '/artifact?v=outdated'):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert 'no-cache' in response.headers['Cache-Control']
+        assert 'immutable' not in response.headers['Cache-Control']
+        assert 'ETag' in response.headers
+        response.close()
+
+def test_range_request(temp_dir: str):
+    """
+    测试 Range 请求返回206和对应的字节范围
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    file_path = os.path.join(temp_dir, 'test.pdf')
+    with open(file_path, 'wb') as f:
+        f.write(b'0123456789')
+    
+    client = _create_app(file_path).test_client()
+    response = client.get('/artifact', headers={'Range': 'bytes=2-5'})
+    assert response.status_code == 206
+    assert response.data == b'2345'
+    assert response.headers['Content-Range'] == 'bytes 2-5/10'
+    response.close()
\ No newline at end of file
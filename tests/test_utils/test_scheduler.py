@@ -0,0 +1,147 @@
+"""
+后台任务调度器测试
+"""
+
+import threading
+import pytest
+from file_preview.utils.scheduler import TaskScheduler, TaskQueueFullError
+from file_preview.utils import tasks
+from file_preview.utils.tasks import schedule_task, set_task, conversion_tasks, get_queue_info
+
+def test_scheduler_runs_tasks():
+    """
+    测试任务在工作线程中执行并记录等待时间
+    """
+    scheduler = TaskScheduler(max_workers=2, max_queue_size=10)
+    done = threading.Event()
+    waits = []
+    
+    scheduler.submit(done.set, on_start=waits.append)
+    assert done.wait(5)
+    
+    assert len(waits) == 1 and waits[0] >= 0
+    scheduler.shutdown()
+
+def test_scheduler_rejects_when_full():
+    """
+    测试队列满时拒绝新任务并给出重试时间
+    """
+    scheduler = TaskScheduler(max_workers=1, max_queue_size=1)
+    started = threading.Event()
+    release = threading.Event()
+    
+    def blocking_task():
+        started.set()
+        release.wait(5)
+    
+    # 第一个任务占用工作线程，第二个任务占满队列
+    scheduler.submit(blocking_task)
+    assert started.wait(5)
+    queued = scheduler.submit(blocking_task)
+    assert queued.position == 1
+    
+    with pytest.raises(TaskQueueFullError) as excinfo:
+        scheduler.submit(blocking_task)
+    assert excinfo.value.retry_after >= 1
+    
+    stats = scheduler.get_stats()
+    assert stats['running'] == 1
+    assert stats['queue_depth'] == 1
+    assert stats['rejected'] == 1
+    
+    release.set()
+    scheduler.shutdown()
+
+def test_scheduler_position_advances():
+    """
+    测试排队位置随前面的任务开始执行而前移
+    """
+    scheduler = TaskScheduler(max_workers=1, max_queue_size=10)
+    started = threading.Event()
+    release = threading.Event()
+    
+    def blocking_task():
+        started.set()
+        release.wait(5)
+    
+    running = scheduler.submit(blocking_task)
+    assert started.wait(5)
+    first = scheduler.submit(blocking_task)
+    second = scheduler.submit(blocking_task)
+    assert scheduler.position(running) == 0
+    assert (scheduler.position(first), scheduler.position(second)) == (1, 2)
+    
+    # 第一个任务结束后，排在第二的任务前移
+    started.clear()
+    release.set()
+    assert started.wait(5)
+    assert scheduler.position(second) <= 1
+    scheduler.shutdown()
+
+def test_queue_info_is_live(monkeypatch):
+    """
+    测试读取状态时计算当前排队位置，而不是提交时记录的位置
+    """
+    scheduler = TaskScheduler(max_workers=1, max_queue_size=10)
+    monkeypatch.setattr(tasks, 'get_scheduler', lambda: scheduler)
+    started = threading.Event()
+    release = threading.Event()
+    
+    def blocking_task():
+        started.set()
+        release.wait(5)
+    
+    set_task('blocking-task', {'status': 'pending'})
+    schedule_task('blocking-task', blocking_task)
+    assert started.wait(5)
+    set_task('queued-task', {'status': 'pending'})
+    schedule_task('queued-task', lambda: None)
+    
+    queued_status = conversion_tasks.get('queued-task')
+    assert 'queue_position' not in queued_status
+    assert get_queue_info('queued-task', queued_status) == {'queue_position': 1}
+    assert get_queue_info('blocking-task', conversion_tasks.get('blocking-task')) == {}
+    
+    # 其他进程调度的任务只能给出本进程的排队任务数
+    assert get_queue_info('other-task', {'status': 'pending', 'queued_at': 0}) == {'queue_depth': 1}
+    
+    release.set()
+    scheduler.shutdown()
+    conversion_tasks.delete('blocking-task')
+    conversion_tasks.delete('queued-task')
+
+def test_schedule_task_records_queue_info(monkeypatch):
+    """
+    测试任务状态中记录排队信息，并在状态整体更新后保留
+    """
+    scheduler = TaskScheduler(max_workers=1, max_queue_size=10)
+    monkeypatch.setattr(tasks, 'get_scheduler', lambda: scheduler)
+    done = threading.Event()
+    
+    def task(task_id):
+        set_task(task_id, {'status': 'completed'})
+        done.set()
+    
+    set_task('scheduled-task', {'status': 'pending'})
+    schedule_task('scheduled-task', task, 'scheduled-task')
+    assert done.wait(5)
+    scheduler.shutdown()
+    
+    task_status = conversion_tasks.get('scheduled-task')
+    conversion_tasks.delete('scheduled-task')
+    assert task_status['status'] == 'completed'
+    assert 'queued_at' in task_status
+    assert 'wait_time' in task_status
+
+def test_schedule_task_queue_full(monkeypatch):
+    """
+    测试队列满时移除任务记录并抛出异常
+    """
+    scheduler = TaskScheduler(max_workers=1, max_queue_size=1)
+    scheduler.shutdown()
+    monkeypatch.setattr(tasks, 'get_scheduler', lambda: scheduler)
+    
+    set_task('rejected-task', {'status': 'pending'})
+    with pytest.raises(TaskQueueFullError):
+        schedule_task('rejected-task', lambda: None)
+    assert 'rejected-task' not in conversion_tasks
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+共享服务测试
+"""
+
+import os
+import threading
+from file_preview.utils.services import get_services
+from file_preview.utils.file_processor import FileProcessor
+
+def test_get_services_reuses_instances(test_config: dict):
+    """
+    测试同一份配置始终返回同一组服务，处理器复用共享服务
+    
+    Args:
+        test_config: 测试配置
+    """
+    services = get_services(test_config)
+    assert get_services(test_config) is services
+    assert services.file_mapping.cache_manager is services.cache_manager
+    
+    processor = FileProcessor(test_config)
+    assert processor.file_mapping is services.file_mapping
+    assert processor.converter is services.converter
+    
+    # 内容相同但不是同一个配置对象时创建新的服务
+    assert get_services(dict(test_config)) is not services
+
+def test_concurrent_add_same_md5(test_config: dict, temp_dir: str):
+    """
+    测试多个线程同时添加同一文件时只生成一个文件ID
+    
+    Args:
+        test_config: 测试配置
+        temp_dir: 临时目录路径
+    """
+    file_path = os.path.join(temp_dir, 'test.txt')
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('content')
+    
+    file_mapping = get_services(test_config).file_mapping
+    results = []
+    
+    def add():
+        results.append(file_mapping.add('same-md5', file_path, 'test.txt'))
+    
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(set(results)) == 1
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+工作表数据测试
+"""
+
+import os
+import pytest
+from file_preview.utils.sheets import (SheetNotFoundError, parse_range, write_sheet_store, open_sheet_store,
+                                       build_sheet_store)
+
+def _build_workbook(temp_dir: str):
+    """生成 2 行的测试xlsx（第2行带样式）并转换为工作表存储"""
+    openpyxl = pytest.importorskip('openpyxl')
+    from openpyxl.styles import Font
+    
+    file_path = os.path.join(temp_dir, 'test.xlsx')
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Sheet1'
+    worksheet.append(['a', 'b'])
+    worksheet.append([1, None, 3])
+    worksheet['A2'].font = Font(bold=True)
+    worksheet['C2'].font = Font(bold=True)
+    workbook.save(file_path)
+    
+    store_path = build_sheet_store(file_path, os.path.join(temp_dir, 'sheets.store'))
+    return open_sheet_store(store_path)
+
+def test_sheet_window(temp_dir: str):
+    """
+    测试按行列窗口返回单元格，并只返回窗口内用到的样式
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    sheet = _build_workbook(temp_dir).get_sheet('Sheet1')
+    assert sheet.info() == {'name': 'Sheet1', 'max_row': 2, 'max_col': 3}
+    
+    window = sheet.window(0, 199, 1, 49)
+    assert window['rows'] == [0, 1]
+    assert window['cols'] == [1, 2]
+    assert window['cells'] == [['b', None], [None, 3]]
+    bold_id = window['style_ids'][1][1]
+    assert window['style_ids'] == [[0, 0], [0, bold_id]]
+    assert window['styles'] == {str(bold_id): {'bold': True}}
+    
+    assert sheet.window(0, 0, 0, 0)['styles'] == {}
+
+def test_workbook_get_sheet(temp_dir: str):
+    """
+    测试按名称或序号获取工作表
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    workbook = _build_workbook(temp_dir)
+    assert workbook.get_sheet('Sheet1').name == 'Sheet1'
+    assert workbook.get_sheet('0').name == 'Sheet1'
+    with pytest.raises(SheetNotFoundError):
+        workbook.get_sheet('1')
+
+def test_parse_range():
+    """
+    测试解析行列范围参数
+    """
+    assert parse_range(None, (0, 199), 1000) == (0, 199)
+    assert parse_range('10-19', (0, 199), 1000) == (10, 19)
+    assert parse_range('5', (0, 199), 1000) == (5, 5)
+    assert parse_range('0-5000', (0, 199), 1000) == (0, 999)
+    with pytest.raises(ValueError):
+        parse_range('9-1', (0, 199), 1000)
+    with pytest.raises(ValueError):
+        parse_range('a-b', (0, 199), 1000)
+
+def test_sheet_store_roundtrip(temp_dir: str):
+    """
+    测试工作表存储按行块写入，跨行块读取窗口的结果与写入一致
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    store_path = os.path.join(temp_dir, 'sheets.store')
+    rows = [([f'r{i}', i, None], [1 if i % 2 else 0, 0, 0]) for i in range(25)]
+    rows.append(([None], [0]))
+    write_sheet_store(store_path, [('Data', iter(rows), [{}, {'bold': True}]), ('Empty', iter([]), [{}])], chunk_rows=10)
+    
+    workbook = open_sheet_store(store_path)
+    assert [sheet.info() for sheet in workbook.sheets.values()] == [
+        {'name': 'Data', 'max_row': 25, 'max_col': 2},
+        {'name': 'Empty', 'max_row': 0, 'max_col': 0}
+    ]
+    
+    sheet = workbook.get_sheet('Data')
+    assert len(sheet.chunks) == 3
+    window = sheet.window(8, 12, 0, 1)
+    assert window['cells'] == [['r8', 8], ['r9', 9], ['r10', 10], ['r11', 11], ['r12', 12]]
+    assert window['style_ids'] == [[0, 0], [1, 0], [0, 0], [1, 0], [0, 0]]
+    assert window['styles'] == {'1': {'bold': True}}
+    assert sheet.window(20, 100, 1, 1)['rows'] == [20, 24]
+    assert workbook.get_sheet('Empty').window(0, 10, 0, 10)['cells'] == []
+
+def test_build_sheet_store(temp_dir: str):
+    """
+    测试从xlsx生成工作表存储
+    
+    Args:
+        temp_dir: 临时目录路径
+    """
+    openpyxl = pytest.importorskip('openpyxl')
+    from openpyxl.styles import Font
+    
+    file_path = os.path.join(temp_dir, 'test.xlsx')
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Data'
+    worksheet.append(['name', 'value'])
+    worksheet.append(['x', 42])
+    worksheet['A1'].font = Font(bold=True)
+    workbook.save(file_path)
+    
+    store_path = build_sheet_store(file_path, os.path.join(temp_dir, 'sheets.store'))
+    window = open_sheet_store(store_path).get_sheet('Data').window(0, 10, 0, 10)
+    assert window['cells'] == [['name', 'value'], ['x', 42]]
+    assert window['styles'][str(window['style_ids'][0][0])]['bold'] is True
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+任务状态存储测试
+"""
+
+import threading
+from unittest.mock import patch
+from file_preview.utils.task_store import MemoryTaskStore, TaskStore
+
+def test_memory_store_set_and_update():
+    """
+    测试整体设置、合并更新和返回副本
+    """
+    store = MemoryTaskStore()
+    
+    store.set('task-1', {'status': 'pending', 'progress': 0})
+    store.update('task-1', {'status': 'processing'})
+    assert store.get('task-1') == {'status': 'processing', 'progress': 0}
+    
+    # 修改返回值不影响存储
+    store.get('task-1')['status'] = 'failed'
+    assert store.get('task-1')['status'] == 'processing'
+    
+    # 任务不存在时更新会创建任务
+    store.update('task-2', {'status': 'failed'})
+    assert store.exists('task-2')
+    
+    store.delete('task-1')
+    assert store.get('task-1') is None
+
+def test_memory_store_ttl():
+    """
+    测试任务状态过期后被清理
+    """
+    store = MemoryTaskStore(ttl=10)
+    
+    with patch('file_preview.utils.task_store.time.time', return_value=1000):
+        store.set('old', {'status': 'completed'})
+    with patch('file_preview.utils.task_store.time.time', return_value=1005):
+        store.set('new', {'status': 'completed'})
+        assert store.get('old') is not None
+    
+    with patch('file_preview.utils.task_store.time.time', return_value=1012):
+        assert store.get('old') is None
+        assert store.get('new') is not None
+        
+        # 写入时从最旧一端清理过期任务
+        store.set('newer', {'status': 'pending'})
+    with patch('file_preview.utils.task_store.time.time', return_value=1016):
+        store.set('newest', {'status': 'pending'})
+        assert store.get_stats()['tasks'] == 2
+
+def test_memory_store_max_tasks():
+    """
+    测试超过容量时淘汰最旧的任务
+    """
+    store = MemoryTaskStore(max_tasks=2)
+    
+    store.set('task-1', {'status': 'completed'})
+    store.set('task-2', {'status': 'completed'})
+    store.update('task-1', {'progress': 100})
+    store.set('task-3', {'status': 'completed'})
+    
+    # task-1 最近被更新，最旧的是 task-2
+    assert store.get('task-2') is None
+    assert store.get('task-1') is not None
+    assert store.get_stats()['evicted'] == 1
+
+def test_task_store_configure(test_config: dict):
+    """
+    测试按配置创建存储后端
+    
+    Args:
+        test_config: 测试配置
+    """
+    test_config['tasks'] = {'ttl': 60, 'max_tasks': 5}
+    store = TaskStore()
+    store.configure(test_config)
+    
+    assert isinstance(store.backend, MemoryTaskStore)
+    assert store.backend.ttl == 60
+    assert store.backend.max_tasks == 5
+    
+    store.set('task-1', {'status': 'pending'})
+    store.update('task-1', status='completed')
+    assert 'task-1' in store
+    assert store.get('task-1') == {'status': 'completed'}
+    assert store.get('missing', {}) == {}
+
+def test_memory_store_wait():
+    """
+    测试等待状态变化时被写入唤醒，无变化时超时返回当前状态
+    """
+    store = MemoryTaskStore()
+    store.set('task-1', {'status': 'processing'})
+    
+    # 已知状态与当前状态不同时立即返回
+    assert store.wait('task-1', None, 5) == {'status': 'processing'}
+    
+    # 无变化时超时返回当前状态
+    assert store.wait('task-1', {'status': 'processing'}, 0.05) == {'status': 'processing'}
+    
+    # 其他线程写入后被唤醒
+    timer = threading.Timer(0.05, store.update, args=('task-1', {'status': 'completed'}))
+    timer.start()
+    assert store.wait('task-1', {'status': 'processing'}, 5) == {'status': 'completed'}
+    timer.join()
\ No newline at end of file
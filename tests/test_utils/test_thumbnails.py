@@ -0,0 +1,56 @@
+"""
+PDF页面缩略图测试
+"""
+
+import os
+import stat
+from file_preview.utils.thumbnails import get_thumbnail_path, render_thumbnail, render_thumbnails
+
+def _write_fake_pdftoppm(temp_dir: str, page_count: int) -> str:
+    """创建模拟的 pdftoppm 脚本，页码超出 page_count 时失败，输出文件中记录页码和缩放参数"""
+    script_path = os.path.join(temp_dir, 'pdftoppm')
+    with open(script_path, 'w') as f:
+        f.write(f'#!/bin/sh\n[ "$3" -gt {page_count} ] && exit 99\necho "page $3 $6 $7 $8 $9" > "${{12}}.png"\n')
+    os.chmod(script_path, os.stat(script_path).st_mode | stat.S_IEXEC)
+    return script_path
+
+def test_render_thumbnails(temp_dir: str, test_config: dict):
+    """
+    测试预生成前几页缩略图，超出文档页数时停止
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    pdf_path = os.path.join(temp_dir, 'full.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(b'%PDF')
+    
+    test_config['thumbnails'] = {'pages': 3, 'width': 240, 'pdftoppm_path': _write_fake_pdftoppm(temp_dir, 2)}
+    thumbnails = render_thumbnails(pdf_path, test_config)
+    
+    assert thumbnails == [get_thumbnail_path(pdf_path, 1), get_thumbnail_path(pdf_path, 2)]
+    with open(thumbnails[1]) as f:
+        # 按宽度缩放，高度按页面比例计算
+        assert f.read() == 'page 2 -scale-to-x 240 -scale-to-y -1\n'
+    # 不残留临时文件
+    assert sorted(name for name in os.listdir(temp_dir) if name.startswith('full.')) == [
+        'full.pdf', 'full.thumb-1.png', 'full.thumb-2.png'
+    ]
+
+def test_render_thumbnail_unavailable(temp_dir: str, test_config: dict):
+    """
+    测试未找到 pdftoppm 或已禁用时不生成缩略图
+    
+    Args:
+        temp_dir: 临时目录路径
+        test_config: 测试配置
+    """
+    pdf_path = os.path.join(temp_dir, 'full.pdf')
+    
+    # 缩略图生成器随共享服务按配置对象创建，每种情况使用单独的配置
+    missing_config = dict(test_config, thumbnails={'pdftoppm_path': os.path.join(temp_dir, 'missing')})
+    assert render_thumbnail(pdf_path, 1, missing_config) is None
+    
+    disabled_config = dict(test_config, thumbnails={'enabled': False, 'pdftoppm_path': _write_fake_pdftoppm(temp_dir, 1)})
+    assert render_thumbnail(pdf_path, 1, disabled_config) is None
\ No newline at end of file